@@ -0,0 +1,82 @@
+"""全量导出基准：SQLite 合成历史，分别导出 CSV / JSONL / Parquet，统计耗时、文件大小和 tracemalloc 峰值，
+并核对导出行数与 id 顺序。峰值应只随 --page-size 变化，不随历史行数增长：最大规模的峰值超过最小规模的
+--max-peak-ratio 倍时断言失败（Parquet 的缓冲在 pyarrow 内部分配，tracemalloc 看不到，不参与比较）。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_export [--sizes 10000,100000] [--page-size 1000]
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_rerun import USER, seed_storage
+from mindfocus.export import WRITERS, export_history
+from mindfocus.storage import SqliteStorage
+
+
+def check(path, fmt, expected):
+    """导出行数与 id 严格递增（created_at 相同时按 id）"""
+    if fmt == "csv":
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = [(r["created_at"], int(r["id"])) for r in csv.DictReader(f)]
+    elif fmt == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            rows = [(r["created_at"], r["id"]) for r in map(json.loads, f)]
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=["created_at", "id"])
+        rows = list(zip(table["created_at"].to_pylist(), map(int, table["id"].to_pylist())))
+    assert len(rows) == expected, f"{fmt}: 导出 {len(rows)} 行，应为 {expected}"
+    assert rows == sorted(rows) and len(set(rows)) == len(rows), f"{fmt}: 行序或去重有误"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全量历史流式导出的耗时与内存基准")
+    parser.add_argument("--sizes", default="10000,100000", help="合成历史的行数，逗号分隔")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--max-peak-ratio", type=float, default=2.0, help="最大与最小规模的峰值之比上限")
+    args = parser.parse_args(argv)
+
+    peaks = {}
+
+    print(f"{'rows':>7} {'format':<8} {'seconds':>8} {'rows/s':>9} {'MiB':>7} {'peak KiB':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as workdir:
+            db = os.path.join(workdir, "bench.db")
+            seed_storage(db, size, days=365)
+            storage = SqliteStorage(db)
+            for fmt in WRITERS:
+                path = os.path.join(workdir, f"export.{fmt}")
+                tracemalloc.start()
+                started = time.perf_counter()
+                try:
+                    count = export_history(storage, path, fmt, user=USER, page_size=args.page_size)
+                except RuntimeError as e:  # 未安装 pyarrow
+                    tracemalloc.stop()
+                    print(f"{size:>7} {fmt:<8} 跳过：{e}")
+                    continue
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                check(path, fmt, size)
+                peaks.setdefault(fmt, {})[size] = peak
+                print(f"{size:>7} {fmt:<8} {elapsed:>8.2f} {count / elapsed:>9.0f} "
+                      f"{os.path.getsize(path) / 2 ** 20:>7.1f} {peak / 1024:>9.0f}")
+            storage.close()
+
+    for fmt, by_size in peaks.items():
+        if fmt == "parquet" or len(by_size) < 2:
+            continue
+        small, large = by_size[min(by_size)], by_size[max(by_size)]
+        assert large <= small * args.max_peak_ratio, (
+            f"{fmt}: {max(by_size)} 行峰值 {large / 1024:.0f} KiB，超过 {min(by_size)} 行 "
+            f"{small / 1024:.0f} KiB 的 {args.max_peak_ratio:g} 倍")
+    print(f"峰值检查通过：最大规模不超过最小规模的 {args.max_peak_ratio:g} 倍")
+
+
+if __name__ == "__main__":
+    main()
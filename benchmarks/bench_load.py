@@ -0,0 +1,358 @@
+"""多会话压测：子进程启动 `streamlit run main.py`（SQLite 存储 + 本地桩 LLM），
+用无界面的 websocket 客户端（与浏览器相同的 BackMsg / ForwardMsg 协议）模拟 N 个会话。
+
+每个会话用 mindfocus.auth.generate_auth_token 签发的 URL token 登录，之后随机间隔地：
+  idle   空闲刷新（原样重跑一次）；
+  tab    st.tabs 的切换在浏览器端完成、不触发 rerun，这里改为 tab 内会触发 rerun 的操作，
+         轮流切换「长期趋势」的范围和「历史记录」翻页；
+  submit 提交一条新记录，之后像浏览器一样按 auto_rerun 轮询进度片段直到结果出现（记为 analysis）。
+按 N 逐级加压，每级重新启动服务，统计各动作的 p50/p95/p99、吞吐量（rerun/s、分析/分钟）
+和服务进程的 CPU / RSS（读 /proc，仅 Linux）。最后给出拐点：空闲刷新 p95 首次超过最低一级 --knee 倍的 N。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_load [--sessions 1,4,16,32] [--duration 30] [--llm-delay 1.0] [--set LLM_MAX_CONCURRENT=8]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from benchmarks.bench_rerun import APP, seed_storage
+from benchmarks.bench_router import percentiles
+from benchmarks.stub_llm import StubLLMServer
+from mindfocus.auth import generate_auth_token
+
+SECRET = "bench-load"
+ACTIONS = ("login", "idle", "tab", "submit", "analysis")
+FINISHED, EARLY = ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_EARLY_FOR_RERUN
+
+
+def toml_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return {"true": True, "false": False}.get(text.lower(), text)
+
+
+class ServerProcess:
+    """在 workdir 写 .streamlit/secrets.toml 后启动 streamlit，等到健康检查通过；
+    python_args 为解释器参数（如 -X importtime），输出都写入 workdir/server.log"""
+
+    def __init__(self, workdir, port, secrets, app=APP, python_args=()):
+        self.workdir = workdir
+        self.port = port
+        self.app = app
+        self.python_args = list(python_args)
+        os.makedirs(os.path.join(workdir, ".streamlit"), exist_ok=True)
+        with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+            f.writelines(f"{k} = {toml_value(v)}\n" for k, v in secrets.items())
+
+    def __enter__(self):
+        self.log = open(os.path.join(self.workdir, "server.log"), "w")
+        self.proc = subprocess.Popen(
+            [sys.executable, *self.python_args, "-m", "streamlit", "run", self.app, "--server.headless", "true",
+             "--server.port", str(self.port), "--browser.gatherUsageStats", "false",
+             "--server.fileWatcherType", "none"],
+            cwd=self.workdir, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            if self.proc.poll() is not None:
+                break
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"streamlit 未能启动，见 {self.log.name}")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
+
+
+class ProcessSampler:
+    """后台线程每 interval 秒读一次 /proc/<pid>，记录 CPU 占用（可超过 100%）和 RSS"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.cpu = []
+        self.rss = []
+        self._stop = threading.Event()
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _read(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{self.pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        return (int(fields[11]) + int(fields[12])) / self._tick, rss
+
+    def _run(self):
+        try:
+            cpu, _ = self._read()
+            last = time.monotonic()
+            while not self._stop.wait(self.interval):
+                now_cpu, rss = self._read()
+                now = time.monotonic()
+                self.cpu.append((now_cpu - cpu) / (now - last) * 100)
+                self.rss.append(rss)
+                cpu, last = now_cpu, now
+        except OSError:
+            pass  # 非 Linux 或进程已退出
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Session:
+    """一个浏览器会话：维护控件状态，按服务端的 auto_rerun 消息轮询进度片段"""
+
+    def __init__(self, url, query_string):
+        self.url = url
+        self.query_string = query_string
+        self.widgets = {}       # 控件 id -> WidgetState
+        self.elements = {}      # (类型, 标签或 key) -> 控件 proto，取自最近一次整页运行
+        self.errors = []        # 最近一次整页运行中的 st.error 文本
+        self.fragments = {}     # fragment_id -> 轮询间隔
+        self._finished = asyncio.Queue()
+        self._run_elements = {}
+        self._run_errors = []
+        self._run_fragments = {}
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None, ping_interval=None)
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._reader.cancel()
+        await self.ws.close()
+
+    async def _read(self):
+        async for raw in self.ws:
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                self._element(msg.delta.new_element)
+            elif kind == "auto_rerun":
+                self._run_fragments[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "script_finished":
+                if msg.script_finished == FINISHED:
+                    self.elements, self.errors, self.fragments = self._run_elements, self._run_errors, self._run_fragments
+                    self._run_elements, self._run_errors, self._run_fragments = {}, [], {}
+                else:
+                    # 片段运行和被打断的运行不改变整页的控件和片段
+                    self._run_elements, self._run_errors, self._run_fragments = {}, [], {}
+                self._finished.put_nowait(msg.script_finished)
+
+    def _element(self, element):
+        kind = element.WhichOneof("type")
+        if kind in ("button", "text_area", "radio"):
+            proto = getattr(element, kind)
+            key = proto.id.rsplit("-", 1)[-1]
+            self._run_elements[(kind, key if key != "None" else proto.label)] = proto
+        elif kind == "alert" and element.alert.format == element.alert.ERROR:
+            self._run_errors.append(element.alert.body)
+
+    async def _send(self, trigger=None, fragment_id=None):
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self.query_string
+        for widget in self.widgets.values():
+            state.widget_states.widgets.append(widget)
+        if trigger is not None:
+            state.widget_states.widgets.add(id=trigger, trigger_value=True)
+        if fragment_id is not None:
+            state.fragment_id = fragment_id
+            state.is_auto_rerun = True
+        await self.ws.send(msg.SerializeToString())
+
+    async def rerun(self, trigger=None):
+        """整页重跑一次，返回到运行结束的秒数；脚本内 st.rerun() 触发的后续运行一并计入"""
+        while not self._finished.empty():
+            self._finished.get_nowait()
+        started = time.perf_counter()
+        await self._send(trigger)
+        while await self._finished.get() != FINISHED:
+            pass
+        return time.perf_counter() - started
+
+    def set_value(self, kind, label, **value):
+        proto = self.elements[(kind, label)]
+        self.widgets[proto.id] = WidgetState(id=proto.id, **value)
+
+    def button(self, label):
+        proto = self.elements.get(("button", label))
+        return None if proto is None or proto.disabled else proto.id
+
+    async def wait_analysis(self, timeout=300):
+        """像浏览器一样按间隔重跑进度片段，直到某次整页运行里不再有片段（结果已出现）"""
+        started = time.perf_counter()
+        while self.fragments and time.perf_counter() - started < timeout:
+            fragment_id, interval = next(iter(self.fragments.items()))
+            await asyncio.sleep(interval)
+            await self._send(fragment_id=fragment_id)
+            # 片段运行结束，或片段内 st.rerun() 引发的整页运行结束
+            if await self._finished.get() == EARLY:
+                while await self._finished.get() != FINISHED:
+                    pass
+        return time.perf_counter() - started
+
+
+async def run_session(index, args, url, deadline, samples, errors):
+    rnd = random.Random(index)
+    token = generate_auth_token(f"load-{index}", 10 ** 6, secret=SECRET)
+    await asyncio.sleep(rnd.uniform(0, args.ramp))
+    async with Session(url, f"token={token}") as session:
+        samples["login"].append(await session.rerun())
+        tabs = itertools.cycle(["period", "older", "period", "newer"])
+        submits = 0
+        while time.monotonic() < deadline:
+            await asyncio.sleep(rnd.expovariate(1 / args.think))
+            if time.monotonic() >= deadline:
+                break
+            action = rnd.choices(["idle", "tab", "submit"], weights=args.mix)[0]
+            if action == "idle":
+                samples["idle"].append(await session.rerun())
+            elif action == "tab":
+                step = next(tabs)
+                if step == "period":
+                    radio = session.elements[("radio", "trend_period")]
+                    current = session.widgets.get(radio.id)
+                    options = list(radio.options)
+                    index_now = options.index(current.string_value) if current else radio.default
+                    session.set_value("radio", "trend_period", string_value=options[(index_now + 1) % len(options)])
+                    samples["tab"].append(await session.rerun())
+                else:
+                    trigger = session.button("较早 →" if step == "older" else "← 较新")
+                    samples["tab"].append(await session.rerun(trigger))
+            else:
+                trigger = session.button("提交")
+                if trigger is None:
+                    continue
+                submits += 1
+                session.set_value("text_area", "", string_value=f"压测会话 {index} 第 {submits} 次提交：{rnd.random():.6f}")
+                samples["submit"].append(await session.rerun(trigger))
+                errors.extend(session.errors)
+                if session.fragments:
+                    samples["analysis"].append(await session.wait_analysis())
+                    errors.extend(session.errors)
+
+
+def run_step(n, args, stub):
+    """启动新服务，跑 n 个会话 args.duration 秒，返回 (各动作耗时, 错误, CPU 采样, RSS 采样, 实际时长)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        db = os.path.join(workdir, "bench.db")
+        for i in range(n):
+            seed_storage(db, args.history, seed=i, user=f"load-{i}")
+        seed_storage(db, args.history, user="load-warmup")
+        secrets = {
+            "STORAGE_BACKEND": "sqlite", "SQLITE_PATH": db, "OPENAI_API_KEY": "bench", "LLM_BASE_URL": stub.base_url,
+            "COOKIE_SECRET": SECRET, "WRITE_SPOOL_PATH": os.path.join(workdir, "spool.db"),
+            "SIMILAR_INDEX_DIR": os.path.join(workdir, "similar_index"),
+            **args.secrets,
+        }
+        with ServerProcess(workdir, args.port, secrets) as server:
+            url = f"ws://127.0.0.1:{args.port}/_stcore/stream"
+
+            async def main():
+                # 预热：首个会话要付出导入和 cache_resource 初始化的开销，不计入
+                async with Session(url, "token=" + generate_auth_token("load-warmup", 10 ** 6, secret=SECRET)) as s:
+                    await s.rerun()
+                samples, errors = defaultdict(list), []
+                with ProcessSampler(server.proc.pid) as sampler:
+                    started = time.monotonic()
+                    deadline = started + args.duration
+                    await asyncio.gather(*(run_session(i, args, url, deadline, samples, errors) for i in range(n)))
+                    elapsed = time.monotonic() - started
+                return samples, errors, sampler.cpu, sampler.rss, elapsed
+
+            return asyncio.run(main())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多会话压测：各动作延迟分位、吞吐量和服务进程 CPU/RSS")
+    parser.add_argument("--sessions", default="1,4,16,32", help="逐级加压的并发会话数，逗号分隔")
+    parser.add_argument("--duration", type=float, default=30, help="每级持续秒数（不含预热）")
+    parser.add_argument("--ramp", type=float, default=3, help="各会话在这么多秒内错开登录")
+    parser.add_argument("--think", type=float, default=1.0, help="两次操作之间的平均间隔（秒，指数分布）")
+    parser.add_argument("--mix", default="6,3,1", help="idle,tab,submit 的权重")
+    parser.add_argument("--history", type=int, default=200, help="每个会话用户的合成历史条数")
+    parser.add_argument("--llm-delay", type=float, default=1.0, help="桩 LLM 的响应延迟（秒）")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--knee", type=float, default=2.0, help="空闲刷新 p95 超过最低一级的多少倍视为拐点")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="额外写入 secrets 的配置，可重复")
+    args = parser.parse_args(argv)
+    args.mix = [float(w) for w in args.mix.split(",")]
+    args.secrets = {k: parse_value(v) for k, v in (item.split("=", 1) for item in args.set)}
+
+    rows = []
+    with StubLLMServer(delay=args.llm_delay) as stub:
+        for n in (int(s) for s in args.sessions.split(",")):
+            samples, errors, cpu, rss, elapsed = run_step(n, args, stub)
+            reruns = sum(len(samples[a]) for a in ("login", "idle", "tab", "submit"))
+            rows.append((n, samples, errors, cpu, rss, elapsed, reruns))
+            print(f"[N={n}] {reruns} 次 rerun, {len(samples['analysis'])} 次分析, {len(errors)} 个错误", file=sys.stderr)
+
+    print(f"{'N':>4} {'action':<9} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for n, samples, *_ in rows:
+        for action in ACTIONS:
+            if samples[action]:
+                p50, p95, p99 = percentiles(samples[action])
+                print(f"{n:>4} {action:<9} {len(samples[action]):>6} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+    print()
+    print(f"{'N':>4} {'rerun/s':>8} {'分析/分钟':>9} {'错误':>5} {'CPU 均值%':>9} {'CPU 峰值%':>9} {'RSS 峰值 MiB':>12}")
+    for n, samples, errors, cpu, rss, elapsed, reruns in rows:
+        cpu_mean = f"{sum(cpu) / len(cpu):>9.0f}" if cpu else f"{'-':>9}"
+        cpu_peak = f"{max(cpu):>9.0f}" if cpu else f"{'-':>9}"
+        rss_peak = f"{max(rss) / 2 ** 20:>12.0f}" if rss else f"{'-':>12}"
+        print(f"{n:>4} {reruns / elapsed:>8.1f} {len(samples['analysis']) / elapsed * 60:>9.1f} {len(errors):>5} "
+              f"{cpu_mean} {cpu_peak} {rss_peak}")
+    for error in sorted(set(e for row in rows for e in row[2]))[:5]:
+        print(f"错误示例：{error}")
+
+    baseline = next((percentiles(r[1]["idle"])[1] for r in rows if r[1]["idle"]), None)
+    knee = next((r[0] for r in rows if r[1]["idle"] and baseline and percentiles(r[1]["idle"])[1] > args.knee * baseline), None)
+    print()
+    print(f"拐点：N={knee}（空闲刷新 p95 超过 {args.knee:g} 倍）" if knee else f"拐点：在测试范围内空闲刷新 p95 未超过 {args.knee:g} 倍")
+
+
+if __name__ == "__main__":
+    main()
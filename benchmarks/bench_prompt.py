@@ -0,0 +1,123 @@
+"""对比 legacy（完整评分表 + 文本清理）与 compact（紧凑评分表 + JSON mode + 校验修复）两种 prompt 模式：
+每次调用的输入 token、延迟、解析失败率和修复重试率。
+
+默认调用 OPENAI_API_KEY / LLM_BASE_URL 配置的真实接口（读取环境变量或 .streamlit/secrets.toml）；
+--stub 时改用本地桩服务，按 --stub-bad-rate 混入带尾逗号、分数带 + 号的回复，只用来验证流程和输入规模。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_prompt [--repeat 3] [--inputs 日记.txt] [--stream] [--stub]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks.stub_llm import SAMPLE_RESULT, StubLLMServer, estimate_tokens
+from mindfocus.analysis import request_analysis, validate_result
+from mindfocus.config import get_setting
+from mindfocus.llm import DEFAULT_BASE_URL, LLMClient
+from mindfocus.prompt import DEFAULT_PROMPTS, DEFAULT_TEMPERATURE, PROMPT_MODES
+
+SAMPLES = [
+    "早上开会被领导当众批评，到现在心里还是堵得慌，一直在想当时应该怎么回应。",
+    "今天跑完五公里，洗了个热水澡，整个人很放松，晚饭吃得很香。",
+    "明天就要答辩了，PPT 还没改完，手心一直出汗，脑子里全是被问倒的画面。",
+    "下午写代码的时候进入了状态，三个小时一晃就过去了，没注意到时间。",
+    "和妈妈又吵架了，她总是不理解我的选择，我也不知道该怎么和她沟通。",
+    "失眠到三点，白天昏昏沉沉，什么都不想做，只想躺着。",
+    "打坐二十分钟，看到自己一直在想工作的事，念头起来又放下，比上周好一些。",
+    "朋友突然说要搬去别的城市，有点失落，也有点替她高兴。",
+]
+
+
+def malformed(result):
+    """clean_json_string 能修好、但不是合法 JSON 的回复：代码块包裹、尾逗号、分数带 + 号"""
+    text = json.dumps(result, ensure_ascii=False, indent=2).replace("}", ",}")
+    return "```json\n" + text.replace('"觉察度": 3', '"觉察度": +3') + "\n```"
+
+
+def run_mode(llm, mode, inputs, args):
+    system_prompt = DEFAULT_PROMPTS[mode]
+    latencies, prompt_tokens = [], []
+    failed = invalid = repaired = 0
+    for text in inputs:
+        meta = {}
+        started = time.perf_counter()
+        result = request_analysis(llm, text, system_prompt, DEFAULT_TEMPERATURE, meta=meta,
+                                  on_partial=(lambda *_: None) if args.stream else None,
+                                  structured=mode == "compact")
+        latencies.append(time.perf_counter() - started)
+        if meta.get("usage"):
+            prompt_tokens.append(meta["usage"]["prompt_tokens"])
+        repaired += meta.get("repairs", 0)
+        if "error" in result:
+            failed += 1
+        elif validate_result(result):
+            invalid += 1
+    ms = sorted(x * 1000 for x in latencies)
+    n = len(inputs)
+    return {
+        "mode": mode,
+        "prompt_chars": len(system_prompt),
+        "est_tokens": estimate_tokens(system_prompt),
+        "input_tokens": statistics.mean(prompt_tokens) if prompt_tokens else float("nan"),
+        "p50": statistics.median(ms),
+        "p95": ms[min(n - 1, round(0.95 * (n - 1)))],
+        "failed": failed / n,
+        "invalid": invalid / n,
+        "repaired": repaired / n,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="legacy / compact 两种 prompt 模式的 token、延迟和解析失败率对比")
+    parser.add_argument("--repeat", type=int, default=3, help="每条输入调用的次数")
+    parser.add_argument("--inputs", help="输入文件，每行一条日记；默认用内置样例")
+    parser.add_argument("--stream", action="store_true", help="用流式调用（同页面）")
+    parser.add_argument("--stub", action="store_true", help="使用本地桩服务而不是真实接口")
+    parser.add_argument("--stub-delay", type=float, default=0.2)
+    parser.add_argument("--stub-bad-rate", type=float, default=0.2, help="桩服务首个回复不合规的比例")
+    args = parser.parse_args(argv)
+
+    if args.inputs:
+        with open(args.inputs, encoding="utf-8") as f:
+            samples = [line.strip() for line in f if line.strip()]
+    else:
+        samples = SAMPLES
+    inputs = samples * args.repeat
+
+    stub = StubLLMServer(delay=args.stub_delay).start() if args.stub else None
+    llm = LLMClient(
+        get_setting("OPENAI_API_KEY", "stub") if stub else get_setting("OPENAI_API_KEY"),
+        base_url=stub.base_url if stub else get_setting("LLM_BASE_URL", DEFAULT_BASE_URL),
+        read_timeout=float(get_setting("LLM_READ_TIMEOUT", 60)),
+        max_retries=int(get_setting("LLM_MAX_RETRIES", 3)),
+    )
+    rows = []
+    try:
+        for mode in PROMPT_MODES:
+            if stub:
+                rnd = random.Random(0)
+                # 每条输入的首个回复按比例不合规；compact 模式下紧跟的修复调用拿到合规回复
+                stub.replies = [malformed(SAMPLE_RESULT) if rnd.random() < args.stub_bad_rate else stub.content
+                                for _ in inputs]
+                if mode == "compact":
+                    stub.replies = [r for reply in stub.replies
+                                    for r in ((reply, stub.content) if reply != stub.content else (reply,))]
+            rows.append(run_mode(llm, mode, inputs, args))
+    finally:
+        llm.close()
+        if stub:
+            stub.stop()
+
+    print(f"{len(inputs)} 次调用/模式{'（桩服务，token 为估算）' if stub else ''}")
+    print(f"{'mode':<8} {'prompt字数':>9} {'估算tok':>8} {'输入tok':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'解析失败':>8} {'校验不合格':>10} {'修复重试':>8}")
+    for r in rows:
+        print(f"{r['mode']:<8} {r['prompt_chars']:>9} {r['est_tokens']:>8} {r['input_tokens']:>8.0f} "
+              f"{r['p50']:>8.0f} {r['p95']:>8.0f} {r['failed']:>8.1%} {r['invalid']:>10.1%} {r['repaired']:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
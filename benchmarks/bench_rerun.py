@@ -0,0 +1,237 @@
+"""每次 rerun 热路径的基准：AppTest 驱动 main.py，SQLite 存储 + 本地桩 LLM，不访问外部服务。
+
+对登录、空闲刷新、提交分析三条路径统计 rerun 耗时、tracemalloc 峰值和存储调用次数；
+另外单测 clean_json_string、render_trend、render_focus_map。
+st.tabs 在浏览器端切换，不触发 rerun，两个 tab 的内容每次 rerun 都会渲染，
+所以“切换 tab”的服务端开销就是空闲刷新这一行。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_rerun [--sizes 10,100,1000,10000] [--repeat 5] [--llm-delay 0.2]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from collections import Counter
+
+import streamlit as st
+from streamlit import logger as st_logger
+from streamlit.testing.v1 import AppTest
+
+import mindfocus.storage
+from benchmarks.bench_timeline import make_rows
+from benchmarks.stub_llm import SAMPLE_RESULT, StubLLMServer
+from mindfocus.analysis import clean_json_string
+from mindfocus.charts import render_focus_map, render_trend
+from mindfocus.records import decode_history
+from mindfocus.storage import SqliteStorage, Storage
+from mindfocus.timeline import day_frame, day_window
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+USER, PASSWORD = "bench", "bench"
+STORAGE_METHODS = [name for name in vars(Storage) if not name.startswith("_")]
+
+
+class CountingStorage(SqliteStorage):
+    """统计 Storage 接口方法调用次数；所有实例共用一个计数器，后台分析线程的调用单独计为 "名称(worker)" """
+    calls = Counter()
+
+
+def _counted(name):
+    method = getattr(SqliteStorage, name)
+
+    def wrapper(self, *args, **kwargs):
+        worker = threading.current_thread().name.startswith("analysis")
+        CountingStorage.calls[f"{name}(worker)" if worker else name] += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+for _name in STORAGE_METHODS:
+    setattr(CountingStorage, _name, _counted(_name))
+
+
+def seed_storage(path, n, days=30, seed=0, user=USER):
+    """账号 + n 行分布在最近 days 天内的合成历史"""
+    rnd = random.Random(seed)
+    storage = SqliteStorage(path)
+    storage.add_account(user, PASSWORD, daily_limit=10 ** 6)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for i in range(n):
+        result = json.loads(json.dumps(SAMPLE_RESULT))
+        result["scores"] = {"平静度": rnd.randint(-5, 5), "觉察度": rnd.randint(-5, 5), "能量水平": rnd.randint(-5, 5)}
+        result["focus_analysis"]["time_orientation"] = rnd.choice(["Past", "Present", "Future"])
+        result["focus_analysis"]["focus_target"] = rnd.choice(["Internal", "External"])
+        created = now - datetime.timedelta(seconds=rnd.uniform(0, days * 86400))
+        rows.append({
+            "user_id": user,
+            "user_input": f"合成记录 {i}",
+            "ai_result": result,
+            "created_at": created.isoformat(timespec="microseconds"),
+        })
+    storage.insert_logs(rows)
+    storage.close()
+
+
+def new_app(workdir, base_url):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["STORAGE_BACKEND"] = "sqlite"
+    at.secrets["SQLITE_PATH"] = os.path.join(workdir, "bench.db")
+    at.secrets["WRITE_SPOOL_PATH"] = os.path.join(workdir, "spool.db")
+    at.secrets["OPENAI_API_KEY"] = "bench"
+    at.secrets["LLM_BASE_URL"] = base_url
+    return at
+
+
+def measure(step, trace=False):
+    """执行一次 step，返回 (秒, 峰值字节数或 None, 存储调用计数)"""
+    before = Counter(CountingStorage.calls)
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    step()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak, CountingStorage.calls - before
+
+
+class Report:
+    def __init__(self):
+        self.lines = []
+
+    def add(self, size, path, samples, peak, calls, runs=1, extra=""):
+        ms = sorted(s * 1000 for s in samples)
+        per_run = ", ".join(f"{k}×{v / runs:g}" for k, v in sorted(calls.items()) if v) or "-"
+        self.lines.append(
+            f"{size:>6} {path:<10} {statistics.median(ms):9.1f} {ms[-1]:9.1f} "
+            f"{(peak or 0) / 1024:9.0f}  {per_run}{extra}"
+        )
+
+    def print(self):
+        print(f"{'rows':>6} {'path':<10} {'median ms':>9} {'max ms':>9} {'peak KiB':>9}  storage calls / rerun")
+        for line in self.lines:
+            print(line)
+
+
+def login(at):
+    at.run()
+    at.text_input[0].input(USER)
+    at.text_input[1].input(PASSWORD)
+    at.button[0].click()
+    return at
+
+
+def bench_size(size, args, stub, report):
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_storage(os.path.join(workdir, "bench.db"), size)
+        st.cache_resource.clear()  # 每个规模重新打开数据库
+        CountingStorage.calls.clear()
+
+        # 登录：新会话，历史缓存为空，含首屏全量加载
+        samples, calls = [], Counter()
+        for _ in range(args.repeat):
+            at = login(new_app(workdir, stub.base_url))
+            elapsed, _, c = measure(at.run)
+            samples.append(elapsed)
+            calls += c
+        at = login(new_app(workdir, stub.base_url))
+        _, peak, _ = measure(at.run, trace=True)
+        report.add(size, "login", samples, peak, calls, runs=args.repeat)
+
+        # 空闲刷新：已登录会话再次 rerun，历史只做增量查询
+        samples, calls = [], Counter()
+        for _ in range(args.repeat):
+            elapsed, _, c = measure(at.run)
+            samples.append(elapsed)
+            calls += c
+        _, peak, _ = measure(at.run, trace=True)
+        report.add(size, "idle", samples, peak, calls, runs=args.repeat)
+
+        # 提交：点击后的 rerun（提交任务）+ 轮询 rerun 直到任务完成；后台线程的写库单独计入 submit 行
+        submit_samples, poll_samples, total_samples = [], [], []
+        submit_calls, poll_calls = Counter(), Counter()
+        submit_peak = 0
+        for i in range(args.repeat + 1):
+            trace = i == args.repeat
+            at.text_area[0].input(f"第 {i} 次提交：有点焦虑，一直在想明天的汇报 {random.random()}")
+            at.button[0].click()
+            before = Counter(CountingStorage.calls)
+            started = time.perf_counter()
+            elapsed, peak, _ = measure(at.run, trace=trace)
+            if trace:
+                submit_peak = peak
+            else:
+                submit_samples.append(elapsed)
+            submit_rerun = CountingStorage.calls - before
+            while at.session_state.analysis_job_id is not None:
+                time.sleep(args.poll)
+                elapsed, _, _ = measure(at.run)
+                if not trace:
+                    poll_samples.append(elapsed)
+            if trace:
+                continue
+            total_samples.append(time.perf_counter() - started)
+            for name, count in (CountingStorage.calls - before).items():
+                if name.endswith("(worker)"):
+                    submit_calls[name] += count
+                else:
+                    submit_calls[name] += submit_rerun[name]
+                    poll_calls[name] += count - submit_rerun[name]
+        report.add(size, "submit", submit_samples, submit_peak, submit_calls, runs=args.repeat,
+                   extra=f"  (提交到完成 median {statistics.median(total_samples) * 1000:.0f} ms)")
+        report.add(size, "poll", poll_samples, None, poll_calls, runs=len(poll_samples),
+                   extra=f"  ({len(poll_samples) / args.repeat:.1f} 次轮询/提交)")
+
+
+def micro(sizes):
+    print()
+    st_logger.set_log_level("error")  # 裸模式调用 st.* 时的 ScriptRunContext / 弃用警告
+    text = "```json\n" + json.dumps(SAMPLE_RESULT, ensure_ascii=False, indent=2).replace("}", ",}") \
+        .replace('"平静度": -2', '"平静度": +2') + "\n```"
+    runs = timeit.repeat(lambda: clean_json_string(text), number=1000, repeat=5)
+    print(f"clean_json_string: {min(runs) * 1000:.1f} µs/次 (最优)")
+
+    start, end = day_window()
+    for n in sizes:
+        frame = day_frame(decode_history(make_rows(n, days=1)), start, end)
+        for name, fn in (("render_trend", render_trend), ("render_focus_map", render_focus_map)):
+            runs = timeit.repeat(lambda: fn(frame, start, end), number=1, repeat=5)
+            print(f"{name:>16} rows={n:<6} today={len(frame):<6} best {min(runs) * 1000:8.2f} ms  "
+                  f"median {sorted(runs)[2] * 1000:8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="main.py 每次 rerun 的耗时、内存和存储调用基准")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="合成历史的行数，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="桩 LLM 的响应延迟（秒）")
+    parser.add_argument("--poll", type=float, default=0.5, help="两次轮询 rerun 的间隔，对应页面的 JOB_POLL_SECONDS")
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    original = mindfocus.storage.SqliteStorage
+    mindfocus.storage.SqliteStorage = CountingStorage  # init_storage 经 open_storage 在调用时从这里取类
+    report = Report()
+    try:
+        with StubLLMServer(delay=args.llm_delay) as stub:
+            for size in sizes:
+                bench_size(size, args, stub, report)
+    finally:
+        mindfocus.storage.SqliteStorage = original
+    report.print()
+    micro(sizes)
+
+
+if __name__ == "__main__":
+    main()
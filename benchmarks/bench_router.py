@@ -0,0 +1,88 @@
+"""LLM 路由的尾延迟与容错基准：两个本地桩服务，主后端有一定比例的慢请求，可选注入 5xx。
+
+对比只用主后端和走 LLMRouter（对冲 + 回退 + 熔断）两种方式的 p50/p95/p99、失败率、
+对冲比例和发往各后端的请求数。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_router [--calls 200] [--slow-rate 0.05] [--percentile 90] [--slow 2.0] [--error-rate 0.0]
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_llm import StubLLMServer
+from mindfocus.analysis import request_analysis
+from mindfocus.llm import LLMClient
+from mindfocus.prompt import COMPACT_SYSTEM_PROMPT, DEFAULT_TEMPERATURE
+from mindfocus.router import Backend, CircuitBreaker, LLMRouter
+
+TEXT = "明天就要答辩了，PPT 还没改完，手心一直出汗。"
+
+
+def percentiles(samples):
+    ms = sorted(s * 1000 for s in samples)
+    pick = lambda p: ms[min(len(ms) - 1, round(p / 100 * (len(ms) - 1)))]
+    return statistics.median(ms), pick(95), pick(99)
+
+
+def run(call, calls, concurrency):
+    """并发执行 calls 次 call()，返回 (各次耗时, 失败次数, 对冲次数)"""
+    def one(_):
+        meta = {}
+        started = time.perf_counter()
+        result = call(meta)
+        return time.perf_counter() - started, "error" in result, bool(meta.get("hedged"))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(calls)))
+    return [o[0] for o in outcomes], sum(o[1] for o in outcomes), sum(o[2] for o in outcomes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLMRouter 对冲/回退/熔断的尾延迟基准（本地桩服务）")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base", type=float, default=0.2, help="正常请求的延迟（秒）")
+    parser.add_argument("--slow", type=float, default=2.0, help="慢请求的延迟（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="主后端慢请求比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="主后端返回 500 的比例")
+    parser.add_argument("--percentile", type=float, default=90, help="对冲阈值分位")
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(0)
+    primary = StubLLMServer(delay=lambda: args.slow if rnd.random() < args.slow_rate else args.base,
+                            statuses=[500 if rnd.random() < args.error_rate else 200 for _ in range(args.calls * 3)])
+    secondary = StubLLMServer(delay=lambda: args.base * 1.5)
+    with primary, secondary:
+        def client(server):
+            return LLMClient("bench", base_url=server.base_url, max_retries=0, max_connections=args.concurrency * 2)
+
+        single = client(primary)
+        router = LLMRouter(
+            [Backend("primary", client(primary), breaker=CircuitBreaker(5, 2.0)),
+             Backend("secondary", client(secondary), breaker=CircuitBreaker(5, 2.0))],
+            hedge_percentile=args.percentile, hedge_delay=args.base * 3, min_hedge_delay=args.base / 2,
+        )
+        rows = []
+        for name, call in (
+            ("single", lambda meta: request_analysis(single, TEXT, COMPACT_SYSTEM_PROMPT, DEFAULT_TEMPERATURE,
+                                                     meta=meta, structured=True)),
+            ("router", lambda meta: router.analyze(TEXT, COMPACT_SYSTEM_PROMPT, DEFAULT_TEMPERATURE,
+                                                   meta=meta, structured=True)),
+        ):
+            before = primary.requests, secondary.requests
+            samples, failed, hedged = run(call, args.calls, args.concurrency)
+            sent = primary.requests - before[0], secondary.requests - before[1]
+            rows.append((name, *percentiles(samples), failed / args.calls, hedged / args.calls, *sent))
+        single.close()
+        router.close()
+
+    print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'失败率':>7} {'对冲率':>7} {'主后端请求':>10} {'备用请求':>8}")
+    for name, p50, p95, p99, failed, hedged, first, second in rows:
+        print(f"{name:<8} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {failed:>7.1%} {hedged:>7.1%} {first:>10} {second:>8}")
+
+
+if __name__ == "__main__":
+    main()
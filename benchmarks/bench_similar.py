@@ -0,0 +1,112 @@
+"""相似时刻索引基准：单个用户的合成日记，统计建索引、逐条追加、从磁盘加载的耗时、索引文件大小，
+以及查询 p50/p95/p99；对照组为每次查询都扫描全部 user_input 的二元组 Jaccard。
+另外把若干条改写过的原文作为查询，核对原条目是否排在第一。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_similar [--entries 50000] [--queries 200] [--top-k 3]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_router import percentiles
+from mindfocus.similar import SimilarIndex, vectorize
+
+SUBJECTS = ["组会", "答辩", "房租", "体检报告", "妈妈的电话", "加班", "跑步", "面试", "失眠", "周末聚餐",
+            "代码评审", "项目延期", "孩子的作业", "地铁晚点", "老板的消息", "考试成绩", "搬家", "猫生病了"]
+FEELINGS = ["心里很慌", "有点烦躁", "松了一口气", "胸口发紧", "很平静", "提不起劲", "特别开心", "一直在想",
+            "手心出汗", "想哭", "觉得委屈", "精神很好", "脑子很乱", "肩膀很僵"]
+CONTEXTS = ["今天早上", "刚才", "下班路上", "睡前", "午饭的时候", "开会时", "周一", "又一次"]
+
+
+def make_text(rnd):
+    parts = [rnd.choice(CONTEXTS), f"因为{rnd.choice(SUBJECTS)}", rnd.choice(FEELINGS)]
+    if rnd.random() < 0.5:
+        parts.append(f"，还想到了{rnd.choice(SUBJECTS)}，{rnd.choice(FEELINGS)}")
+    return "".join(parts) + f"。（第 {rnd.randint(1, 999)} 次记录）"
+
+
+def make_rows(n, rnd):
+    return [{
+        "id": i + 1,
+        "user_input": make_text(rnd),
+        "ai_result": {"scores": {"平静度": rnd.randint(-5, 5), "觉察度": rnd.randint(-5, 5), "能量水平": rnd.randint(-5, 5)}},
+        "created_at": f"2026-01-01T00:00:00.{i:06d}+00:00",
+    } for i in range(n)]
+
+
+def scan_baseline(rows, text, k):
+    """不建索引：逐条算字符二元组 Jaccard"""
+    grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    scored = []
+    for row in rows:
+        other = row["user_input"]
+        other_grams = {other[i:i + 2] for i in range(len(other) - 1)}
+        scored.append((len(grams & other_grams) / (len(grams | other_grams) or 1), row["id"]))
+    return sorted(scored, reverse=True)[:k]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="相似时刻索引的构建、加载与查询基准")
+    parser.add_argument("--entries", type=int, default=50000, help="单个用户的历史条数")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=1000, help="批量建索引时每批条数（与重建时的页大小一致）")
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(0)
+    rows = make_rows(args.entries, rnd)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "user")
+        index = SimilarIndex(path)
+        started = time.perf_counter()
+        for i in range(0, len(rows) - 100, args.batch):
+            index.add_many(rows[i:min(i + args.batch, len(rows) - 100)])
+        build = time.perf_counter() - started
+        # 最后 100 条逐条追加，模拟每次 save_to_db
+        adds = []
+        for row in rows[len(rows) - 100:]:
+            started = time.perf_counter()
+            index.add(row)
+            adds.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        index = SimilarIndex(path)
+        load = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        assert len(index) == args.entries
+
+        targets = rnd.sample(rows, args.queries)
+        queries = [(row, row["user_input"].replace("。", "！")[:-3]) for row in targets]
+        text_only, mixed, hits = [], [], 0
+        for row, text in queries:
+            started = time.perf_counter()
+            found = index.search(text, k=args.top_k)
+            text_only.append(time.perf_counter() - started)
+            hits += bool(found) and found[0][0] == row["id"]
+            scores = list(row["ai_result"]["scores"].values())
+            started = time.perf_counter()
+            index.search(text, scores, k=args.top_k, exclude=(row["id"],))
+            mixed.append(time.perf_counter() - started)
+        baseline = []
+        for row, text in queries[:max(1, args.queries // 20)]:
+            started = time.perf_counter()
+            scan_baseline(rows, text, args.top_k)
+            baseline.append(time.perf_counter() - started)
+
+    vectors = [vectorize(row["user_input"])[0].size for row in rows[:1000]]
+    print(f"条数 {args.entries}，平均每条 {statistics.mean(vectors):.0f} 个非零维")
+    print(f"批量建索引 {build:.2f}s（{(args.entries - 100) / build:.0f} 条/s），"
+          f"逐条追加 p50 {statistics.median(adds) * 1000:.2f} ms，从磁盘加载 {load * 1000:.0f} ms，"
+          f"索引文件 {size / 2 ** 20:.1f} MiB")
+    print(f"{'query':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, samples in (("text", text_only), ("text+scores", mixed), ("scan", baseline)):
+        print(f"{name:<12} {' '.join(f'{v:>8.2f}' for v in percentiles(samples))}")
+    print(f"改写原文查询命中原条目（top-1）：{hits / args.queries:.1%}")
+
+
+if __name__ == "__main__":
+    main()
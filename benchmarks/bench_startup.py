@@ -0,0 +1,112 @@
+"""冷启动基准：用 `python -X importtime -m streamlit run main.py` 启动全新进程，无界面 websocket 客户端打开登录页，
+统计进程启动到服务就绪、到登录页首次渲染完成的耗时，以及渲染登录页时 main.py 触发导入的模块耗时（按顶层包汇总）。
+之后再用 token 打开一次仪表盘，确认重依赖此时才被导入。
+
+对比改动前后：用 git worktree 检出旧版本，--app 指向其中的 main.py。
+
+用法（在仓库根目录）：
+    python -m benchmarks.bench_startup [--repeat 5] [--app main.py] [--top 8]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.bench_load import ServerProcess, Session
+from benchmarks.bench_rerun import APP, seed_storage
+from mindfocus.auth import generate_auth_token
+
+SECRET = "bench-startup"
+HEAVY = ("pandas", "altair", "numpy", "openai", "httpx", "supabase", "pyarrow")
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def parse_importtime(text):
+    """-X importtime 输出 -> (各顶层包累计耗时, 各模块累计耗时)，单位微秒。
+    顶层包只计未缩进的条目，避免嵌套重复；模块按名字取首次导入那一行，被其他包间接导入的也算在内"""
+    totals, modules = defaultdict(int), {}
+    for line in text.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, name = int(match.group(2)), match.group(4)
+        modules.setdefault(name, cumulative)
+        if not match.group(3):
+            totals[name.split(".")[0]] += cumulative
+    return totals, modules
+
+
+def read_from(path, offset):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        f.seek(offset)
+        return f.read()
+
+
+def cold_start(app, port):
+    """一次冷启动，返回 (就绪秒数, 登录页秒数, 登录页各顶层包, 登录页各模块, 仪表盘各模块)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        db = os.path.join(workdir, "bench.db")
+        seed_storage(db, 50, user="startup")
+        secrets = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": db, "OPENAI_API_KEY": "bench",
+                   "LLM_BASE_URL": "http://127.0.0.1:9", "COOKIE_SECRET": SECRET,
+                   "WRITE_SPOOL_PATH": os.path.join(workdir, "spool.db"),
+                   "SIMILAR_INDEX_DIR": os.path.join(workdir, "similar_index")}
+        started = time.perf_counter()
+        with ServerProcess(workdir, port, secrets, app=app, python_args=["-X", "importtime"]) as server:
+            ready = time.perf_counter() - started
+            log = server.log.name
+            server.log.flush()
+            offset = os.path.getsize(log)
+            url = f"ws://127.0.0.1:{port}/_stcore/stream"
+
+            async def open_page(query_string):
+                async with Session(url, query_string) as session:
+                    await session.rerun()
+
+            asyncio.run(open_page(""))
+            login = time.perf_counter() - started
+            time.sleep(0.2)  # 等 stderr 落盘
+            login_imports = read_from(log, offset)
+            offset += len(login_imports.encode("utf-8"))
+            asyncio.run(open_page("token=" + generate_auth_token("startup", 100, secret=SECRET)))
+            time.sleep(0.2)
+            dashboard_imports = read_from(log, offset)
+    login_totals, login_modules = parse_importtime(login_imports)
+    return ready, login, login_totals, login_modules, parse_importtime(dashboard_imports)[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="冷启动到登录页的耗时与导入开销")
+    parser.add_argument("--app", default=APP, help="要测的 main.py")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8598)
+    parser.add_argument("--top", type=int, default=8, help="列出登录页导入最慢的几个顶层包")
+    args = parser.parse_args(argv)
+
+    runs = [cold_start(os.path.abspath(args.app), args.port) for _ in range(args.repeat)]
+    ready = statistics.median(r[0] for r in runs)
+    login = statistics.median(r[1] for r in runs)
+    print(f"{args.app}（{args.repeat} 次冷启动的中位数）")
+    print(f"  进程启动 -> 服务就绪   {ready * 1000:>7.0f} ms")
+    print(f"  进程启动 -> 登录页完成 {login * 1000:>7.0f} ms（其中登录页首次运行 {(login - ready) * 1000:.0f} ms）")
+
+    def median_ms(index, package):
+        return statistics.median(r[index].get(package, 0) for r in runs) / 1000
+
+    login_total = statistics.median(sum(r[2].values()) for r in runs) / 1000
+    print(f"  登录页触发的导入合计   {login_total:>7.0f} ms")
+    packages = sorted({p for r in runs for p in r[2]}, key=lambda p: -median_ms(2, p))
+    for package in packages[:args.top]:
+        print(f"    {package:<24} {median_ms(2, package):>7.1f} ms")
+    print("  重依赖在哪一步首次导入（中位数 ms）：")
+    print(f"    {'package':<12} {'登录页':>8} {'仪表盘':>8}")
+    for package in HEAVY:
+        print(f"    {package:<12} {median_ms(3, package):>8.1f} {median_ms(4, package):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""对比趋势图/注意力地图的时间轴计算：逐行 parse_to_beijing vs 整列向量化。
+
+用法（在仓库根目录）：python -m benchmarks.bench_timeline [行数]
+"""
+import datetime
+import json
+import random
+import sys
+import timeit
+
+import pandas as pd
+
+from mindfocus.records import decode_history
+from mindfocus.timeline import day_frame, day_window
+
+
+def make_rows(n, days=3, seed=0):
+    """生成 n 行分布在最近 days 天内的 emotion_logs"""
+    rnd = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for i in range(n):
+        created = now - datetime.timedelta(seconds=rnd.uniform(0, days * 86400))
+        rows.append({
+            "id": i,
+            "created_at": created.isoformat(),
+            "ai_result": json.dumps({
+                "scores": {"平静度": rnd.randint(-5, 5), "觉察度": rnd.randint(-5, 5), "能量水平": rnd.randint(-5, 5)},
+                "focus_analysis": {
+                    "time_orientation": rnd.choice(["Past", "Present", "Future"]),
+                    "focus_target": rnd.choice(["Internal", "External"]),
+                },
+            }, ensure_ascii=False),
+        })
+    return rows
+
+
+def parse_to_beijing(t_str):
+    """旧实现：逐行标量转换"""
+    try:
+        dt = pd.to_datetime(t_str)
+        if dt.tzinfo: dt = dt.tz_convert('Asia/Shanghai').tz_localize(None)
+        else: dt = dt + pd.Timedelta(hours=8)
+        return dt
+    except: return datetime.datetime.now()
+
+
+def legacy_day_points(records):
+    """旧路径：两张图各自逐行解析并用 strftime 比较日期"""
+    now = datetime.datetime.utcnow() + datetime.timedelta(hours=8)
+    today_str = now.strftime('%Y-%m-%d')
+    y_map = {"Past": 1, "Present": 2, "Future": 3}
+    trend, points = [], []
+    for record in records:
+        dt = parse_to_beijing(record.created_at)
+        if dt.strftime('%Y-%m-%d') == today_str:
+            trend.append({"Time": dt, "Score": record.peace})
+    for record in records:
+        dt = parse_to_beijing(record.created_at)
+        if dt.strftime('%Y-%m-%d') == today_str:
+            color = "#f97316" if "external" in str(record.focus_target).lower() else "#8b5cf6"
+            points.append({"Time": dt, "Y": y_map.get(record.time_orientation, 2), "Color": color})
+    return pd.DataFrame(trend), pd.DataFrame(points)
+
+
+def vectorized_day_frame(records):
+    start, end = day_window()
+    return day_frame(records, start, end)
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 5000
+    records = decode_history(make_rows(n))
+    legacy_trend, _ = legacy_day_points(records)
+    new = vectorized_day_frame(records)
+    assert len(legacy_trend) == len(new), (len(legacy_trend), len(new))
+
+    print(f"rows={n} today={len(new)}")
+    for name, fn in (("legacy per-row", legacy_day_points), ("vectorized", vectorized_day_frame)):
+        runs = timeit.repeat(lambda: fn(records), number=1, repeat=5)
+        print(f"{name:>16}: best {min(runs) * 1000:8.2f} ms  median {sorted(runs)[2] * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
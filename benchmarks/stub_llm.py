@@ -0,0 +1,146 @@
+"""本地 OpenAI 兼容桩服务，代替 DeepSeek 接口供基准测试使用。
+
+支持普通和流式（SSE）两种 chat.completions 响应，可配置延迟（固定秒数或每次调用一个函数取值）、
+按顺序返回的状态码和回复内容。
+usage 中的 prompt_tokens 按请求消息的字数估算，用于比较不同 prompt 的输入规模。
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RESULT = {
+    "scores": {"平静度": -2, "觉察度": 3, "能量水平": 1},
+    "key_insights": ["注意到自己在反复回想早上的对话", "身体有些紧绷"],
+    "recommendations": {"身心灵调适建议": "做三次缓慢的深呼吸，把注意力放回脚底"},
+    "risk_alert": "",
+    "focus_analysis": {"time_orientation": "Past", "focus_target": "External"},
+}
+
+_CJK = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text):
+    """粗略的 token 估算：中文字符和全角标点约 0.6 token/字，其余约 4 字符/token"""
+    cjk = len(_CJK.findall(text))
+    return round(cjk * 0.6 + (len(text) - cjk) / 4)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 对冲请求胜出后客户端会主动断开另一路流式连接
+        pass
+
+
+class StubLLMServer:
+    """在后台线程中监听 127.0.0.1 的随机端口，base_url 可直接作为 LLM_BASE_URL"""
+
+    def __init__(self, content=None, delay=0.0, chunk_size=16, statuses=(), replies=()):
+        self.content = content if content is not None else json.dumps(SAMPLE_RESULT, ensure_ascii=False)
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.statuses = list(statuses)  # 依次返回的状态码，用完后一律 200
+        self.replies = list(replies)    # 依次返回的回复内容，用完后一律 content
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = _QuietServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_status(self):
+        with self._lock:
+            self.requests += 1
+            return self.statuses.pop(0) if self.statuses else 200
+
+    def _next_reply(self):
+        with self._lock:
+            return self.replies.pop(0) if self.replies else self.content
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                status = stub._next_status()
+                delay = stub.delay() if callable(stub.delay) else stub.delay
+                if delay:
+                    time.sleep(delay)
+                if status != 200:
+                    self._send(status, b'{"error": {"message": "stub error"}}')
+                    return
+                content = stub._next_reply()
+                prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in body.get("messages", []))
+                if body.get("stream"):
+                    self._stream(content, prompt_tokens)
+                else:
+                    self._send(200, json.dumps(stub.completion(content, prompt_tokens)).encode())
+
+            def _send(self, status, payload):
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, content, prompt_tokens):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+                for event in stub.stream_events(content, prompt_tokens):
+                    data = f"data: {event}\n\n".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    @staticmethod
+    def _usage(content, prompt_tokens):
+        completion_tokens = estimate_tokens(content)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def completion(self, content=None, prompt_tokens=600):
+        content = self.content if content is None else content
+        return {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "deepseek-chat",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": self._usage(content, prompt_tokens),
+        }
+
+    def stream_events(self, content=None, prompt_tokens=600):
+        content = self.content if content is None else content
+        base = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "deepseek-chat"}
+        for i in range(0, len(content), self.chunk_size):
+            delta = {"content": content[i:i + self.chunk_size]}
+            yield json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        yield json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                          "usage": self._usage(content, prompt_tokens)})
+        yield "[DONE]"
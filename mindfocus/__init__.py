@@ -0,0 +1 @@
+"""MindfulFocus AI 的非 UI 逻辑，供 main.py、离线工具和基准测试共用。"""
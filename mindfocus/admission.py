@@ -0,0 +1,184 @@
+"""进程级 LLM 调用准入控制：并发上限 + 令牌桶限速，排队按用户轮转保证公平，队列有界、满了立即拒绝。
+
+提交分析时在脚本线程 enqueue() 取得排队票据（队列满或该用户排队过多时立即抛 AdmissionRejected），
+后台任务在调用 LLM 前 ticket.wait()，结束后 ticket.release()。票据只有在其任务线程进入等待后才会被放行，
+所以线程池排队中的任务不会占住队头。
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+
+from mindfocus.tracing import tracer
+
+WAITING, ADMITTED, RELEASED = "waiting", "admitted", "released"
+
+
+class AdmissionRejected(Exception):
+    """排队已满或该用户排队过多，立即拒绝"""
+
+
+class AdmissionTimeout(Exception):
+    """排队超过最长等待时间"""
+
+
+class Ticket:
+    def __init__(self, controller, user, seq):
+        self.controller = controller
+        self.user = user
+        self.seq = seq
+        self.state = WAITING
+        self.ready = False          # 任务线程已在等待放行
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+
+    def position(self):
+        """排队名次（1 为下一个放行），已放行或已结束时为 0"""
+        return self.controller.position(self)
+
+    def wait(self, timeout=None):
+        self.controller.wait(self, timeout)
+
+    def release(self):
+        self.controller.release(self)
+
+
+class AdmissionController:
+    """max_concurrent 为同时进行的 LLM 调用上限；rate 为每秒放行数（0 不限速），最多攒 burst 个；
+    max_queue 为全局排队上限，max_per_user 为单个用户同时排队的上限"""
+
+    def __init__(self, max_concurrent=4, rate=0.0, burst=4, max_queue=32, max_per_user=2, clock=time.monotonic):
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._refilled = clock()
+        self._queues = OrderedDict()     # user -> deque[Ticket]，按用户首次排队的顺序轮转
+        self._seq = itertools.count(1)
+        self._cond = threading.Condition()
+
+    # ---- 排队 ----
+    def enqueue(self, user):
+        with self._cond:
+            waiting = sum(len(q) for q in self._queues.values())
+            if waiting >= self.max_queue:
+                self._reject("full")
+                raise AdmissionRejected(f"当前排队人数已达上限 ({self.max_queue})，请稍后再试")
+            if len(self._queues.get(user, ())) >= self.max_per_user:
+                self._reject("per_user")
+                raise AdmissionRejected("你已有分析在排队，请等待完成后再提交")
+            ticket = Ticket(self, user, next(self._seq))
+            self._queues.setdefault(user, deque()).append(ticket)
+            self._report()
+            return ticket
+
+    def _order(self):
+        """全部排队票据的放行顺序：各用户队头轮流，用户内先来先到"""
+        queues = [list(q) for q in self._queues.values()]
+        order = []
+        for i in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[i] for q in queues if i < len(q))
+        return order
+
+    def position(self, ticket):
+        with self._cond:
+            if ticket.state != WAITING:
+                return 0
+            return self._order().index(ticket) + 1
+
+    def depth(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    # ---- 放行 ----
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _next_ready(self):
+        return next((t for t in self._order() if t.ready), None)
+
+    def wait(self, ticket, timeout=None):
+        """阻塞到 ticket 被放行；timeout 秒内未放行则移出队列并抛 AdmissionTimeout"""
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            ticket.ready = True
+            while True:
+                if ticket.state != WAITING:
+                    return
+                wake = None
+                if self.active < self.max_concurrent and self._next_ready() is ticket:
+                    if self.rate:
+                        self._refill()
+                    if not self.rate or self._tokens >= 1:
+                        self._admit(ticket)
+                        return
+                    wake = (1 - self._tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._remove(ticket)
+                        ticket.state = RELEASED
+                        self._cond.notify_all()
+                        raise AdmissionTimeout("排队等待超时，请稍后再试")
+                    wake = remaining if wake is None else min(wake, remaining)
+                self._cond.wait(wake)
+
+    def _admit(self, ticket):
+        if self.rate:
+            self._tokens -= 1
+        self._remove(ticket)
+        # 放行后该用户移到轮转末尾
+        if ticket.user in self._queues:
+            self._queues.move_to_end(ticket.user)
+        ticket.state = ADMITTED
+        ticket.admitted_at = self._clock()
+        self.active += 1
+        self.admitted += 1
+        tracer.observe("mindfocus_admission_wait_seconds", ticket.admitted_at - ticket.enqueued_at)
+        self._report()
+        self._cond.notify_all()
+
+    def _remove(self, ticket):
+        queue = self._queues.get(ticket.user)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.user]
+
+    def release(self, ticket):
+        """结束一次调用或放弃排队；可重复调用"""
+        with self._cond:
+            if ticket.state == ADMITTED:
+                self.active -= 1
+            elif ticket.state == WAITING:
+                self._remove(ticket)
+            ticket.state = RELEASED
+            self._report()
+            self._cond.notify_all()
+
+    # ---- 指标 ----
+    def _reject(self, reason):
+        self.rejected += 1
+        tracer.inc("mindfocus_admission_rejected_total", reason=reason)
+
+    def _report(self):
+        tracer.gauge("mindfocus_admission_queue_depth", sum(len(q) for q in self._queues.values()))
+        tracer.gauge("mindfocus_admission_active", self.active)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "users_queued": len(self._queues),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,152 @@
+"""情绪分析的模型调用与结果解析，Streamlit 页面和离线工具共用同一条路径。"""
+import json
+import re
+
+from mindfocus.records import TIME_ORIENTATIONS
+from mindfocus.streaming import PartialJSON
+
+MODEL = "deepseek-chat"
+SCORE_NAMES = ("平静度", "觉察度", "能量水平")
+FOCUS_TARGETS = ("Internal", "External")
+REPAIR_PROMPT = "上面的输出不符合要求：{errors}。请只输出修正后的完整 JSON。"
+
+
+def clean_json_string(s):
+    if not s:
+        return "{}"
+    s = re.sub(r'```json\s*', '', s)
+    s = re.sub(r'```\s*', '', s)
+    match = re.search(r'\{[\s\S]*\}', s)
+    if match:
+        s = match.group()
+    s = re.sub(r',\s*\}', '}', s)
+    s = re.sub(r',\s*\]', ']', s)
+    s = re.sub(r':\s*\+(\d)', r': \1', s)
+    return s.strip()
+
+
+def build_messages(system_prompt, text):
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}]
+
+
+def validate_result(result):
+    """按页面和存储用到的字段校验分析结果，返回问题列表（空列表为合格）"""
+    if not isinstance(result, dict):
+        return ["顶层不是 JSON 对象"]
+    errors = []
+    scores = result.get("scores")
+    if not isinstance(scores, dict):
+        errors.append("缺少 scores 对象")
+    else:
+        for name in SCORE_NAMES:
+            value = scores.get(name)
+            if isinstance(value, bool) or not isinstance(value, int) or not -5 <= value <= 5:
+                errors.append(f"scores.{name} 应为 -5~5 的整数")
+    insights = result.get("key_insights")
+    if not isinstance(insights, list) or not insights or not all(isinstance(i, str) for i in insights):
+        errors.append("key_insights 应为非空字符串数组")
+    recs = result.get("recommendations")
+    if not isinstance(recs, dict) or not recs or not all(isinstance(v, str) for v in recs.values()):
+        errors.append("recommendations 应为字符串值的对象")
+    if result.get("risk_alert") is not None and not isinstance(result["risk_alert"], str):
+        errors.append("risk_alert 应为字符串或 null")
+    if "summary" in result and not isinstance(result["summary"], str):
+        errors.append("summary 应为字符串")
+    focus = result.get("focus_analysis")
+    if not isinstance(focus, dict):
+        errors.append("缺少 focus_analysis 对象")
+    else:
+        if focus.get("time_orientation") not in TIME_ORIENTATIONS:
+            errors.append(f"focus_analysis.time_orientation 应为 {'/'.join(TIME_ORIENTATIONS)} 之一")
+        if focus.get("focus_target") not in FOCUS_TARGETS:
+            errors.append(f"focus_analysis.focus_target 应为 {'/'.join(FOCUS_TARGETS)} 之一")
+    return errors
+
+
+def _record_usage(meta, usage):
+    if usage is None:
+        return
+    # 修复重试时累加两次调用的用量
+    total = meta.setdefault("usage", {"prompt_tokens": 0, "completion_tokens": 0})
+    total["prompt_tokens"] += usage.prompt_tokens
+    total["completion_tokens"] += usage.completion_tokens
+
+
+def _complete(client, model, messages, temperature, on_partial, meta, extra):
+    """一次 chat 调用，返回完整文本；流式时边收边回调 on_partial"""
+    stream = on_partial is not None
+    try:
+        response, attempts = client.chat(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=stream,
+            **({"stream_options": {"include_usage": True}} if stream else {}),
+            **extra
+        )
+    except Exception as e:
+        if hasattr(e, "attempts"):
+            meta["attempts"] = meta.get("attempts", 0) + e.attempts
+        raise
+    meta["attempts"] = meta.get("attempts", 0) + attempts
+    if not stream:
+        _record_usage(meta, response.usage)
+        return response.choices[0].message.content or ""
+    parser = PartialJSON()
+    parts = []
+    for chunk in response:
+        if getattr(chunk, "usage", None) is not None:
+            _record_usage(meta, chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content or ""
+        parts.append(delta)
+        partial = parser.feed(delta)
+        if partial is not None:
+            on_partial(partial, parser.completed)
+    return "".join(parts)
+
+
+def _parse_structured(content):
+    """JSON mode 下的输出直接解析并校验，返回 (结果, 问题列表)"""
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError as e:
+        return None, [f"不是合法 JSON（{e.msg}）"]
+    return result, validate_result(result)
+
+
+def request_analysis(client, text, system_prompt, temperature, on_partial=None, meta=None, structured=False,
+                     model=MODEL):
+    """用 LLMClient 分析一条输入，返回结果 dict，失败时返回 {"error": ...}。
+
+    传入 on_partial 时走流式模式，每当有字段完整输出就回调 on_partial(partial, completed)；
+    meta 不为 None 时写入 attempts（LLM 尝试次数）、usage（prompt/completion token 数）和 repairs（修复重试次数）。
+    structured 为 True 时请求 JSON mode 输出并按 validate_result 校验，不合格时把问题发回模型修复一次
+    （修复调用不走流式）；否则沿用 clean_json_string 的文本清理。
+    """
+    meta = {} if meta is None else meta
+    meta["repairs"] = 0
+    messages = build_messages(system_prompt, text)
+    extra = {"response_format": {"type": "json_object"}} if structured else {}
+    try:
+        content = _complete(client, model, messages, temperature, on_partial, meta, extra)
+        if not structured:
+            try:
+                return json.loads(clean_json_string(content))
+            except json.JSONDecodeError as e:
+                return {"error": f"JSON解析失败: {str(e)}", "raw": content[:500]}
+        result, errors = _parse_structured(content)
+        if errors:
+            meta["repairs"] = 1
+            messages = messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": REPAIR_PROMPT.format(errors="；".join(errors))},
+            ]
+            content = _complete(client, model, messages, temperature, None, meta, extra)
+            result, errors = _parse_structured(content)
+        if errors:
+            return {"error": f"结果校验失败: {'；'.join(errors)}", "raw": content[:500]}
+        return result
+    except Exception as e:
+        return {"error": str(e)}
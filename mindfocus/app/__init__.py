@@ -0,0 +1,13 @@
+"""Streamlit 页面层，从 main.py 按功能拆出：
+
+- resources：配置读取和进程级资源（存储、共享状态、追踪），登录页也要用，只依赖标准库和轻量模块；
+- session：URL token、登录校验和用户设置；
+- login：登录页；
+- data：配额、历史、图表数据、相似时刻和导出的会话缓存与写库；
+- analysis_jobs：LLM 调用、结果缓存、准入和后台分析任务；
+- components：仪表盘上的各个 UI 组件；
+- dashboard：登录后的整页。
+
+main.py 只在登录后才导入 dashboard，pandas / altair / numpy 随之加载；openai / httpx 推迟到第一次分析时。
+登录页因此不必为这些重依赖付出导入时间。
+"""
@@ -0,0 +1,157 @@
+"""分析：LLM 路由、结果缓存、准入控制和后台分析任务。任务状态同步到共享状态，其他副本可以接续显示。
+LLM 客户端（openai / httpx）在第一次分析时才导入。"""
+import datetime
+import time
+
+import streamlit as st
+
+from mindfocus.admission import AdmissionController
+from mindfocus.app.data import save_to_db
+from mindfocus.app.resources import get_secret, init_shared_state
+from mindfocus.app.session import ensure_settings
+from mindfocus.jobs import FAILED, QUEUED, AnalysisJob, JobRunner
+from mindfocus.prompt import PROMPT_MODES, effective_prompt, is_structured
+from mindfocus.result_cache import ResultCache, cache_key
+from mindfocus.tracing import tracer
+
+
+STREAM_ANALYSIS = True  # 流式输出，分数和洞察边生成边显示
+
+@st.cache_resource
+def init_llm_router(api_key):
+    """进程级共享的 LLM 路由：各后端复用连接池，慢请求对冲、失败回退、熔断；
+    后端列表、超时、重试和对冲阈值可在 secrets 中配置"""
+    from mindfocus.router import router_from_settings
+    return router_from_settings(get_secret, api_key)
+
+@st.cache_resource
+def init_result_cache():
+    """进程级分析结果缓存，重复提交相同内容时直接复用结果"""
+    return ResultCache(
+        max_entries=int(get_secret("RESULT_CACHE_SIZE", 1000)),
+        ttl_seconds=float(get_secret("RESULT_CACHE_TTL", 3600)),
+        name="analysis",
+    )
+
+def cache_hit_uses_quota():
+    """命中缓存时是否仍扣配额，默认不扣"""
+    return bool(get_secret("CACHE_HIT_USES_QUOTA", False))
+
+JOB_STATE_TTL = 600       # 结束的任务保留多久（本地和共享状态）
+JOB_STALE_SECONDS = 300   # 其他副本上的任务超过这么久仍未结束，按已中断处理（如该副本已退出）
+
+@st.cache_resource
+def init_job_runner():
+    """进程级后台分析线程池，任务跨 rerun 存活；状态同步写入共享状态"""
+    return JobRunner(
+        max_workers=int(get_secret("ANALYSIS_WORKERS", 8)),
+        max_pending=int(get_secret("ANALYSIS_MAX_PENDING", 64)),
+        keep_seconds=JOB_STATE_TTL,
+        listener=publish_job,
+    )
+
+def publish_job(job):
+    """任务状态写入共享状态（多在后台线程调用）；提交时登记为该用户的进行中任务，结束时注销"""
+    state = init_shared_state()
+    state.set(f"job:{job.id}", job.state(), ttl=JOB_STATE_TTL)
+    key = f"active_job:{job.username}"
+    if job.status == QUEUED:
+        state.set(key, job.id, ttl=JOB_STATE_TTL)
+    elif job.finished and state.get(key) == job.id:
+        state.delete(key)
+
+def get_job(job_id):
+    """本副本上的任务直接返回；否则从共享状态还原只读副本（任务在其他副本上执行）"""
+    if job_id is None:
+        return None
+    job = init_job_runner().get(job_id)
+    if job is not None:
+        return job
+    data = init_shared_state().get(f"job:{job_id}")
+    if data is None:
+        return None
+    job = AnalysisJob.from_state(data)
+    if not job.finished and time.time() - job.created_at > JOB_STALE_SECONDS:
+        job.status, job.error = FAILED, "分析任务已中断，请重新提交"
+    return job
+
+def adopt_active_job(username):
+    """会话中没有任务时，接上该用户在其他会话或副本上提交、仍在进行的任务（如刷新页面、会话换了副本）"""
+    job = get_job(init_shared_state().get(f"active_job:{username}"))
+    return job if job is not None and not job.finished else None
+
+@st.cache_resource
+def init_admission():
+    """进程级 LLM 调用准入：并发上限 + 令牌桶限速，按用户轮转排队，队列满时立即拒绝"""
+    return AdmissionController(
+        max_concurrent=int(get_secret("LLM_MAX_CONCURRENT", 4)),
+        rate=float(get_secret("LLM_RATE", 0)),
+        burst=int(get_secret("LLM_BURST", 4)),
+        max_queue=int(get_secret("ADMISSION_MAX_QUEUE", 32)),
+        max_per_user=int(get_secret("ADMISSION_MAX_PER_USER", 2)),
+    )
+
+def prompt_mode():
+    """legacy：完整评分表 + 文本清理；compact：紧凑评分表 + JSON mode 输出与校验（仅对默认 prompt，定制 prompt 按 legacy 处理）"""
+    mode = get_secret("PROMPT_MODE", "legacy")
+    return mode if mode in PROMPT_MODES else "legacy"
+
+def resolve_prompt():
+    """当前用户生效的 (system_prompt, temperature)：定制 prompt 优先，temperature 默认 0.4"""
+    ensure_settings(st.session_state.username)
+    return effective_prompt(st.session_state.get('custom_prompt'), st.session_state.get('temperature'), prompt_mode())
+
+def analyze_emotion(text, api_key, system_prompt, temperature, on_partial=None, meta=None, ticket=None):
+    """调用模型分析情绪；传入 on_partial 时走流式模式，每当有字段完整输出就回调一次。
+    meta 不为 None 时写入 cached（是否命中缓存）和 attempts（LLM 尝试次数）。
+    传入准入票据时，未命中缓存的调用先排队等待放行，调用结束即归还"""
+    meta = {} if meta is None else meta
+    
+    # 相同 prompt + temperature + 输入直接返回缓存结果
+    cache = init_result_cache()
+    key = cache_key(system_prompt, temperature, text)
+    cached = cache.get(key)
+    meta["cached"] = cached is not None
+    if cached is not None:
+        return cached
+    
+    if ticket is not None:
+        with tracer.span("admission.wait"):
+            ticket.wait(timeout=float(get_secret("ADMISSION_MAX_WAIT", 120)))
+    with tracer.span("llm.analyze") as span:
+        try:
+            result = init_llm_router(api_key).analyze(text, system_prompt, temperature, on_partial=on_partial,
+                                                      meta=meta, structured=is_structured(system_prompt))
+        finally:
+            if ticket is not None:
+                ticket.release()
+        usage = meta.get("usage") or {}
+        repairs = meta.get("repairs", 0)
+        span.set(retries=meta.get("attempts", 1) - 1 - repairs, repairs=repairs, backend=meta.get("backend"),
+                 hedged=meta.get("hedged"), prompt_tokens=usage.get("prompt_tokens"),
+                 completion_tokens=usage.get("completion_tokens"))
+    if isinstance(result, dict) and "error" not in result:
+        cache.put(key, result)
+    return result
+
+def run_analysis_job(job, text, api_key, system_prompt, temperature, ticket=None):
+    """在后台工作线程中执行：分析 -> 合并写入日志和配额，不访问 st.session_state"""
+    with tracer.trace("job") as trace:
+        try:
+            result = analyze_emotion(text, api_key, system_prompt, temperature,
+                                     on_partial=job.set_partial if STREAM_ANALYSIS else None, meta=job.meta,
+                                     ticket=ticket)
+        finally:
+            # 命中缓存或排队超时时票据还没归还
+            if ticket is not None:
+                ticket.release()
+        trace.set(cached=job.meta.get("cached"))
+        if "error" in result:
+            raise RuntimeError(f"分析失败: {result['error']}")
+        result['date'] = datetime.date.today().isoformat()
+        count_usage = not job.meta.get("cached") or cache_hit_uses_quota()
+        try:
+            row = save_to_db(job.username, text, result, count_usage=count_usage)
+        except Exception as e:
+            raise RuntimeError(f"保存失败: {e}")
+        return {"result": result, "row": row}
@@ -0,0 +1,216 @@
+"""仪表盘上的 UI 组件：顶栏、温度计卡片、洞察、列表行、相似时刻、历史记录分页和分析进度。"""
+import html
+import re
+
+import streamlit as st
+
+from mindfocus.app.analysis_jobs import get_job
+from mindfocus.app.data import (BROWSER_PAGE_SIZE, browser_cache, get_browser_page, get_log_record,
+                                get_similar_moments, get_today_usage, list_row)
+from mindfocus.records import decode_record, record_from_result
+from mindfocus.timeline import to_beijing
+from mindfocus.tracing import tracer
+
+
+def safe_text(text):
+    """安全处理文本，防止HTML注入"""
+    if not text:
+        return ""
+    text = html.escape(str(text))
+    text = re.sub(r'&lt;/?div&gt;', '', text)
+    text = re.sub(r'&lt;/?p&gt;', '', text)
+    text = re.sub(r'&lt;[^&]*&gt;', '', text)
+    return text.strip()
+
+def should_show_risk_alert(record):
+    """判断是否需要显示风险提示"""
+    risk_alert = record.risk_alert
+    if record.peace <= -3 and risk_alert and str(risk_alert).lower() != "null":
+        return True
+    return False
+
+@tracer.wrap("render.header")
+def render_header(username, daily_limit):
+    used = get_today_usage(username)
+    remaining = daily_limit - used
+    color = "#10b981" if remaining > 10 else "#f59e0b" if remaining > 3 else "#ef4444"
+    
+    # 添加顶部空白，避免被Streamlit工具栏遮挡
+    st.markdown("<div style='height: 36px;'></div>", unsafe_allow_html=True)
+    
+    # 单行HTML布局，左侧logo右侧用户信息
+    st.markdown(f"""<div style="display: flex; align-items: center; justify-content: space-between; padding: 8px 0; margin-bottom: 8px;">
+        <div style="display: flex; align-items: center; gap: 10px;">
+            <div style="background: linear-gradient(135deg, #14b8a6, #3b82f6); color: white; padding: 8px 10px; border-radius: 12px; font-size: 20px; line-height: 1; box-shadow: 0 2px 8px rgba(20,184,166,0.3);">🧠</div>
+            <span style="font-weight: 700; font-size: 16px; color: #1e293b;">MindfulFocus AI</span>
+        </div>
+        <div style="display: flex; align-items: center; gap: 10px;">
+            <span style="font-size: 12px; color: #64748b;">今日 <span style="font-weight: 600; color: {color};">{remaining}/{daily_limit}</span></span>
+            <span style="background: #f1f5f9; padding: 4px 10px; border-radius: 12px; font-size: 12px; color: #475569;">👤 {safe_text(username)}</span>
+        </div>
+    </div>""", unsafe_allow_html=True)
+
+@tracer.wrap("render.gauge_card")
+def render_gauge_card(record):
+    """渲染温度计卡片"""
+    def gauge(label, score, icon, theme):
+        percent = (score + 5) * 10
+        # 限制小方块位置，避免超出边界
+        badge_bottom = min(max(percent, 8), 92)
+        colors = {"peace": ("#11998e", "#38ef7d", "#0d9488"), "awareness": ("#8E2DE2", "#4A00E0", "#7c3aed"), "energy": ("#f97316", "#fbbf24", "#ea580c")}
+        c = colors.get(theme)
+        badge = f"+{score}" if score > 0 else str(score)
+        return f"""<div style="display: flex; flex-direction: column; align-items: center; width: 90px;">
+            <div style="display: flex; align-items: center; gap: 4px;">
+                <div style="position: relative; height: 130px; width: 40px; background: #f1f5f9; border-radius: 20px; overflow: visible; border: 1px solid #e2e8f0;">
+                    <div style="position: absolute; bottom: 0; width: 100%; height: {percent}%; background: linear-gradient(to top, {c[0]}, {c[1]}); opacity: 0.85; border-radius: 0 0 20px 20px;"></div>
+                    <div style="position: absolute; bottom: {badge_bottom}%; left: 50%; transform: translate(-50%, 50%); background: white; color: {c[2]}; font-weight: 700; font-size: 10px; padding: 2px 6px; border-radius: 5px; border: 2px solid {c[2]}; box-shadow: 0 2px 6px rgba(0,0,0,0.1); white-space: nowrap;">{badge}</div>
+                </div>
+                <div style="display: flex; flex-direction: column; justify-content: space-between; height: 130px; padding: 4px 0;">
+                    <span style="font-size: 9px; color: #94a3b8;">+5</span>
+                    <span style="font-size: 9px; color: #94a3b8;">0</span>
+                    <span style="font-size: 9px; color: #94a3b8;">-5</span>
+                </div>
+            </div>
+            <div style="margin-top: 10px; text-align: center; width: 44px;">
+                <div style="font-size: 14px; line-height: 1;">{icon}</div>
+                <div style="font-size: 11px; font-weight: 600; color: #64748b; margin-top: 4px;">{safe_text(label)}</div>
+            </div>
+        </div>"""
+    
+    st.markdown(f"""<div style="background: white; padding: 20px 16px; border-radius: 16px; border: 1px solid #e2e8f0; margin-bottom: 12px;">
+        <div style="display: flex; justify-content: space-around; align-items: flex-start;">
+            {gauge("平静度", record.peace, "🕊️", "peace")}
+            {gauge("觉察度", record.awareness, "👁️", "awareness")}
+            {gauge("能量值", record.energy, "🔋", "energy")}
+        </div>
+    </div>""", unsafe_allow_html=True)
+
+@tracer.wrap("render.insights")
+def render_insights(record, show_success=False):
+    """渲染洞察和行动指南"""
+    safe_insights = [safe_text(i) for i in record.insights]
+    
+    items = "".join([f'<li style="margin-bottom: 6px; color: #581c87; font-size: 14px; line-height: 1.5;">• {i}</li>' for i in safe_insights])
+    
+    show_risk = should_show_risk_alert(record)
+    
+    if not show_risk:
+        action_content = f'<p style="margin: 0; color: #166534; font-size: 14px; line-height: 1.6;">{safe_text(record.recommendation)}</p>'
+    else:
+        action_content = f'''<div style="background: #fffbeb; padding: 12px 16px; border-radius: 10px; border: 1px solid #fde68a;">
+            <div style="display: flex; align-items: center; gap: 6px; margin-bottom: 8px;">
+                <span style="font-size: 14px;">⚠️</span>
+                <span style="font-size: 13px; font-weight: 600; color: #f59e0b;">温馨提示</span>
+            </div>
+            <p style="margin: 0; color: #292524; font-size: 14px; line-height: 1.6;">{safe_text(record.risk_alert)}</p>
+        </div>'''
+    
+    st.markdown(f"""<div style="background: #faf5ff; padding: 16px; border-radius: 16px; border: 1px solid #e9d5ff; margin-bottom: 10px;">
+        <h4 style="margin: 0 0 10px; font-size: 14px; color: #7c3aed;">💡 深度洞察</h4>
+        <ul style="margin: 0; padding: 0; list-style: none;">{items}</ul>
+    </div>""", unsafe_allow_html=True)
+    
+    # 显示分析完成提示（使用toast，显示时间稍长）
+    if show_success:
+        st.toast("✅ 分析完成！", icon="✅")
+    
+    st.markdown(f"""<div style="background: #f0fdf4; padding: 16px; border-radius: 16px; border: 1px solid #bbf7d0; margin-bottom: 12px;">
+        <h4 style="margin: 0 0 10px; font-size: 14px; color: #16a34a;">❤️ 行动指南</h4>
+        {action_content}
+    </div>""", unsafe_allow_html=True)
+
+ORIENTATION_TEXT = {"Past": "过去", "Present": "当下", "Future": "未来"}
+
+def render_log_line(row, when):
+    """一条列表行：时间、三项分数、时间维度和原文摘要"""
+    scores = " · ".join(
+        f"{label} {'-' if row[name] is None else (f'+{row[name]}' if row[name] > 0 else row[name])}"
+        for name, label in (("peace", "平静"), ("awareness", "觉察"), ("energy", "能量"))
+    )
+    orientation = ORIENTATION_TEXT.get(row["time_orientation"], "")
+    preview = safe_text((row["user_input"] or "")[:80]) + ("…" if len(row["user_input"] or "") > 80 else "")
+    st.markdown(f"""<div style="background: white; padding: 10px 14px; border-radius: 12px; border: 1px solid #e2e8f0; margin-bottom: 4px;">
+        <div style="display: flex; justify-content: space-between; font-size: 12px; color: #64748b;">
+            <span>{when}{'（同步中）' if row["id"] is None else ''}</span><span>{scores}{' · ' + orientation if orientation else ''}</span>
+        </div>
+        <div style="margin-top: 6px; font-size: 14px; color: #334155; line-height: 1.5;">{preview}</div>
+    </div>""", unsafe_allow_html=True)
+
+@tracer.wrap("render.similar_moments")
+def render_similar_moments(username, row, record):
+    """最新结果下方：上一次有类似感受是什么时候"""
+    rows = get_similar_moments(username, row, record)
+    if not rows:
+        return
+    st.markdown("""<div style="padding: 4px 0;">
+        <span style="font-size: 14px; font-weight: 600; color: #334155;">🔁 相似的过去时刻</span>
+    </div>""", unsafe_allow_html=True)
+    times = to_beijing([r["created_at"] for r in rows]).dt.strftime("%Y-%m-%d %H:%M").fillna("")
+    for similar, when in zip(rows, times):
+        render_log_line(similar, when)
+
+@tracer.wrap("render.history_browser")
+def render_history_browser(username, history_rows):
+    """历史记录：每页约 20 条，只显示时间、原文摘要和分数，点「查看分析」时才取完整结果"""
+    cache = browser_cache(username)
+    first_page = [list_row(row, decode_record(row)) for row in history_rows]
+    rows = get_browser_page(username, cache["page"], first_page)
+    if not rows:
+        st.info("暂无记录" if cache["page"] == 0 else "没有更早的记录了")
+    times = to_beijing([r["created_at"] for r in rows]).dt.strftime("%m-%d %H:%M").fillna("") if rows else []
+
+    def toggle(row_id):
+        cache["open"] = None if cache["open"] == row_id else row_id
+
+    for row, when in zip(rows, times):
+        render_log_line(row, when)
+        if row["id"] is None:
+            continue
+        is_open = cache["open"] == row["id"]
+        st.button("收起" if is_open else "查看分析", key=f"history_open_{row['id']}", on_click=toggle, args=(row["id"],))
+        if is_open:
+            record = get_log_record(username, row)
+            if record is None:
+                st.warning("这条记录的分析结果无法解析")
+            else:
+                render_gauge_card(record)
+                render_insights(record)
+
+    def go(page):
+        cache["page"] = page
+        cache["open"] = None
+
+    col_newer, col_page, col_older = st.columns([1, 1, 1])
+    with col_newer:
+        st.button("← 较新", key="history_newer", disabled=cache["page"] == 0, on_click=go, args=(cache["page"] - 1,))
+    with col_page:
+        st.markdown(f"<div style='text-align: center; color: #64748b; font-size: 13px; padding-top: 8px;'>第 {cache['page'] + 1} 页</div>", unsafe_allow_html=True)
+    with col_older:
+        st.button("较早 →", key="history_older", disabled=len(rows) < BROWSER_PAGE_SIZE, on_click=go, args=(cache["page"] + 1,))
+
+JOB_POLL_SECONDS = 0.5
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+@tracer.wrap("render.analysis_progress")
+def render_analysis_progress(job_id, fallback):
+    """分析进行中：只重跑这一小段来轮询任务状态，任务结束后触发整页 rerun"""
+    job = get_job(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    status, partial, completed = job.snapshot()
+    ticket = st.session_state.get("analysis_ticket")
+    position = ticket.position() if ticket is not None else 0
+    label = f"⏳ 排队中，第 {position} 位" if position else "🧠 AI分析中..."
+    st.markdown(f"""<div style="padding: 4px 0;">
+        <span style="font-size: 14px; color: #0d9488;">{label}</span>
+    </div>""", unsafe_allow_html=True)
+    # scores 输出完整后立即显示温度计，洞察随输出逐条补充
+    if partial is not None and "scores" in completed:
+        record = record_from_result(partial)
+        render_gauge_card(record)
+        if record.insights:
+            render_insights(record)
+    elif fallback is not None:
+        render_gauge_card(fallback)
+        render_insights(fallback)
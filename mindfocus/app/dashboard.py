@@ -0,0 +1,181 @@
+"""登录后的仪表盘：记录与分析、注意力地图、长期趋势和历史记录四个 tab。
+main.py 在登录后才导入本模块，图表用的 pandas / altair 随之加载，登录页不受影响。"""
+import datetime
+import os
+
+import streamlit as st
+
+from mindfocus.admission import AdmissionRejected
+from mindfocus.app.analysis_jobs import (adopt_active_job, get_job, init_admission, init_job_runner, resolve_prompt,
+                                         run_analysis_job)
+from mindfocus.app.components import (render_analysis_progress, render_gauge_card, render_header, render_history_browser,
+                                      render_insights, render_similar_moments)
+from mindfocus.app.data import (build_export, check_quota, export_reader, get_day_points, get_history, get_rollups,
+                                history_cache, merge_history, prefetch_dashboard, similar_top_k, sync_generation)
+from mindfocus.charts import render_focus_map, render_long_trend, render_trend
+from mindfocus.export import FORMATS
+from mindfocus.jobs import DONE, JobQueueFull
+from mindfocus.records import decode_history, decode_record
+from mindfocus.rollup import PERIODS, focus_mix_frame, score_frame
+from mindfocus.timeline import day_window, points_frame
+
+
+def render_dashboard(api_key):
+    """整页仪表盘；分析任务提交后由后台线程执行，本函数只负责收尾和渲染"""
+    username = st.session_state.username
+    daily_limit = st.session_state.daily_limit
+
+    # 后台任务结束后在脚本线程收尾：新记录并入历史缓存，记录提示信息
+    analysis_job = get_job(st.session_state.analysis_job_id)
+    if analysis_job is None and st.session_state.analysis_job_id is None:
+        analysis_job = adopt_active_job(username)
+        if analysis_job is not None:
+            st.session_state.analysis_job_id = analysis_job.id
+    if analysis_job is None or analysis_job.finished:
+        st.session_state.analysis_job_id = None
+        st.session_state.analysis_ticket = None
+    if analysis_job is not None and analysis_job.finished:
+        if analysis_job.status == DONE:
+            row = analysis_job.result.get("row")
+            cache = history_cache(username)
+            if row and cache["loaded"]:
+                merge_history(cache, [row])
+            st.session_state.pop(f"_rollup_cache_{username}", None)
+            st.session_state.pop(f"_points_cache_{username}", None)
+            st.session_state.pop(f"_browser_cache_{username}", None)
+            st.session_state.just_completed = True
+        else:
+            st.session_state.analysis_error = analysis_job.error
+        analysis_job = None
+    is_analyzing = analysis_job is not None
+
+    sync_generation(username)
+    prefetch_dashboard(username)
+    render_header(username, daily_limit)
+    history_rows = get_history(username)
+    records = decode_history(history_rows)
+    # 两张图共用同一份当日窄列数据，只查 local_day = 今天的分数和标签列
+    start_dt, end_dt = day_window()
+    today_df = points_frame(get_day_points(username, start_dt.date().isoformat()), start_dt, end_dt)
+
+    tab1, tab2, tab3, tab4 = st.tabs(["✨ 情绪资产记录", "🗺️ 注意力地图", "📈 长期趋势", "📚 历史记录"])
+
+    with tab1:
+        # 情绪波动图在最顶部
+        render_trend(today_df, start_dt, end_dt)
+
+        # 最近一次结果；分析进行中时由轮询片段逐步替换为新结果
+        latest = records[0] if records else None
+        if is_analyzing:
+            render_analysis_progress(analysis_job.id, latest)
+        elif latest is not None:
+            # 检查是否刚完成分析，显示成功提示
+            show_success = st.session_state.just_completed
+            render_gauge_card(latest)
+            render_insights(latest, show_success=show_success)
+            if similar_top_k() > 0:
+                # decode_record 按 id 记忆化，同一行解码结果是同一个对象
+                latest_row = next((r for r in history_rows if decode_record(r) is latest), None)
+                if latest_row is not None:
+                    render_similar_moments(username, latest_row, latest)
+            # 显示后清除标记
+            if show_success:
+                st.session_state.just_completed = False
+
+        # 去掉引导语卡片，保留文字
+        st.markdown("""<div style="padding: 8px 0 4px 0;">
+            <span style="font-size: 14px; font-weight: 600; color: #334155;">此刻你的感受如何？</span>
+        </div>""", unsafe_allow_html=True)
+
+        user_input = st.text_area("", height=120, placeholder="描述此刻的身体感受、念头或所处情境...", label_visibility="collapsed")
+
+        has_quota, remaining, used = check_quota(username, daily_limit)
+
+        # 按钮和加载状态
+        is_disabled = not has_quota or is_analyzing
+
+        # 先渲染按钮
+        submitted = st.button("提交", disabled=is_disabled)
+
+        if submitted:
+            if not user_input:
+                st.warning("请先输入内容")
+            elif not api_key:
+                st.error("API Key 未配置")
+            else:
+                # 提交到后台线程池，脚本线程不等待 LLM
+                system_prompt, temperature = resolve_prompt()
+                ticket = None
+                try:
+                    # 先在准入队列里占位，排满时立即拒绝，不进线程池
+                    ticket = init_admission().enqueue(username)
+                    job = init_job_runner().submit(username, run_analysis_job, user_input, api_key, system_prompt, temperature, ticket)
+                    st.session_state.analysis_job_id = job.id
+                    st.session_state.analysis_ticket = ticket
+                    st.rerun()
+                except AdmissionRejected as e:
+                    st.error(str(e))
+                except JobQueueFull:
+                    ticket.release()
+                    st.error("当前分析人数较多，请稍后再试")
+
+        if st.session_state.analysis_error:
+            st.error(st.session_state.analysis_error)
+            st.session_state.analysis_error = None
+
+        if not has_quota:
+            st.warning(f"⚠️ 今日配额已用完 ({daily_limit}/{daily_limit})")
+
+    with tab2:
+        render_focus_map(today_df, start_dt, end_dt)
+
+        if records:
+            time_ori = records[0].time_orientation
+            target = records[0].focus_target
+
+            time_labels = {"Past": "过去", "Present": "当下", "Future": "未来"}
+            target_labels = {"Internal": "内在感受", "External": "外在事件"}
+
+            st.markdown(f"""<div style="background: white; padding: 20px; border-radius: 16px; border: 1px solid #e2e8f0; margin-top: 12px;">
+                <h4 style="margin: 0 0 12px; font-size: 15px; color: #334155;">🎯 最近一次注意力焦点</h4>
+                <div style="display: flex; gap: 12px;">
+                    <div style="flex: 1; padding: 14px; background: #f0fdf4; border-radius: 12px; text-align: center;">
+                        <div style="font-size: 12px; color: #64748b; margin-bottom: 4px;">时间维度</div>
+                        <div style="font-size: 18px; font-weight: 600; color: #16a34a;">{time_labels.get(time_ori, time_ori)}</div>
+                    </div>
+                    <div style="flex: 1; padding: 14px; background: #faf5ff; border-radius: 12px; text-align: center;">
+                        <div style="font-size: 12px; color: #64748b; margin-bottom: 4px;">关注对象</div>
+                        <div style="font-size: 18px; font-weight: 600; color: #7c3aed;">{target_labels.get(target, target)}</div>
+                    </div>
+                </div>
+            </div>""", unsafe_allow_html=True)
+        else:
+            st.info("暂无数据，请先在「情绪资产记录」页面记录。")
+
+    with tab3:
+        period_labels = {"week": "近 7 天", "month": "近 30 天", "year": "近一年（按周）"}
+        period = st.radio("范围", list(PERIODS), format_func=period_labels.get, horizontal=True, label_visibility="collapsed", key="trend_period")
+        # 只读日汇总表，一年最多 365 行
+        rollups = get_rollups(username, period)
+        freq = PERIODS[period][1]
+        render_long_trend(score_frame(rollups, freq), focus_mix_frame(rollups, freq), period_labels[period])
+
+        with st.expander("📦 导出全部记录"):
+            fmt = st.radio("格式", list(FORMATS), format_func=str.upper, horizontal=True, key="export_format")
+            if st.button("生成导出文件"):
+                try:
+                    with st.spinner("正在导出..."):
+                        path, count = build_export(username, fmt)
+                    st.session_state.export_file = {"path": path, "format": fmt, "count": count}
+                except Exception as e:
+                    st.error(f"导出失败: {e}")
+            export_file = st.session_state.get("export_file")
+            if export_file and os.path.exists(export_file["path"]):
+                st.download_button(
+                    f"下载 {export_file['count']} 条记录（{export_file['format'].upper()}）", export_reader(export_file["path"]),
+                    file_name=f"mindfocus-{username}-{datetime.date.today().isoformat()}.{export_file['format']}",
+                    mime=FORMATS[export_file["format"]],
+                )
+
+    with tab4:
+        render_history_browser(username, history_rows)
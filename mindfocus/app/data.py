@@ -0,0 +1,466 @@
+"""仪表盘的数据：配额、最近历史、当日图表点、日汇总、历史记录分页、相似时刻和导出。
+都先查会话缓存（按用户日志的版本号失效），冷会话首屏由 prefetch_dashboard 并发补齐。"""
+import atexit
+import contextvars
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from mindfocus.app.resources import get_secret, init_shared_state, init_storage, rerun_cache, shared_ttl
+from mindfocus.app.session import settings_loaded
+from mindfocus.export import export_history
+from mindfocus.records import decode_record
+from mindfocus.rollup import PERIODS, period_range
+from mindfocus.timeline import day_window
+from mindfocus.tracing import tracer
+from mindfocus.writeback import WriteBehindQueue
+
+
+def user_generation(user_id):
+    """该用户日志的版本号，每写入一条加一；会话缓存和共享快照都按它判断是否过期。每次 rerun 只读一次"""
+    cache = rerun_cache()
+    key = ("generation", user_id)
+    if key not in cache:
+        cache[key] = init_shared_state().get(f"gen:{user_id}") or 0
+    return cache[key]
+
+def bump_generation(user_id):
+    """写入新日志后调用（在后台线程）：所有副本上该用户的快照和会话缓存随之失效"""
+    init_shared_state().incr(f"gen:{user_id}")
+
+def sync_generation(user_id):
+    """版本号变了（本会话、其他会话或其他副本写入了新记录）：清掉会话内由历史派生的缓存"""
+    gen = user_generation(user_id)
+    key = f"_generation_{user_id}"
+    if st.session_state.get(key, gen) != gen:
+        for name in ("_points_cache", "_rollup_cache", "_browser_cache"):
+            st.session_state.pop(f"{name}_{user_id}", None)
+    st.session_state[key] = gen
+
+def get_today_usage(username):
+    today = datetime.date.today().isoformat()
+    cache = rerun_cache()
+    key = ("usage", username, today)
+    if key in cache:
+        return cache[key]
+    # 其他会话或副本查过、之后没有新写入时直接用共享计数
+    used = _shared_usage(username, today)
+    if used is not None:
+        cache[key] = used
+        return used
+    storage = init_storage()
+    if not storage:
+        return 0
+    try:
+        used = storage.get_daily_usage(username, today)
+        cache[key] = used
+        publish_usage(username, today, used)
+        return used
+    except:
+        return 0
+
+def _shared_usage(username, day):
+    data = init_shared_state().get(f"usage:{username}:{day}")
+    if data is not None and data["gen"] == user_generation(username):
+        return data["count"]
+    return None
+
+def publish_usage(username, day, used):
+    init_shared_state().set(f"usage:{username}:{day}", {"gen": user_generation(username), "count": used},
+                            ttl=shared_ttl())
+
+def check_quota(username, daily_limit):
+    used = get_today_usage(username)
+    return used < daily_limit, daily_limit - used, used
+
+HISTORY_LIMIT = 20  # 完整记录只用于最近一次结果卡片，图表改查窄列
+
+def history_cache(user_id):
+    """会话级历史缓存：首次全量加载，之后只增量拉取 last_seen 之后的新记录；
+    gen 为加载时的版本号，版本不变且未超过 shared_ttl() 时不再查询"""
+    key = f"_history_cache_{user_id}"
+    if key not in st.session_state:
+        st.session_state[key] = {"rows": [], "last_seen": None, "loaded": False, "gen": None, "checked_at": 0}
+    return st.session_state[key]
+
+def _history_current(cache, gen):
+    return cache["loaded"] and cache["gen"] == gen and time.time() - cache["checked_at"] < shared_ttl()
+
+def _history_synced(cache, gen):
+    cache["loaded"] = True
+    cache["gen"] = gen
+    cache["checked_at"] = time.time()
+
+def adopt_history_snapshot(user_id, cache, gen):
+    """共享快照与当前版本一致时并入会话缓存，不查库"""
+    snapshot = init_shared_state().get(f"history:{user_id}")
+    if snapshot is None or snapshot["gen"] != gen:
+        return False
+    merge_history(cache, snapshot["rows"])
+    _history_synced(cache, gen)
+    return True
+
+def publish_history(user_id, cache, gen):
+    """把查库得到的最近记录（不含本地暂存行）发布为共享快照"""
+    rows = [r for r in cache["rows"] if not r.get('pending')]
+    init_shared_state().set(f"history:{user_id}", {"gen": gen, "rows": rows}, ttl=shared_ttl())
+
+def merge_history(cache, new_rows, limit=HISTORY_LIMIT):
+    """把新记录（按 created_at 倒序）合并到缓存头部，按 id 去重并截断；
+    本地暂存（pending）的行在对应的服务端记录到达后被替换"""
+    if not new_rows:
+        return
+    known = {r.get('id') for r in cache["rows"] if r.get('id') is not None}
+    arrived = {r.get('client_id') for r in new_rows if r.get('client_id')}
+    fresh = [r for r in new_rows if r.get('id') is None or r.get('id') not in known]
+    kept = [r for r in cache["rows"] if not (r.get('pending') and r.get('client_id') in arrived)]
+    cache["rows"] = (fresh + kept)[:limit]
+    # 增量游标只跟随服务端记录，本地暂存行的时间戳不可靠
+    cache["last_seen"] = next((r.get('created_at') for r in cache["rows"] if not r.get('pending')), cache["last_seen"])
+
+def _send_log_entry(entry):
+    """同一事务内插入日志并计配额，返回插入的行"""
+    storage = init_storage()
+    if not storage:
+        raise RuntimeError("数据库未连接")
+    row = storage.log_analysis(entry)
+    if row:
+        bump_generation(entry["user_id"])
+        index_log(storage, row)
+    return row
+
+@st.cache_resource
+def init_similar_indexes():
+    """进程级的各用户相似时刻索引，存放在本地目录，按需加载（numpy 在此时才导入）"""
+    from mindfocus.similar import SimilarIndexes
+    return SimilarIndexes(get_secret("SIMILAR_INDEX_DIR", "similar_index"))
+
+@st.cache_resource
+def init_similar_backfiller():
+    """进程级的相似索引补建线程：用户索引还不存在时从历史补建，不放在写库和分析路径上"""
+    from mindfocus.similar import Backfiller
+    return Backfiller(init_similar_indexes())
+
+def index_log(storage, row):
+    """写库成功后把这条记录追加进该用户的相似索引；索引还不存在时交给后台补建（包括这一条）。
+    索引只是辅助功能，失败不影响写库"""
+    if similar_top_k() <= 0:
+        return
+    try:
+        with tracer.span("similar.index") as span:
+            index = init_similar_indexes().get(row["user_id"])
+            if len(index) == 0:
+                span.set(backfill_queued=init_similar_backfiller().submit(storage, row["user_id"]))
+            else:
+                index.add(row)
+    except Exception:
+        pass
+
+@st.cache_resource
+def init_write_queue():
+    """进程级写后队列：写库暂时失败的记录落到本地暂存文件，由后台线程重试"""
+    return WriteBehindQueue(_send_log_entry, get_secret("WRITE_SPOOL_PATH", "write_spool.db"))
+
+def save_to_db(user_id, text, json_result, count_usage=True):
+    """写入一条记录并（按需）计配额，返回写入的行；写库暂时失败时返回带 pending 标记的本地行，
+    记录留在写后队列中稍后重试。会在后台工作线程中调用，不能访问 st.session_state"""
+    if not isinstance(json_result, dict):
+        json_result = json.loads(json_result)
+    entry = {
+        "client_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "user_input": text,
+        "ai_result": json_result,
+        "day": datetime.date.today().isoformat(),
+        "count_usage": count_usage
+    }
+    row = init_write_queue().submit(entry)
+    if row is None:
+        row = {
+            "id": None,
+            "client_id": entry["client_id"],
+            "user_id": user_id,
+            "user_input": text,
+            "ai_result": json.dumps(json_result, ensure_ascii=False),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "pending": True
+        }
+    return row
+
+def get_rollups(user_id, period):
+    """长期趋势用的日汇总行；会话内按 (视图, 结束日) 缓存，有新记录写入后清空"""
+    key = f"_rollup_cache_{user_id}"
+    if key not in st.session_state:
+        st.session_state[key] = {}
+    cache = st.session_state[key]
+    start, end = period_range(period)
+    if (period, end) not in cache:
+        storage = init_storage()
+        if not storage:
+            return []
+        try:
+            cache[(period, end)] = storage.daily_rollups(user_id, start, end)
+        except Exception:
+            return []
+    return cache[(period, end)]
+
+def get_day_points(user_id, day):
+    """当日图表用的窄列数据（服务端按 local_day 过滤）；会话内按日期缓存，历史出现新记录时清空"""
+    key = f"_points_cache_{user_id}"
+    cached = st.session_state.get(key)
+    if cached is not None and cached["day"] == day:
+        return cached["rows"]
+    storage = init_storage()
+    if not storage:
+        return []
+    try:
+        rows = storage.day_points(user_id, day, day)
+    except Exception:
+        return []
+    st.session_state[key] = {"day": day, "rows": rows}
+    return rows
+
+def get_history(user_id, limit=HISTORY_LIMIT):
+    cache = history_cache(user_id)
+    gen = user_generation(user_id)
+    # 会话缓存仍是当前版本（或其他会话刚发布了当前版本的快照）时不查库
+    if _history_current(cache, gen) or adopt_history_snapshot(user_id, cache, gen):
+        return cache["rows"][:limit]
+    storage = init_storage()
+    if storage:
+        try:
+            # 增量：只拉取比已缓存最新记录更新的行
+            newer_than = cache["last_seen"] if cache["loaded"] else None
+            rows = storage.recent_logs(user_id, limit, newer_than=newer_than)
+            if rows:
+                st.session_state.pop(f"_points_cache_{user_id}", None)
+                st.session_state.pop(f"_browser_cache_{user_id}", None)
+            merge_history(cache, rows, limit)
+            _history_synced(cache, gen)
+            publish_history(user_id, cache, gen)
+        except: pass
+    return cache["rows"][:limit]
+
+@st.cache_resource
+def init_prefetch_pool():
+    """首屏并发加载用的进程级线程池"""
+    return ThreadPoolExecutor(max_workers=int(get_secret("PREFETCH_WORKERS", 8)), thread_name_prefix="prefetch")
+
+def prefetch_dashboard(username):
+    """冷会话首屏：把还没缓存的配额、历史、当日图表、长期趋势和用户设置查询并发发出，
+    结果在脚本线程写回各自的缓存，后面的 get_* 直接命中。只有一项要查时不必并发，交给原路径。
+    某项失败则保持未缓存，由原路径同步重试"""
+    storage = init_storage()
+    if not storage:
+        return
+    today = datetime.date.today().isoformat()
+    day = day_window()[0].date().isoformat()
+    period = st.session_state.get("trend_period", next(iter(PERIODS)))
+    start, end = period_range(period)
+    per_rerun = rerun_cache()
+    history = history_cache(username)
+    points = st.session_state.get(f"_points_cache_{username}")
+    rollups = st.session_state.setdefault(f"_rollup_cache_{username}", {})
+
+    gen = user_generation(username)
+
+    tasks = {}
+    if ("usage", username, today) not in per_rerun:
+        used = _shared_usage(username, today)
+        if used is not None:
+            per_rerun[("usage", username, today)] = used
+        else:
+            tasks["usage"] = (storage.get_daily_usage, username, today)
+    # 共享快照命中时会话缓存已就绪，不再查
+    if not history["loaded"] and not adopt_history_snapshot(username, history, gen):
+        tasks["history"] = (storage.recent_logs, username, HISTORY_LIMIT)
+    if points is None or points["day"] != day:
+        tasks["points"] = (storage.day_points, username, day, day)
+    if (period, end) not in rollups:
+        tasks["rollups"] = (storage.daily_rollups, username, start, end)
+    if st.session_state.get("settings_pending"):
+        tasks["settings"] = (storage.get_user_settings, username)
+    if len(tasks) < 2:
+        return
+
+    pool = init_prefetch_pool()
+    with tracer.span("prefetch") as span:
+        span.set(tasks=len(tasks))
+        # 复制 contextvars，各查询的 span 仍计入本次 rerun 的 trace
+        futures = {name: pool.submit(contextvars.copy_context().run, *task) for name, task in tasks.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception:
+                pass
+
+    if "usage" in results:
+        per_rerun[("usage", username, today)] = results["usage"]
+        publish_usage(username, today, results["usage"])
+    if "history" in results:
+        merge_history(history, results["history"])
+        _history_synced(history, gen)
+        publish_history(username, history, gen)
+    if "points" in results:
+        st.session_state[f"_points_cache_{username}"] = {"day": day, "rows": results["points"]}
+    if "rollups" in results:
+        rollups[(period, end)] = results["rollups"]
+    if results.get("settings") is not None:
+        settings_loaded(username, results["settings"], st.session_state.get("token_settings_version"))
+
+BROWSER_PAGE_SIZE = HISTORY_LIMIT  # 历史记录第一页直接复用 get_history 的缓存
+BROWSER_DETAIL_CACHE = 50
+
+def browser_cache(user_id):
+    """历史记录浏览状态：已加载的页（第 1 页起，按页号）、当前页、展开的条目和已取过的完整记录"""
+    key = f"_browser_cache_{user_id}"
+    if key not in st.session_state:
+        st.session_state[key] = {"pages": {}, "page": 0, "open": None, "details": {}}
+    return st.session_state[key]
+
+def list_row(row, record):
+    """get_history 的完整行转成与 history_page 相同的列表行，附带已解码的记录"""
+    return {
+        "id": row.get("id"),
+        "created_at": row.get("created_at"),
+        "user_input": row.get("user_input"),
+        "peace": record.peace if record else None,
+        "awareness": record.awareness if record else None,
+        "energy": record.energy if record else None,
+        "time_orientation": record.time_orientation if record else None,
+        "focus_target": record.focus_target if record else None,
+        "record": record,
+    }
+
+def get_browser_page(user_id, page, first_page):
+    """第 page 页（0 起）的列表行：第 0 页即最近记录，之后各页以上一页最后一条为 keyset 游标按需加载并缓存。
+    每次只取一页窄列，翻得再深单次 rerun 的开销也不变"""
+    if page == 0:
+        return first_page
+    cache = browser_cache(user_id)
+    if page in cache["pages"]:
+        return cache["pages"][page]
+    previous = [r for r in get_browser_page(user_id, page - 1, first_page) if r.get("id") is not None]
+    storage = init_storage()
+    if not previous or not storage:
+        return []
+    try:
+        rows = storage.history_page(user_id, (previous[-1]["created_at"], previous[-1]["id"]), BROWSER_PAGE_SIZE)
+    except Exception:
+        return []
+    cache["pages"][page] = rows
+    return rows
+
+def get_log_record(user_id, row):
+    """展开某条时取完整 ai_result 并解码；会话内缓存最近展开过的若干条"""
+    if row.get("record") is not None:
+        return row["record"]
+    details = browser_cache(user_id)["details"]
+    if row["id"] in details:
+        return details[row["id"]]
+    storage = init_storage()
+    if not storage:
+        return None
+    try:
+        full = storage.get_log(user_id, row["id"])
+    except Exception:
+        return None
+    record = decode_record(full) if full else None
+    if len(details) >= BROWSER_DETAIL_CACHE:
+        details.pop(next(iter(details)))
+    details[row["id"]] = record
+    return record
+
+def similar_top_k():
+    """最新结果下方显示几条相似的过去时刻，0 关闭（同时不再维护索引）"""
+    return int(get_secret("SIMILAR_TOP_K", 3))
+
+def get_similar_moments(user_id, row, record):
+    """与最新一条最相近的过去记录（LIST_COLUMNS 行，按相似度排序）；会话内按最新记录的 id 缓存"""
+    if row.get("id") is None or record is None:
+        return []
+    cached = st.session_state.get(f"_similar_cache_{user_id}")
+    if cached is not None and cached["id"] == row["id"]:
+        return cached["rows"]
+    storage = init_storage()
+    if not storage:
+        return []
+    try:
+        with tracer.span("similar.search") as span:
+            hits = init_similar_indexes().get(user_id).search(
+                row.get("user_input"), (record.peace, record.awareness, record.energy),
+                k=similar_top_k(), exclude=(row["id"],))
+            span.set(hits=len(hits))
+            by_id = {r["id"]: r for r in storage.logs_by_ids(user_id, [log_id for log_id, _ in hits])} if hits else {}
+    except Exception:
+        return []
+    rows = [by_id[log_id] for log_id, _ in hits if log_id in by_id]
+    st.session_state[f"_similar_cache_{user_id}"] = {"id": row["id"], "rows": rows}
+    return rows
+
+EXPORT_KEEP_SECONDS = 3600  # 导出文件保留多久，会话结束后留下的文件到期删除
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+@st.cache_resource
+def init_export_dir():
+    """本进程的导出目录（系统临时目录下 mindfocus-export/<pid>）：启动时删掉已退出进程留下的目录，退出时删除自己的"""
+    root = os.path.join(tempfile.gettempdir(), "mindfocus-export")
+    os.makedirs(root, exist_ok=True)
+    for name in os.listdir(root):
+        if name.isdigit() and int(name) != os.getpid() and not _pid_alive(int(name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    path = os.path.join(root, str(os.getpid()))
+    os.makedirs(path, exist_ok=True)
+    atexit.register(shutil.rmtree, path, True)
+    return path
+
+def _purge_exports(directory, keep_seconds=EXPORT_KEEP_SECONDS):
+    """删除超过保留时间的导出文件（进程长期运行时，已结束会话的文件不会再被本会话覆盖）"""
+    cutoff = time.time() - keep_seconds
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def build_export(user_id, fmt):
+    """把该用户的全部记录按 keyset 分页写入本进程导出目录，返回 (路径, 行数)；生成过程内存占用与历史总量无关。
+    同一会话再次导出时删除上一个文件，其余文件 EXPORT_KEEP_SECONDS 后清理"""
+    storage = init_storage()
+    if not storage:
+        raise RuntimeError("数据库未连接")
+    previous = st.session_state.get("export_file")
+    if previous and os.path.exists(previous["path"]):
+        os.remove(previous["path"])
+    directory = init_export_dir()
+    _purge_exports(directory)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.{fmt}")
+    with tracer.span("export") as span:
+        count = export_history(storage, path, fmt, user=user_id)
+        span.set(rows=count, format=fmt)
+    return path, count
+
+def export_reader(path):
+    """下载按钮的数据：点击下载时才读取文件，平时的 rerun 不读文件、内存里也不留副本"""
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
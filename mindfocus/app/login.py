@@ -0,0 +1,40 @@
+"""登录页。只依赖 session / resources，不触发图表、分析相关的导入。"""
+import streamlit as st
+
+from mindfocus.app.resources import get_secret_key
+from mindfocus.app.session import apply_settings, remember_settings, set_url_token, verify_login
+from mindfocus.auth import generate_auth_token
+from mindfocus.tracing import tracer
+
+
+@tracer.wrap("render.login")
+def render_login():
+    st.markdown("""<div style="text-align: center; margin-top: 60px;">
+        <div style="background: linear-gradient(135deg, #14b8a6, #3b82f6); color: white; padding: 16px; border-radius: 16px; display: inline-block; margin-bottom: 20px; font-size: 32px;">🧠</div>
+        <h1 style="font-size: 28px; font-weight: 700; color: #1e293b;">MindfulFocus AI</h1>
+        <p style="color: #64748b;">情绪资产管理专家</p>
+    </div>""", unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        with st.form("login"):
+            username = st.text_input("用户名", placeholder="请输入用户名")
+            password = st.text_input("密码", type="password", placeholder="请输入密码")
+            if st.form_submit_button("登 录", use_container_width=True):
+                if username and password:
+                    ok, msg, user = verify_login(username, password)
+                    if ok:
+                        # 登录成功后设置URL Token
+                        token = generate_auth_token(username, user['daily_limit'], remember_settings(username, user),
+                                                    secret=get_secret_key())
+                        set_url_token(token)
+                        
+                        st.session_state.logged_in = True
+                        st.session_state.username = username
+                        st.session_state.daily_limit = user['daily_limit']
+                        apply_settings(user)
+                        st.rerun()
+                    else:
+                        st.error(msg)
+                else:
+                    st.warning("请输入用户名和密码")
@@ -0,0 +1,78 @@
+"""配置读取和进程级资源：存储后端、共享状态、追踪，以及仅在本次 rerun 内有效的缓存。"""
+import streamlit as st
+
+from mindfocus.auth import DEFAULT_SECRET
+from mindfocus.shared_state import FailSoft, MemorySharedState, open_shared_state
+from mindfocus.storage import open_storage
+from mindfocus.tracing import TracedProxy, tracer
+from mindfocus.writeback import spooled_count
+
+
+def get_secret(name, default=None):
+    """读取 st.secrets 中的配置，未配置或读取失败时返回默认值"""
+    try:
+        if hasattr(st, 'secrets') and name in st.secrets:
+            return st.secrets[name]
+        return default
+    except Exception:
+        return default
+
+def get_secret_key():
+    """获取加密密钥（兼容不同Streamlit版本）"""
+    return get_secret("COOKIE_SECRET", DEFAULT_SECRET)
+
+@st.cache_resource
+def init_tracing():
+    """TRACING=true 时记录数据库/LLM/渲染 span，每次 rerun 汇总一行 JSON 日志，指标定期写入 TRACE_METRICS_PATH"""
+    tracer.configure(
+        bool(get_secret("TRACING", False)),
+        log_path=get_secret("TRACE_LOG_PATH"),
+        metrics_path=get_secret("TRACE_METRICS_PATH"),
+    )
+    return tracer
+
+@st.cache_resource
+def init_storage():
+    """进程级存储后端：默认 Supabase（用到时才导入 supabase）；STORAGE_BACKEND=sqlite 时使用本地嵌入式数据库"""
+    try:
+        storage = open_storage(get_secret)
+    except Exception:
+        return None
+    # 未开启追踪时直接返回原对象，不增加任何开销
+    if init_tracing().enabled:
+        return TracedProxy(storage, "db", tracer)
+    return storage
+
+@st.cache_resource
+def init_shared_state():
+    """进程级共享状态：历史快照、配额计数和分析任务状态。默认只在本进程内，多副本部署时
+    SHARED_STATE_BACKEND 配为 sqlite（同机共享文件）或 redis。后端出错时按未命中处理，退回直接查库"""
+    try:
+        state = open_shared_state(get_secret)
+    except Exception:
+        state = MemorySharedState()
+    if init_tracing().enabled:
+        state = TracedProxy(state, "shared", tracer)
+    return FailSoft(state)
+
+@st.cache_resource
+def init_spool_recovery():
+    """进程启动后第一次 rerun 时检查写后暂存文件：上次进程退出（如崩溃）前留下未写出的条目时
+    立即启动写后队列补写，不必等到有用户再次保存。返回启动时暂存的条目数"""
+    pending = spooled_count(get_secret("WRITE_SPOOL_PATH", "write_spool.db"))
+    if pending:
+        # data 依赖本模块，这里按需导入；暂存为空时（通常情况）登录页不必导入它
+        from mindfocus.app.data import init_write_queue
+        init_storage()  # 在脚本线程中建好存储后端，补写线程直接复用
+        init_write_queue()
+    return pending
+
+def shared_ttl():
+    """共享快照和会话缓存的最长有效期（秒），兜底不经本应用写入的改动（如离线重新评分）"""
+    return float(get_secret("SHARED_STATE_TTL", 300))
+
+def rerun_cache():
+    """仅在本次 rerun 内有效的缓存，主程序每次执行开头会重置"""
+    if "_rerun_cache" not in st.session_state:
+        st.session_state._rerun_cache = {}
+    return st.session_state._rerun_cache
@@ -0,0 +1,138 @@
+"""登录状态：URL token、账号校验和用户设置（按设置版本做进程级缓存）。"""
+import datetime
+
+import streamlit as st
+
+from mindfocus.app.resources import get_secret, get_secret_key, init_storage
+from mindfocus.auth import generate_auth_token, verify_auth_token
+from mindfocus.prompt import DEFAULT_TEMPERATURE
+from mindfocus.result_cache import ResultCache
+
+
+def set_url_token(token):
+    """将token写入URL参数"""
+    try:
+        if hasattr(st, 'query_params'):
+            st.query_params["token"] = token
+    except Exception:
+        pass  # 设置失败不影响登录
+
+def get_url_token():
+    """从URL参数读取token"""
+    try:
+        if hasattr(st, 'query_params'):
+            return st.query_params.get("token", None)
+        return None
+    except Exception:
+        return None
+
+def clear_url_token():
+    """清除URL中的token"""
+    try:
+        if hasattr(st, 'query_params') and "token" in st.query_params:
+            del st.query_params["token"]
+    except Exception:
+        pass
+
+EXPIRES_FORMATS = ("%Y/%m/%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y.%m.%d", "%Y%m%d")
+
+def parse_expires_at(value):
+    """账号到期时间 -> 不带时区的墙上时间（带时区的值直接去掉时区）。
+    先按 ISO 格式、再按几种常见写法（如 2026/12/31）用标准库解析，都不认识时才交给 pandas，登录页通常不必导入它"""
+    text = str(value).strip()
+    try:
+        return datetime.datetime.fromisoformat(text).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in EXPIRES_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    import pandas as pd
+    return pd.to_datetime(text).tz_localize(None).to_pydatetime()
+
+def verify_login(username, password):
+    storage = init_storage()
+    if not storage:
+        return False, "数据库未连接", None
+    try:
+        user = storage.find_account(username, password)
+        if user:
+            if not user.get('is_active', True):
+                return False, "账号已被禁用", None
+            if parse_expires_at(user['expires_at']) < datetime.datetime.now():
+                return False, "账号已过期", None
+            return True, "登录成功", user
+        return False, "用户名或密码错误", None
+    except Exception as e:
+        return False, f"验证失败: {e}", None
+
+def restore_login():
+    """URL 中带有效 token 时直接恢复登录状态；token 中的设置版本命中缓存时不查库，否则交给首屏并发加载"""
+    try:
+        url_token = get_url_token()
+        if not url_token:
+            return
+        user_info = verify_auth_token(url_token, secret=get_secret_key())
+        if not user_info:
+            return
+        st.session_state.logged_in = True
+        st.session_state.username = user_info["username"]
+        st.session_state.daily_limit = user_info["daily_limit"]
+        version = user_info["settings_version"]
+        cached = init_settings_cache().get(settings_key(user_info["username"], version)) if version is not None else None
+        st.session_state.token_settings_version = version
+        if cached is not None:
+            apply_settings(cached)
+        else:
+            st.session_state.settings_pending = True
+    except Exception:
+        pass  # Token读取失败，继续显示登录页面
+
+def get_user_settings(username):
+    """从数据库获取用户的定制设置 {custom_prompt, temperature, settings_version}，失败返回 None"""
+    storage = init_storage()
+    if not storage:
+        return None
+    try:
+        return storage.get_user_settings(username)
+    except:
+        return None
+
+@st.cache_resource
+def init_settings_cache():
+    """进程级用户设置缓存，按 (用户名, 设置版本) 寻址；TTL 兜底 token 中版本过期的情况"""
+    return ResultCache(max_entries=10000, ttl_seconds=float(get_secret("SETTINGS_CACHE_TTL", 600)), name="settings")
+
+def settings_key(username, version):
+    return f"{username}\x00{version}"
+
+def remember_settings(username, data):
+    """缓存 get_user_settings / find_account 返回的设置，返回其版本号"""
+    version = data.get('settings_version') or 0
+    init_settings_cache().put(settings_key(username, version), {
+        "custom_prompt": data.get('custom_prompt'),
+        "temperature": data.get('temperature'),
+    })
+    return version
+
+def apply_settings(data):
+    """把设置写入会话"""
+    st.session_state.custom_prompt = data.get('custom_prompt')  # 【新增】存储定制 prompt
+    st.session_state.temperature = data.get('temperature') or DEFAULT_TEMPERATURE  # 【新增】存储 temperature
+    st.session_state.settings_pending = False
+
+def settings_loaded(username, data, token_version):
+    """数据库中的设置到达后：写入会话和缓存；版本与 token 不一致时换发新 token"""
+    apply_settings(data)
+    version = remember_settings(username, data)
+    if version != token_version:
+        set_url_token(generate_auth_token(username, st.session_state.daily_limit, version, secret=get_secret_key()))
+
+def ensure_settings(username):
+    """首屏并发加载没取到设置时（如查询失败），在真正要用前同步补取"""
+    if st.session_state.get("settings_pending"):
+        data = get_user_settings(username)
+        if data is not None:
+            settings_loaded(username, data, st.session_state.get("token_settings_version"))
@@ -0,0 +1,40 @@
+"""URL 登录 token：用户名、每日配额、过期时间和设置版本，附 COOKIE_SECRET 签名。
+
+页面和压测脚本都用这里的函数签发/校验，secret 由调用方传入。
+"""
+import base64
+import datetime
+import hashlib
+
+DEFAULT_SECRET = "mindfocus_default_secret_key_2024"
+
+
+def generate_auth_token(username, daily_limit, settings_version=0, days_valid=7, secret=DEFAULT_SECRET):
+    """生成加密的认证token，带上签发时的设置版本，新会话据此命中设置缓存"""
+    expire_ts = int((datetime.datetime.now() + datetime.timedelta(days=days_valid)).timestamp())
+    payload = f"{username}:{daily_limit}:{expire_ts}:{settings_version}"
+    signature = hashlib.sha256(f"{payload}:{secret}".encode()).hexdigest()[:16]
+    token = base64.b64encode(f"{payload}:{signature}".encode()).decode()
+    return token
+
+
+def verify_auth_token(token, secret=DEFAULT_SECRET):
+    """验证token并返回用户信息"""
+    try:
+        decoded = base64.b64decode(token.encode()).decode()
+        parts = decoded.rsplit(':', 1)
+        if len(parts) != 2:
+            return None
+        payload, signature = parts
+        expected_sig = hashlib.sha256(f"{payload}:{secret}".encode()).hexdigest()[:16]
+        if signature != expected_sig:
+            return None
+        fields = payload.split(':')
+        # 旧格式 token 没有设置版本，按未知处理（会查一次库）
+        username, daily_limit, expire_ts = fields[:3]
+        settings_version = int(fields[3]) if len(fields) > 3 else None
+        if int(expire_ts) < datetime.datetime.now().timestamp():
+            return None
+        return {"username": username, "daily_limit": int(daily_limit), "settings_version": settings_version}
+    except Exception:
+        return None
@@ -0,0 +1,52 @@
+"""迁移后回填：按 (created_at, id) keyset 分页扫描 emotion_logs，写入由 ai_result 派生的规范化列
+（peace / awareness / energy / time_orientation / focus_target / local_day），最后重建日汇总。
+
+用法（在仓库根目录）：
+    python -m mindfocus.backfill [--user 用户名] [--page-size 500]
+"""
+import argparse
+import json
+import sys
+
+from mindfocus.config import get_setting
+from mindfocus.rollup import rebuild_rollups
+from mindfocus.storage import open_storage
+
+
+def backfill_typed_columns(storage, user=None, page_size=500, log=print):
+    """逐页用 update_results 原样写回 ai_result，由存储后端一并写入规范化列和 local_day；
+    无法解析的 ai_result 与新写入时一样按缺省值填写，不跳过。返回 (处理行数, 其中按缺省值填写的行数)"""
+    cursor = None
+    done = malformed = 0
+    while True:
+        rows = storage.logs_page(cursor, page_size, user)
+        if not rows:
+            break
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+        for row in rows:
+            try:
+                raw = row["ai_result"]
+                if not isinstance(json.loads(raw) if isinstance(raw, str) else raw, dict):
+                    raise ValueError
+            except (TypeError, ValueError):
+                malformed += 1
+        storage.update_results(rows)
+        done += len(rows)
+        log(f"[进度] 已回填 {done} 行, 其中 {malformed} 行无法解析、按缺省值填写")
+    return done, malformed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回填 emotion_logs 的规范化列并重建日汇总")
+    parser.add_argument("--user", help="只处理该用户的记录")
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    storage = open_storage(get_setting)
+    backfill_typed_columns(storage, user=args.user, page_size=args.page_size)
+    rebuild_rollups(storage, user=args.user)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""情绪波动图和注意力地图（数据来自 timeline.day_frame 的同一份当日数据），以及基于日汇总的长期趋势图。"""
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from mindfocus.tracing import tracer
+
+
+@tracer.wrap("render.trend")
+def render_trend(day_df, start_dt, end_dt):
+    """渲染情绪波动图 - 去掉框，压缩高度，更平滑曲线"""
+    has_data = not day_df.empty
+    
+    # 去掉框，压缩标题行高度
+    st.markdown("""<div style="padding: 8px 0 4px 0;">
+        <span style="font-size: 14px; font-weight: 600; color: #334155;">🌊 情绪波动 (近24小时)</span>
+    </div>""", unsafe_allow_html=True)
+    
+    df = day_df[["Time", "Score"]] if has_data else pd.DataFrame({'Time': [start_dt, end_dt], 'Score': [0, 0]})
+    
+    # 使用 basis 插值让曲线更平滑
+    chart = alt.Chart(df).mark_area(
+        interpolate='basis',
+        line={'color': '#0d9488', 'strokeWidth': 2},
+        color=alt.Gradient(gradient='linear', stops=[alt.GradientStop(color='rgba(20,184,166,0.3)', offset=0), alt.GradientStop(color='rgba(20,184,166,0)', offset=1)], x1=1, x2=1, y1=1, y2=0)
+    ).encode(
+        x=alt.X('Time:T', scale=alt.Scale(domain=[start_dt, end_dt]), axis=alt.Axis(format='%H:%M', title='')),
+        y=alt.Y('Score:Q', scale=alt.Scale(domain=[-5, 5]), axis=alt.Axis(title='', values=[-5, 0, 5])),
+        opacity=alt.value(1 if has_data else 0)
+    ).properties(height=120).configure_view(strokeWidth=0)
+    st.altair_chart(chart, use_container_width=True)
+
+
+@tracer.wrap("render.focus_map")
+def render_focus_map(day_df, start_dt, end_dt):
+    """渲染注意力地图 - 去掉框，压缩高度"""
+    has_data = not day_df.empty
+    
+    # 去掉框，压缩标题行高度
+    st.markdown("""<div style="padding: 8px 0 4px 0; display: flex; justify-content: space-between; align-items: center;">
+        <span style="font-size: 14px; font-weight: 600; color: #334155;">🗺️ 注意力地图</span>
+        <span style="font-size: 11px; color: #64748b;"><span style="color: #8b5cf6;">●</span> 内在 <span style="color: #f97316;">●</span> 外在</span>
+    </div>""", unsafe_allow_html=True)
+    
+    df = day_df[["Time", "Y", "Color"]] if has_data else pd.DataFrame({'Time': [start_dt], 'Y': [2], 'Color': ['#fff']})
+    chart = alt.Chart(df).mark_circle(size=150 if has_data else 0, opacity=0.85).encode(
+        x=alt.X('Time:T', scale=alt.Scale(domain=[start_dt, end_dt]), axis=alt.Axis(format='%H:%M', title='')),
+        y=alt.Y('Y:Q', scale=alt.Scale(domain=[0.5, 3.5]), axis=alt.Axis(title='', labelExpr="datum.value==1?'Past':datum.value==2?'Present':'Future'", values=[1,2,3])),
+        color=alt.Color('Color:N', scale=None)
+    ).properties(height=150).configure_view(strokeWidth=0)
+    st.altair_chart(chart, use_container_width=True)
+
+
+@tracer.wrap("render.long_trend")
+def render_long_trend(scores, mix, title):
+    """渲染周/月/年趋势：三项分数的均值折线 + 过去/当下/未来分布，数据来自 rollup 的日汇总"""
+    st.markdown(f"""<div style="padding: 8px 0 4px 0;">
+        <span style="font-size: 14px; font-weight: 600; color: #334155;">📈 {title}</span>
+    </div>""", unsafe_allow_html=True)
+    if scores.empty:
+        st.info("这段时间还没有记录。")
+        return
+    
+    line = alt.Chart(scores).mark_line(point=True, interpolate='monotone').encode(
+        x=alt.X('Date:T', axis=alt.Axis(format='%m/%d', title='')),
+        y=alt.Y('Mean:Q', scale=alt.Scale(domain=[-5, 5]), axis=alt.Axis(title='', values=[-5, 0, 5])),
+        color=alt.Color('Metric:N', scale=alt.Scale(domain=['平静度', '觉察度', '能量水平'], range=['#0d9488', '#3b82f6', '#f97316']), legend=alt.Legend(orient='top', title=None)),
+        tooltip=[alt.Tooltip('Date:T', format='%Y-%m-%d', title='日期'), alt.Tooltip('Metric:N', title='指标'), alt.Tooltip('Mean:Q', title='均值'), alt.Tooltip('Min:Q', title='最低'), alt.Tooltip('Max:Q', title='最高')]
+    ).properties(height=180).configure_view(strokeWidth=0)
+    st.altair_chart(line, use_container_width=True)
+    
+    bars = alt.Chart(mix).mark_bar().encode(
+        x=alt.X('Date:T', axis=alt.Axis(format='%m/%d', title='')),
+        y=alt.Y('Count:Q', stack='normalize', axis=alt.Axis(format='%', title='')),
+        color=alt.Color('Orientation:N', scale=alt.Scale(domain=['过去', '当下', '未来'], range=['#94a3b8', '#14b8a6', '#8b5cf6']), legend=alt.Legend(orient='top', title=None)),
+        tooltip=[alt.Tooltip('Date:T', format='%Y-%m-%d', title='日期'), alt.Tooltip('Orientation:N', title='时间维度'), alt.Tooltip('Count:Q', title='次数')]
+    ).properties(height=120).configure_view(strokeWidth=0)
+    st.altair_chart(bars, use_container_width=True)
@@ -0,0 +1,25 @@
+"""命令行工具的配置读取：环境变量优先，其次 .streamlit/secrets.toml（与页面共用同一份配置）。"""
+import os
+import tomllib
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+_secrets = None
+
+
+def _load_secrets():
+    global _secrets
+    if _secrets is None:
+        try:
+            with open(SECRETS_PATH, "rb") as f:
+                _secrets = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError):
+            _secrets = {}
+    return _secrets
+
+
+def get_setting(name, default=None):
+    value = os.environ.get(name)
+    if value is not None:
+        return value
+    return _load_secrets().get(name, default)
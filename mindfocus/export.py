@@ -0,0 +1,140 @@
+"""全量历史导出：按 (created_at, id) keyset 分页读取 emotion_logs，ai_result 展开成列，
+逐页写入 CSV / JSONL / Parquet 文件，内存占用只与页大小有关，与历史总量无关。
+
+用法（在仓库根目录）：
+    python -m mindfocus.export --output 导出.csv [--user 用户名] [--format csv|jsonl|parquet]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from mindfocus.config import get_setting
+from mindfocus.records import get_recommendation, typed_columns
+from mindfocus.rollup import beijing_day
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+EXPORT_COLUMNS = [
+    "id", "user_id", "created_at", "local_day", "user_input", "summary",
+    "peace", "awareness", "energy", "time_orientation", "focus_target",
+    "key_insights", "recommendation", "risk_alert",
+]
+
+
+def flatten_row(row):
+    """一行 emotion_logs 展开为 EXPORT_COLUMNS；ai_result 无法解析时只保留原始字段"""
+    flat = {name: None for name in EXPORT_COLUMNS}
+    flat.update(id=row["id"], user_id=row["user_id"], created_at=str(row["created_at"]),
+                local_day=beijing_day(row["created_at"]), user_input=row["user_input"])
+    try:
+        result = row["ai_result"] if isinstance(row["ai_result"], dict) else json.loads(row["ai_result"])
+        typed = typed_columns(result)
+    except (TypeError, ValueError, AttributeError):
+        return flat
+    insights = result.get("key_insights")
+    flat.update(
+        typed,
+        summary=result.get("summary"),
+        key_insights=[str(i) for i in insights] if isinstance(insights, list) else [],
+        recommendation=get_recommendation(result),
+        risk_alert=result.get("risk_alert") or None,
+    )
+    return flat
+
+
+def iter_pages(storage, user=None, page_size=1000):
+    """按 keyset 逐页产出展开后的行"""
+    cursor = None
+    while True:
+        rows = storage.logs_page(cursor, page_size, user)
+        if not rows:
+            return
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+        yield [flatten_row(row) for row in rows]
+
+
+def write_csv(pages, path):
+    count = 0
+    # utf-8-sig：Excel 打开时能正确识别中文
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for page in pages:
+            for row in page:
+                writer.writerow({**row, "key_insights": "\n".join(row["key_insights"] or [])})
+            count += len(page)
+    return count
+
+
+def write_jsonl(pages, path):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for page in pages:
+            for row in page:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write("\n")
+            count += len(page)
+    return count
+
+
+def write_parquet(pages, path):
+    """每页一个 row group；需要 pyarrow"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("导出 Parquet 需要安装 pyarrow")
+    schema = pa.schema([
+        ("id", pa.string()), ("user_id", pa.string()), ("created_at", pa.string()), ("local_day", pa.string()),
+        ("user_input", pa.string()), ("summary", pa.string()),
+        ("peace", pa.int8()), ("awareness", pa.int8()), ("energy", pa.int8()),
+        ("time_orientation", pa.string()), ("focus_target", pa.string()),
+        ("key_insights", pa.list_(pa.string())), ("recommendation", pa.string()), ("risk_alert", pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for page in pages:
+            columns = {name: [row[name] for row in page] for name in EXPORT_COLUMNS}
+            columns["id"] = [None if v is None else str(v) for v in columns["id"]]
+            columns["risk_alert"] = [None if v is None else str(v) for v in columns["risk_alert"]]
+            writer.write_table(pa.table(columns, schema=schema))
+            count += len(page)
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "parquet": write_parquet}
+
+
+def export_history(storage, path, fmt="csv", user=None, page_size=1000):
+    """导出到 path，返回行数；先写临时文件，完成后原子替换"""
+    tmp = f"{path}.tmp"
+    try:
+        count = WRITERS[fmt](iter_pages(storage, user, page_size), tmp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出 emotion_logs 全量历史")
+    parser.add_argument("--output", required=True, help="输出文件")
+    parser.add_argument("--format", choices=list(WRITERS), help="默认按输出文件扩展名判断")
+    parser.add_argument("--user", help="只导出该用户")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        parser.error(f"无法从扩展名判断格式，请用 --format 指定 {'/'.join(WRITERS)}")
+
+    from mindfocus.storage import open_storage
+    count = export_history(open_storage(get_setting), args.output, fmt, user=args.user, page_size=args.page_size)
+    print(f"[完成] 导出 {count} 行到 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""后台分析任务：有界线程池执行 LLM 调用和写库，脚本线程只轮询任务状态。
+
+每次状态变化都回调 listener，页面据此把任务状态写入共享状态，会话换到其他副本后仍能看到进度和结果。"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(Exception):
+    """排队中的任务已达上限"""
+
+
+class AnalysisJob:
+    """一次分析任务的状态，由工作线程写、脚本线程读"""
+
+    def __init__(self, job_id, username):
+        self.id = job_id
+        self.username = username
+        self.status = QUEUED
+        self.partial = None        # 流式输出中已完整的部分结果
+        self.completed = frozenset()
+        self.result = None         # 工作函数的返回值
+        self.error = None
+        self.meta = {}             # cached / attempts 等附加信息
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def set_partial(self, partial, completed):
+        with self._lock:
+            self.partial = partial
+            self.completed = frozenset(completed)
+        self._notify()
+
+    def _notify(self):
+        if self._listener is not None:
+            try:
+                self._listener(self)
+            except Exception:
+                pass
+
+    def state(self):
+        """可 JSON 序列化的状态快照"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "username": self.username,
+                "status": self.status,
+                "partial": self.partial,
+                "completed": sorted(self.completed),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+    @classmethod
+    def from_state(cls, data):
+        """由 state() 还原的只读副本（任务在其他副本上执行）"""
+        job = cls(data["id"], data["username"])
+        job.status = data["status"]
+        job.partial = data.get("partial")
+        job.completed = frozenset(data.get("completed") or ())
+        job.result = data.get("result")
+        job.error = data.get("error")
+        job.created_at = data.get("created_at")
+        job.finished_at = data.get("finished_at")
+        return job
+
+    def snapshot(self):
+        """一次性读出 (status, partial, completed)，避免读到一半被更新"""
+        with self._lock:
+            return self.status, self.partial, self.completed
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobRunner:
+    """进程级任务执行器；任务跨 rerun 存活，按 id 查询"""
+
+    def __init__(self, max_workers=8, max_pending=64, keep_seconds=600, listener=None):
+        self.max_pending = max_pending
+        self.keep_seconds = keep_seconds
+        self.listener = listener      # listener(job)：创建、开始、部分结果、结束时各调用一次
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, username, fn, *args, **kwargs):
+        """提交任务，fn(job, *args, **kwargs) 的返回值存入 job.result，异常存入 job.error"""
+        with self._lock:
+            self._purge()
+            pending = sum(1 for j in self._jobs.values() if not j.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"当前排队任务已达上限 ({self.max_pending})")
+            # 全局唯一，多个副本的任务 id 不会冲突
+            job = AnalysisJob(f"job-{uuid.uuid4().hex}", username)
+            job._listener = self.listener
+            self._jobs[job.id] = job
+        job._notify()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if not j.finished)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        job._notify()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            status = DONE
+        except Exception as e:
+            job.error = str(e)
+            status = FAILED
+        job.finished_at = time.time()
+        job.status = status
+        job._notify()
+
+    def _purge(self):
+        deadline = time.time() - self.keep_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < deadline]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,83 @@
+"""进程级复用的 LLM 客户端：长连接池、显式超时、带抖动的指数退避重试。"""
+import random
+import time
+
+import httpx
+import openai
+
+from mindfocus.tracing import tracer
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+RETRY_STATUS = {408, 409, 429}
+
+
+def is_retryable(exc):
+    """连接错误/超时、429、5xx 可重试；4xx 参数错误等直接失败"""
+    if isinstance(exc, openai.APIConnectionError):  # 包含 APITimeoutError
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRY_STATUS or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """包装 openai.OpenAI，SDK 自带重试关闭，由这里统一重试；每次调用按用了几次尝试和结果
+    计入 mindfocus_llm_calls_total{attempts, outcome} 指标"""
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, max_connections=20):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            http_client=self.http_client,
+        )
+
+    def backoff(self, attempt, exc=None):
+        """第 attempt 次失败后的等待秒数：full jitter，服务端给了 Retry-After 时以其为下限"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def chat(self, **kwargs):
+        """chat.completions.create 的重试版本，返回 (response, 尝试次数)"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt > self.max_retries or not is_retryable(e):
+                    self._record(attempt, "error")
+                    e.attempts = attempt
+                    raise
+                time.sleep(self.backoff(attempt - 1, e))
+                continue
+            self._record(attempt, "ok")
+            return response, attempt
+
+    @staticmethod
+    def _record(attempt, outcome):
+        tracer.inc("mindfocus_llm_calls_total", attempts=attempt, outcome=outcome)
+
+    def close(self):
+        self.http_client.close()
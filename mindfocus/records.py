@@ -0,0 +1,133 @@
+"""emotion_logs 行的解码：每行 ai_result 只解析一次，结果供所有渲染函数共用。"""
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+RECORD_MEMO_SIZE = 5000
+
+
+@dataclass(slots=True, frozen=True)
+class EmotionRecord:
+    """emotion_logs 一行解码后的紧凑记录"""
+    id: object
+    created_at: str
+    peace: int
+    awareness: int
+    energy: int
+    time_orientation: str
+    focus_target: str
+    insights: tuple
+    recommendation: str
+    risk_alert: object
+
+
+# 进程级解码缓存：row id -> (原始 ai_result, EmotionRecord)
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _as_dict(value):
+    """模型输出的嵌套字段可能是 null、列表或字符串，一律按空 dict 处理"""
+    return value if isinstance(value, dict) else {}
+
+
+def get_recommendation(result):
+    """兼容新旧两种字段名"""
+    recs = _as_dict(result.get('recommendations'))
+    if '身心灵调适建议' in recs:
+        return recs['身心灵调适建议']
+    if 'action_guide' in recs:
+        return recs['action_guide']
+    return ''
+
+
+def _to_score(value):
+    try:
+        return max(-5, min(5, int(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_from_result(result, row_id=None, created_at=None):
+    """把 ai_result dict（可以是流式输出中的部分结果）转成 EmotionRecord"""
+    scores = _as_dict(result.get('scores'))
+    focus = _as_dict(result.get('focus_analysis'))
+    insights = result.get('key_insights')
+    return EmotionRecord(
+        id=row_id,
+        created_at=created_at,
+        peace=_to_score(scores.get('平静度', 0)),
+        awareness=_to_score(scores.get('觉察度', 0)),
+        energy=_to_score(scores.get('能量水平', 0)),
+        time_orientation=focus.get('time_orientation') or 'Present',
+        focus_target=focus.get('focus_target') or 'Internal',
+        insights=tuple(insights) if isinstance(insights, list) else (),
+        recommendation=get_recommendation(result),
+        risk_alert=result.get('risk_alert'),
+    )
+
+
+TIME_ORIENTATIONS = ("Past", "Present", "Future")
+
+
+def typed_columns(result):
+    """emotion_logs 中与 ai_result 冗余存放的规范化列：三项分数 + 时间维度 + 关注对象。
+    规则与页面一致：非法分数为 0，未知时间维度为 Present，focus_target 含 external 即 External。
+    写库时在插入事务内调用，不能因模型输出的形状失败：无法解析的 ai_result 按全部缺省处理"""
+    try:
+        if not isinstance(result, dict):
+            result = json.loads(result)
+        record = record_from_result(result if isinstance(result, dict) else {})
+    except (TypeError, ValueError, AttributeError):
+        record = record_from_result({})
+    return {
+        "peace": record.peace,
+        "awareness": record.awareness,
+        "energy": record.energy,
+        "time_orientation": record.time_orientation if record.time_orientation in TIME_ORIENTATIONS else "Present",
+        "focus_target": "External" if "external" in str(record.focus_target).lower() else "Internal",
+    }
+
+
+def _decode_row(row):
+    raw = row.get('ai_result')
+    try:
+        result = raw if isinstance(raw, dict) else json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(result, dict):
+        return None
+    try:
+        return record_from_result(result, row.get('id'), row.get('created_at'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def decode_record(row):
+    """解码单行，按 row id 记忆化；ai_result 被改写时自动失效"""
+    row_id = row.get('id')
+    if row_id is None:
+        return _decode_row(row)
+    raw = row.get('ai_result')
+    with _memo_lock:
+        hit = _memo.get(row_id)
+        if hit is not None and hit[0] == raw:
+            _memo.move_to_end(row_id)
+            return hit[1]
+    record = _decode_row(row)
+    with _memo_lock:
+        _memo[row_id] = (raw, record)
+        if len(_memo) > RECORD_MEMO_SIZE:
+            _memo.popitem(last=False)
+    return record
+
+
+def decode_history(rows):
+    """把 emotion_logs 行列表解码为 EmotionRecord 列表，跳过无法解析的行"""
+    records = []
+    for row in rows or []:
+        record = decode_record(row)
+        if record is not None:
+            records.append(record)
+    return records
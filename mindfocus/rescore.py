@@ -0,0 +1,279 @@
+"""批量重新评分 emotion_logs：按 (created_at, id) keyset 分页流式读取，asyncio 有界并发 + 限速，
+断点续跑，分批回写，结束后重建日汇总。调整 STRICT_SYSTEM_PROMPT 或用户 custom_prompt 后用来回填历史记录。
+评分失败（如持续 429/5xx）的 id 记在进度文件里，游标照常前进；之后用 --retry-failed 只重试这些行。
+
+用法（在仓库根目录）：
+    python -m mindfocus.rescore --checkpoint rescore.json [--user 用户名] [--concurrency 8] [--rps 5]
+    python -m mindfocus.rescore --checkpoint rescore.json --retry-failed
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mindfocus.analysis import request_analysis
+from mindfocus.config import get_setting
+from mindfocus.llm import DEFAULT_BASE_URL, LLMClient
+from mindfocus.prompt import PROMPT_MODES, effective_prompt, is_structured
+from mindfocus.rollup import rebuild_rollups
+from mindfocus.storage import open_storage
+
+
+class RateLimiter:
+    """异步令牌桶：平均每秒 rate 次，最多攒 burst 个令牌；rate 为 0 表示不限速"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Checkpoint:
+    """进度文件：最后一个已完整处理页的 keyset 游标和累计计数，原子写入"""
+
+    def __init__(self, path):
+        self.path = path
+        self.cursor = None
+        self.processed = 0
+        self.written = 0
+        self.failed = 0
+        self.failed_ids = []
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.cursor = tuple(data["cursor"]) if data.get("cursor") else None
+            self.processed = data.get("processed", 0)
+            self.written = data.get("written", 0)
+            self.failed = data.get("failed", 0)
+            self.failed_ids = data.get("failed_ids", [])
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "cursor": list(self.cursor) if self.cursor else None,
+                "processed": self.processed,
+                "written": self.written,
+                "failed": self.failed,
+                "failed_ids": self.failed_ids,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+class Rescorer:
+    def __init__(self, storage, llm, *, user=None, concurrency=8, rps=5.0, page_size=200,
+                 batch_size=50, checkpoint=None, limit=None, dry_run=False, prompt_mode="legacy", retry_failed=False,
+                 log=print):
+        self.storage = storage
+        self.llm = llm
+        self.user = user
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self.limit = limit
+        self.dry_run = dry_run
+        self.prompt_mode = prompt_mode
+        self.retry_failed = retry_failed
+        self.log = log
+        self.rate = rps
+        self._prompts = {}
+        # 数据库操作串行走单独线程，LLM 调用走并发线程池
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rescore-db")
+        self._llm_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rescore-llm")
+
+    def _load_prompts(self, usernames):
+        """取各用户当前生效的 prompt；在数据库线程中执行"""
+        for username in usernames:
+            if username in self._prompts:
+                continue
+            data = self.storage.get_user_settings(username) or {}
+            self._prompts[username] = effective_prompt(data.get("custom_prompt"), data.get("temperature"),
+                                                       self.prompt_mode)
+
+    def _score_sync(self, row):
+        system_prompt, temperature = self._prompts[row["user_id"]]
+        result = request_analysis(self.llm, row["user_input"], system_prompt, temperature,
+                                  structured=is_structured(system_prompt))
+        if not isinstance(result, dict) or "error" in result:
+            return None
+        try:
+            old = row["ai_result"] if isinstance(row["ai_result"], dict) else json.loads(row["ai_result"])
+            old_date = old.get("date")
+        except (TypeError, ValueError, AttributeError):
+            old_date = None
+        result["date"] = old_date or str(row["created_at"])[:10]
+        return result
+
+    async def _score(self, row, sem, limiter):
+        async with sem:
+            await limiter.acquire()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._llm_pool, self._score_sync, row)
+
+    async def _db_call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db, fn, *args)
+
+    async def _rescore_page(self, rows, sem, limiter):
+        """评分一页并分批回写，返回评分失败的 id"""
+        await self._db_call(self._load_prompts, {row["user_id"] for row in rows})
+        results = await asyncio.gather(*(self._score(row, sem, limiter) for row in rows))
+        failed, pending = [], []
+        for row, result in zip(rows, results):
+            if result is None:
+                failed.append(row["id"])
+                continue
+            pending.append({
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "user_input": row["user_input"],
+                "created_at": row["created_at"],
+                "ai_result": json.dumps(result, ensure_ascii=False),
+            })
+        for i in range(0, len(pending), self.batch_size):
+            await self._flush(pending[i:i + self.batch_size])
+        return failed
+
+    async def run(self):
+        if self.retry_failed:
+            return await self._run_retry()
+        ckpt = self.checkpoint
+        sem = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate, burst=self.concurrency)
+        started = time.monotonic()
+        done_this_run = failed_this_run = 0
+        cursor = ckpt.cursor
+        next_page = asyncio.ensure_future(self._db_call(self.storage.logs_page, cursor, self.page_size, self.user))
+        while True:
+            rows = await next_page
+            if self.limit is not None:
+                rows = rows[:max(0, self.limit - done_this_run)]
+            if not rows:
+                break
+            last = rows[-1]
+            cursor = (last["created_at"], last["id"])
+            # 当前页评分时预取下一页
+            next_page = asyncio.ensure_future(self._db_call(self.storage.logs_page, cursor, self.page_size, self.user))
+            failed = await self._rescore_page(rows, sem, limiter)
+            failed_this_run += len(failed)
+            done_this_run += len(rows)
+            if not self.dry_run:  # 只评分不回写时不动进度文件，之后的正式运行仍从原处开始
+                # 整页都已回写后才推进游标，中断后从这一页之后继续
+                ckpt.failed += len(failed)
+                ckpt.failed_ids.extend(failed)
+                ckpt.processed += len(rows)
+                ckpt.cursor = cursor
+                ckpt.save()
+            self._report(done_this_run, failed_this_run, started)
+        next_page.cancel()
+        self._report(done_this_run, failed_this_run, started, final=True)
+        return done_this_run, failed_this_run
+
+    async def _run_retry(self):
+        """只重试进度文件中记录的失败 id，不移动游标。每页处理完就保存：未重试的和再次失败的 id 留在
+        failed_ids 中，已不存在的行（如已删除）直接丢弃。--limit 限制本次重试的 id 数"""
+        ckpt = self.checkpoint
+        sem = asyncio.Semaphore(self.concurrency)
+        limiter = RateLimiter(self.rate, burst=self.concurrency)
+        started = time.monotonic()
+        untried = list(dict.fromkeys(ckpt.failed_ids))
+        if self.limit is not None:
+            untried, skipped = untried[:self.limit], untried[self.limit:]
+        else:
+            skipped = []
+        failed_again = []
+        done_this_run = 0
+        while untried:
+            chunk, untried = untried[:self.page_size], untried[self.page_size:]
+            rows = await self._db_call(self.storage.logs_page, None, len(chunk), self.user, chunk)
+            failed_again.extend(await self._rescore_page(rows, sem, limiter))
+            done_this_run += len(rows)
+            if not self.dry_run:  # 只评分不回写时失败记录保持原样
+                ckpt.failed_ids = untried + skipped + failed_again
+                ckpt.failed = len(ckpt.failed_ids)
+                ckpt.save()
+            self._report(done_this_run, len(failed_again), started)
+        self._report(done_this_run, len(failed_again), started, final=True)
+        return done_this_run, len(failed_again)
+
+    async def _flush(self, rows):
+        if not rows:
+            return
+        if not self.dry_run:
+            await self._db_call(self.storage.update_results, rows)
+            self.checkpoint.written += len(rows)
+
+    def _report(self, done, failed, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        rate = failed / done if done else 0.0
+        prefix = "完成" if final else "进度"
+        self.log(f"[{prefix}] 本次 {done} 行, {done / elapsed:.2f} 行/秒, 失败率 {rate:.1%}, "
+                 f"累计 {self.checkpoint.processed} 行 / 回写 {self.checkpoint.written} / 失败 {self.checkpoint.failed}")
+
+    def close(self):
+        self._db.shutdown(wait=False)
+        self._llm_pool.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按当前 prompt 重新评分历史 emotion_logs")
+    parser.add_argument("--checkpoint", default="rescore_checkpoint.json", help="进度文件，存在时从中断处继续")
+    parser.add_argument("--user", help="只处理该用户的记录")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的 LLM 调用数")
+    parser.add_argument("--rps", type=float, default=5.0, help="每秒最多发起的 LLM 调用数，0 为不限")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50, help="每次回写的行数")
+    parser.add_argument("--limit", type=int, help="本次最多处理的行数")
+    parser.add_argument("--dry-run", action="store_true", help="只评分不回写，也不更新进度文件")
+    parser.add_argument("--retry-failed", action="store_true", help="只重试进度文件中记录的失败行，不推进游标")
+    parser.add_argument("--prompt-mode", choices=PROMPT_MODES, default=get_setting("PROMPT_MODE", "legacy"),
+                        help="默认 prompt 与输出解析方式，同页面的 PROMPT_MODE")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(get_setting)
+    llm = LLMClient(
+        get_setting("OPENAI_API_KEY"),
+        base_url=get_setting("LLM_BASE_URL", DEFAULT_BASE_URL),
+        connect_timeout=float(get_setting("LLM_CONNECT_TIMEOUT", 5)),
+        read_timeout=float(get_setting("LLM_READ_TIMEOUT", 60)),
+        max_retries=int(get_setting("LLM_MAX_RETRIES", 3)),
+        max_connections=max(args.concurrency, 1),
+    )
+    rescorer = Rescorer(
+        storage, llm, user=args.user, concurrency=args.concurrency, rps=args.rps, page_size=args.page_size,
+        batch_size=args.batch_size, checkpoint=Checkpoint(args.checkpoint), limit=args.limit,
+        dry_run=args.dry_run, prompt_mode=args.prompt_mode, retry_failed=args.retry_failed,
+    )
+    try:
+        _, failed = asyncio.run(rescorer.run())
+        if not args.dry_run:
+            # 分数变了，日汇总要随之重建
+            rebuild_rollups(storage, user=args.user)
+    finally:
+        rescorer.close()
+        llm.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""分析结果缓存：按 (system prompt, temperature, 规范化输入) 的哈希寻址，TTL + LRU 淘汰。"""
+import copy
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from mindfocus.tracing import tracer
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """全半角统一、去首尾空白、连续空白折叠为一个空格"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def cache_key(system_prompt, temperature, text):
+    h = hashlib.sha256()
+    for part in (system_prompt or '', repr(float(temperature)), normalize_text(text)):
+        h.update(part.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+class ResultCache:
+    """线程安全的 TTL/LRU 缓存，存取时都做深拷贝，调用方可以放心修改结果。
+    命中/未命中次数记为 mindfocus_result_cache_{hits,misses}_total 指标，以 name 为 cache 标签"""
+
+    def __init__(self, max_entries=1000, ttl_seconds=3600, clock=time.monotonic, name="result"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._clock = clock
+        self._items = OrderedDict()  # key -> (过期时间, 结果)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > self._clock():
+                self._items.move_to_end(key)
+                result = copy.deepcopy(item[1])
+            else:
+                if item is not None:
+                    del self._items[key]
+                result = None
+            size = len(self._items)
+        tracer.inc("mindfocus_result_cache_misses_total" if result is None else "mindfocus_result_cache_hits_total",
+                   cache=self.name)
+        tracer.gauge("mindfocus_result_cache_entries", size, cache=self.name)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._items[key] = (self._clock() + self.ttl_seconds, copy.deepcopy(result))
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
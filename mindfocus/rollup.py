@@ -0,0 +1,166 @@
+"""按用户、按北京时间自然日预聚合的情绪分数（emotion_daily 表）。
+
+每次写入日志时在同一事务内累加当天一行；周/月/年趋势图只读这张表，一年约 365 行。
+存储后端在写入路径上导入本模块，pandas 只在生成趋势图数据的函数里导入，登录页不必加载。
+重新评分或迁移后用本模块重建：
+    python -m mindfocus.rollup [--user 用户名]
+"""
+import argparse
+import datetime
+import sys
+
+from mindfocus.config import get_setting
+from mindfocus.records import typed_columns
+
+SCORES = ("peace", "awareness", "energy")
+SCORE_LABELS = {"peace": "平静度", "awareness": "觉察度", "energy": "能量水平"}
+ORIENTATION_LABELS = {"past": "过去", "present": "当下", "future": "未来"}
+TARGETS = ("internal", "external")
+ROLLUP_COLUMNS = [
+    "user_id", "day", "count",
+    *(f"{score}_{agg}" for score in SCORES for agg in ("sum", "min", "max")),
+    *ORIENTATION_LABELS, *TARGETS,
+]
+# 视图 -> (天数, 聚合粒度)；一年的数据按周聚合
+PERIODS = {"week": (7, "D"), "month": (30, "D"), "year": (365, "W")}
+
+_BEIJING = datetime.timezone(datetime.timedelta(hours=8))
+
+
+def beijing_day(created_at):
+    """created_at（ISO 字符串或 datetime，无时区按 UTC）所在的北京时间日期，ISO 格式"""
+    dt = created_at if isinstance(created_at, datetime.datetime) else datetime.datetime.fromisoformat(str(created_at))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.astimezone(_BEIJING).date().isoformat()
+
+
+def result_delta(ai_result):
+    """一条 ai_result 对当日汇总的贡献，分类规则同 records.typed_columns；同样不会因 ai_result 的形状失败"""
+    columns = typed_columns(ai_result)
+    return {
+        "peace": columns["peace"],
+        "awareness": columns["awareness"],
+        "energy": columns["energy"],
+        "orientation": columns["time_orientation"].lower(),
+        "target": columns["focus_target"].lower(),
+    }
+
+
+def delta_row(user_id, day, delta):
+    """单条记录构成的汇总行，列同 ROLLUP_COLUMNS"""
+    row = {"user_id": user_id, "day": day, "count": 1}
+    for score in SCORES:
+        row[f"{score}_sum"] = row[f"{score}_min"] = row[f"{score}_max"] = delta[score]
+    for name in (*ORIENTATION_LABELS, *TARGETS):
+        row[name] = int(delta["orientation"] == name or delta["target"] == name)
+    return row
+
+
+def merge_rows(acc, row):
+    """把 row 累加进 acc（同一 user_id/day），acc 为 None 时返回 row 的副本"""
+    if acc is None:
+        return dict(row)
+    acc["count"] += row["count"]
+    for score in SCORES:
+        acc[f"{score}_sum"] += row[f"{score}_sum"]
+        acc[f"{score}_min"] = min(acc[f"{score}_min"], row[f"{score}_min"])
+        acc[f"{score}_max"] = max(acc[f"{score}_max"], row[f"{score}_max"])
+    for name in (*ORIENTATION_LABELS, *TARGETS):
+        acc[name] += row[name]
+    return acc
+
+
+def period_range(period, today=None):
+    """视图对应的 (起始日, 结束日)，含今天"""
+    days, _ = PERIODS[period]
+    today = today or datetime.datetime.now(_BEIJING).date()
+    return (today - datetime.timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def _bucketed(rows, freq):
+    import pandas as pd
+    frame = pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+    frame["Date"] = pd.to_datetime(frame["day"])
+    if freq == "W":
+        frame["Date"] = frame["Date"].dt.to_period("W").dt.start_time
+    sums = frame.groupby("Date")[["count", *(f"{s}_sum" for s in SCORES), *ORIENTATION_LABELS]].sum()
+    mins = frame.groupby("Date")[[f"{s}_min" for s in SCORES]].min()
+    maxs = frame.groupby("Date")[[f"{s}_max" for s in SCORES]].max()
+    return sums.join(mins).join(maxs).reset_index()
+
+
+def score_frame(rows, freq="D"):
+    """长格式的分数趋势：Date / Metric / Mean / Min / Max，均值按记录数加权"""
+    import pandas as pd
+    if not rows:
+        return pd.DataFrame(columns=["Date", "Metric", "Mean", "Min", "Max"])
+    buckets = _bucketed(rows, freq)
+    parts = [
+        pd.DataFrame({
+            "Date": buckets["Date"],
+            "Metric": SCORE_LABELS[score],
+            "Mean": (buckets[f"{score}_sum"] / buckets["count"]).round(2),
+            "Min": buckets[f"{score}_min"],
+            "Max": buckets[f"{score}_max"],
+        })
+        for score in SCORES
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+
+def focus_mix_frame(rows, freq="D"):
+    """长格式的时间维度分布：Date / Orientation / Count / Share"""
+    import pandas as pd
+    if not rows:
+        return pd.DataFrame(columns=["Date", "Orientation", "Count", "Share"])
+    buckets = _bucketed(rows, freq)
+    parts = [
+        pd.DataFrame({
+            "Date": buckets["Date"],
+            "Orientation": label,
+            "Count": buckets[name],
+            "Share": (buckets[name] / buckets["count"]).round(3),
+        })
+        for name, label in ORIENTATION_LABELS.items()
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+
+def rebuild_rollups(storage, user=None, page_size=1000, log=print):
+    """按 (created_at, id) 顺序扫描 emotion_logs 重新计算汇总，替换重建范围（user 或全部用户）内的全部汇总行，返回写入行数"""
+    acc = {}
+    cursor = None
+    scanned = 0
+    while True:
+        rows = storage.logs_page(cursor, page_size, user)
+        if not rows:
+            break
+        for row in rows:
+            try:
+                delta = result_delta(row["ai_result"])
+            except (TypeError, ValueError):
+                continue
+            key = (row["user_id"], beijing_day(row["created_at"]))
+            acc[key] = merge_rows(acc.get(key), delta_row(*key, delta))
+        scanned += len(rows)
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+        log(f"[进度] 已扫描 {scanned} 行, {len(acc)} 个用户日")
+    storage.replace_rollups(list(acc.values()), user_id=user)
+    log(f"[完成] 扫描 {scanned} 行, 写入 {len(acc)} 行汇总")
+    return len(acc)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 emotion_logs 重建 emotion_daily 汇总表")
+    parser.add_argument("--user", help="只重建该用户")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from mindfocus.storage import open_storage
+    rebuild_rollups(open_storage(get_setting), user=args.user, page_size=args.page_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
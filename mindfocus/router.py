@@ -0,0 +1,213 @@
+"""多后端 LLM 路由：按顺序排列的 OpenAI 兼容端点/模型，慢请求对冲、失败回退、熔断。
+
+主后端超过其近期延迟的 hedge_percentile 分位仍未返回时，向下一个健康后端再发一次请求，
+取最先返回的合格结果；某个后端返回失败时立即改试下一个。连续失败 breaker_failures 次的后端
+熔断 breaker_cooldown 秒，期间跳过；冷却结束后放行一次试探请求，成功即恢复。
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from mindfocus.analysis import MODEL, request_analysis
+from mindfocus.llm import DEFAULT_BASE_URL, LLMClient
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器：closed -> open（冷却）-> half_open（放行一次试探）-> closed/open"""
+
+    def __init__(self, failures=3, cooldown=30.0, clock=time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._clock = clock
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否放行一次请求；冷却结束后只放行一个试探请求（试探请求被中止、迟迟没有结果时，再过一个冷却期重新放行）"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self._clock() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._opened_at = self._clock()
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.state = CLOSED
+                self._consecutive = 0
+                return
+            self._consecutive += 1
+            if self.state == HALF_OPEN or self._consecutive >= self.failures:
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+
+class Backend:
+    """一个端点 + 模型，记录近期成功请求的延迟用于计算对冲阈值"""
+
+    def __init__(self, name, client, model=MODEL, breaker=None, window=100):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, p, min_samples=10):
+        """近期延迟的 p 分位（秒），样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+class _Cancelled(Exception):
+    """已有其他后端胜出，中止本路流式请求"""
+
+
+class LLMRouter:
+    """对外提供与 request_analysis 相同的 analyze 接口"""
+
+    def __init__(self, backends, hedge_percentile=95, hedge_delay=8.0, min_hedge_delay=1.0, max_workers=16):
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay            # 延迟样本不足时的对冲等待秒数
+        self.min_hedge_delay = min_hedge_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-route")
+
+    def hedge_after(self, backend):
+        """向 backend 发出请求后，等多久未返回就发对冲请求"""
+        delay = backend.percentile(self.hedge_percentile)
+        return max(self.min_hedge_delay, self.hedge_delay if delay is None else delay)
+
+    def _call(self, backend, text, system_prompt, temperature, on_partial, structured, state):
+        meta = {}
+        aborted = []
+        partial = None
+        if on_partial is not None:
+            def partial(p, completed):
+                # 第一个输出部分结果的后端占用展示；已决出胜者后其余流式请求直接中止
+                with state["lock"]:
+                    if state["winner"] is not None and state["winner"] is not backend:
+                        aborted.append(True)
+                        raise _Cancelled()
+                    if state["streaming"] is None:
+                        state["streaming"] = backend
+                    owner = state["streaming"] is backend
+                if owner:
+                    on_partial(p, completed)
+        started = time.monotonic()
+        result = request_analysis(backend.client, text, system_prompt, temperature, on_partial=partial,
+                                  meta=meta, structured=structured, model=backend.model)
+        elapsed = time.monotonic() - started
+        with state["lock"]:
+            if state["streaming"] is backend and "error" in result:
+                state["streaming"] = None
+        ok = "error" not in result
+        # 被主动中止的请求不计入健康统计
+        if not aborted:
+            backend.breaker.record(ok)
+            if ok:
+                backend.observe(elapsed)
+        return backend, result, meta
+
+    def analyze(self, text, system_prompt, temperature, on_partial=None, meta=None, structured=False):
+        """返回最先到达的合格结果；所有后端都失败时返回最后一个错误。
+        meta 写入胜出调用的 attempts/usage/repairs，以及 backend（胜出后端名）和 hedged（是否发过对冲请求）"""
+        meta = {} if meta is None else meta
+        state = {"lock": threading.Lock(), "winner": None, "streaming": None}
+        pending = set()
+        next_index = 0
+        hedged = False
+        last = {"error": "没有可用的 LLM 后端"}
+
+        def submit(backend):
+            pending.add(self._executor.submit(self._call, backend, text, system_prompt, temperature,
+                                              on_partial, structured, state))
+            return backend
+
+        def launch():
+            """按顺序发给下一个熔断器放行的后端，没有则返回 None"""
+            nonlocal next_index
+            while next_index < len(self.backends):
+                backend = self.backends[next_index]
+                next_index += 1
+                if backend.breaker.allow():
+                    return submit(backend)
+            return None
+
+        # 全部熔断时仍试第一个，避免直接失败
+        first = launch() or submit(self.backends[0])
+        deadline = time.monotonic() + self.hedge_after(first)
+        while pending:
+            # 对冲只发一次：之后只在失败时回退到下一个后端
+            timeout = None if hedged or next_index >= len(self.backends) else max(0.0, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = launch() is not None
+                if not hedged:
+                    next_index = len(self.backends)
+                continue
+            for future in done:
+                pending.discard(future)
+                backend, result, call_meta = future.result()
+                if "error" not in result:
+                    with state["lock"]:
+                        state["winner"] = backend
+                    meta.update(call_meta, backend=backend.name, hedged=hedged)
+                    return result
+                last = result
+                meta.update(call_meta)
+            if not pending:
+                launch()
+        meta.update(backend=None, hedged=hedged)
+        return last
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for backend in self.backends:
+            backend.client.close()
+
+
+def backends_from_settings(get, api_key, max_connections=20):
+    """按配置构造后端列表。LLM_BACKENDS 为表数组（name / base_url / model / api_key，api_key 缺省用 OPENAI_API_KEY），
+    未配置时只有 LLM_BASE_URL 上的 deepseek-chat 一个后端"""
+    specs = get("LLM_BACKENDS") or [{"name": "default", "base_url": get("LLM_BASE_URL", DEFAULT_BASE_URL)}]
+    failures = int(get("LLM_BREAKER_FAILURES", 3))
+    cooldown = float(get("LLM_BREAKER_COOLDOWN", 30))
+    backends = []
+    for i, spec in enumerate(specs):
+        spec = dict(spec)
+        client = LLMClient(
+            spec.get("api_key") or api_key,
+            base_url=spec.get("base_url", DEFAULT_BASE_URL),
+            connect_timeout=float(get("LLM_CONNECT_TIMEOUT", 5)),
+            read_timeout=float(get("LLM_READ_TIMEOUT", 60)),
+            max_retries=int(get("LLM_MAX_RETRIES", 3)),
+            max_connections=max_connections,
+        )
+        backends.append(Backend(spec.get("name") or f"backend{i}", client, spec.get("model", MODEL),
+                                CircuitBreaker(failures, cooldown)))
+    return backends
+
+
+def router_from_settings(get, api_key):
+    return LLMRouter(
+        backends_from_settings(get, api_key),
+        hedge_percentile=float(get("LLM_HEDGE_PERCENTILE", 95)),
+        hedge_delay=float(get("LLM_HEDGE_DELAY", 8)),
+        min_hedge_delay=float(get("LLM_HEDGE_MIN_DELAY", 1)),
+    )
@@ -0,0 +1,26 @@
+"""多副本共享状态：历史快照、配额计数、分析任务状态都通过 SharedState 接口读写。"""
+from mindfocus.shared_state.base import FailSoft, SharedState
+from mindfocus.shared_state.memory_backend import MemorySharedState
+from mindfocus.shared_state.sqlite_backend import DEFAULT_SHARED_STATE_PATH, SqliteSharedState
+
+__all__ = [
+    "DEFAULT_SHARED_STATE_PATH",
+    "FailSoft",
+    "MemorySharedState",
+    "SharedState",
+    "SqliteSharedState",
+    "open_shared_state",
+]
+
+
+def open_shared_state(get):
+    """按配置创建共享状态后端；get(name, default) 为配置读取函数（st.secrets 或环境变量）"""
+    backend = get("SHARED_STATE_BACKEND", "memory")
+    if backend == "memory":
+        return MemorySharedState()
+    if backend == "sqlite":
+        return SqliteSharedState(get("SHARED_STATE_PATH", DEFAULT_SHARED_STATE_PATH))
+    if backend == "redis":
+        from mindfocus.shared_state.redis_backend import RedisSharedState
+        return RedisSharedState(get("SHARED_STATE_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"未知的共享状态后端: {backend}")
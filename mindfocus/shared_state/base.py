@@ -0,0 +1,64 @@
+"""共享状态接口：多个 Streamlit 副本共用的带 TTL 键值存储，存放历史快照、配额计数和分析任务状态。
+
+值须可 JSON 序列化，读出的是副本，修改不影响已存的值。出错时直接抛异常，由 FailSoft 包装后降级为未命中。
+"""
+import json
+
+from mindfocus.tracing import tracer
+
+
+class SharedState:
+    def get(self, key):
+        """未设置或已过期返回 None"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """ttl 为秒，None 表示不过期"""
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def incr(self, key, amount=1, ttl=None):
+        """原子加 amount 并返回新值，键不存在时从 0 开始；ttl 给定时刷新过期时间"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(raw):
+    return None if raw is None else json.loads(raw)
+
+
+class FailSoft:
+    """共享状态只是缓存：后端出错时读按未命中、写按无操作处理，计入 mindfocus_shared_state_errors_total"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def _call(self, name, default, *args, **kwargs):
+        try:
+            return getattr(self.state, name)(*args, **kwargs)
+        except Exception:
+            tracer.inc("mindfocus_shared_state_errors_total", op=name)
+            return default
+
+    def get(self, key):
+        return self._call("get", None, key)
+
+    def set(self, key, value, ttl=None):
+        self._call("set", None, key, value, ttl)
+
+    def delete(self, *keys):
+        self._call("delete", None, *keys)
+
+    def incr(self, key, amount=1, ttl=None):
+        return self._call("incr", None, key, amount, ttl)
+
+    def close(self):
+        self._call("close", None)
@@ -0,0 +1,57 @@
+"""进程内共享状态：单副本部署的默认后端，也是测试中的替身；不跨进程。"""
+import threading
+import time
+
+from mindfocus.shared_state.base import SharedState, dumps, loads
+
+
+class MemorySharedState(SharedState):
+    def __init__(self, clock=time.monotonic, max_entries=100000):
+        self._clock = clock
+        self.max_entries = max_entries
+        self._data = {}          # key -> (JSON 文本, 过期时刻或 None)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= self._clock():
+            del self._data[key]
+            return None
+        return item
+
+    def _purge(self):
+        now = self._clock()
+        for key in [k for k, (_, expires) in self._data.items() if expires is not None and expires <= now]:
+            del self._data[key]
+        # 仍然超限时丢弃最早写入的
+        while len(self._data) > self.max_entries:
+            del self._data[next(iter(self._data))]
+
+    def _expires(self, ttl):
+        return None if ttl is None else self._clock() + ttl
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key)
+        return loads(item[0]) if item else None
+
+    def set(self, key, value, ttl=None):
+        raw = dumps(value)
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (raw, self._expires(ttl))
+            if len(self._data) > self.max_entries:
+                self._purge()
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            item = self._live(key)
+            value = (loads(item[0]) if item else 0) + amount
+            expires = self._expires(ttl) if ttl is not None else (item[1] if item else None)
+            self._data[key] = (dumps(value), expires)
+            return value
@@ -0,0 +1,35 @@
+"""Redis 共享状态：多台机器上的副本共用；需要安装 redis（redis-py）。"""
+from mindfocus.shared_state.base import SharedState, dumps, loads
+
+
+class RedisSharedState(SharedState):
+    def __init__(self, url, prefix="mindfocus:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_BACKEND=redis 需要安装 redis")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def get(self, key):
+        return loads(self._client.get(self._key(key)))
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self._key(key), dumps(value), ex=None if ttl is None else max(1, round(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self._key(k) for k in keys))
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._client.pipeline() as pipe:
+            pipe.incrby(self._key(key), amount)
+            if ttl is not None:
+                pipe.expire(self._key(key), max(1, round(ttl)))
+            return int(pipe.execute()[0])
+
+    def close(self):
+        self._client.close()
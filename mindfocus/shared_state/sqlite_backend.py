@@ -0,0 +1,81 @@
+"""SQLite 共享状态：同一台机器（或共享卷）上的多个副本共用一个文件，也用于测试多副本行为。"""
+import sqlite3
+import threading
+import time
+
+from mindfocus.shared_state.base import SharedState, dumps, loads
+
+DEFAULT_SHARED_STATE_PATH = "shared_state.db"
+PURGE_EVERY = 1000  # 每写入这么多次清理一次过期键
+
+SCHEMA = """
+create table if not exists shared_state (
+    key text primary key,
+    value text not null,
+    expires_at real
+);
+"""
+
+
+class SqliteSharedState(SharedState):
+    """过期时间用墙钟（各进程一致）；单连接 + 锁串行访问，WAL 模式下多进程并发读写"""
+
+    def __init__(self, path=DEFAULT_SHARED_STATE_PATH, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._lock = threading.Lock()
+        self._writes = 0
+        if path != ":memory:":
+            self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=normal")
+        self._conn.executescript(SCHEMA)
+
+    def _expires(self, ttl):
+        return None if ttl is None else self._clock() + ttl
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self._conn.execute("delete from shared_state where expires_at <= ?", (self._clock(),))
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "select value from shared_state where key = ? and (expires_at is null or expires_at > ?)",
+                (key, self._clock())).fetchone()
+        return loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        raw = dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "insert into shared_state (key, value, expires_at) values (?, ?, ?) "
+                "on conflict (key) do update set value = excluded.value, expires_at = excluded.expires_at",
+                (key, raw, self._expires(ttl)))
+            self._wrote()
+
+    def delete(self, *keys):
+        if keys:
+            with self._lock:
+                self._conn.execute(f"delete from shared_state where key in ({', '.join('?' * len(keys))})", keys)
+
+    def incr(self, key, amount=1, ttl=None):
+        now = self._clock()
+        with self._lock:
+            # 已过期的旧值按 0 处理；ttl 为 None 时保留原过期时间
+            row = self._conn.execute(
+                "insert into shared_state (key, value, expires_at) values (?, ?, ?) "
+                "on conflict (key) do update set "
+                "value = case when expires_at is not null and expires_at <= ? then excluded.value "
+                "else cast(value as integer) + ? end, "
+                "expires_at = case when ? is not null then excluded.expires_at "
+                "when expires_at is not null and expires_at <= ? then null else expires_at end "
+                "returning value",
+                (key, str(amount), self._expires(ttl), now, amount, ttl, now)).fetchone()
+            self._wrote()
+        return int(row[0])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,351 @@
+"""「相似的过去时刻」：每个用户一份本地文本索引，不访问网络。
+
+文本按 result_cache.normalize_text 规范化后取字符 1~2-gram，哈希到 2^18 维，
+文档向量为 L2 归一化的亚线性词频（1 + log tf），按 CSR 三个数组（indptr/int64、indices/int32、data/float32）
+追加写入磁盘，另存 log id 和三项分数（int8）。文档频率在加载时由 indices 一次 bincount 得到，之后随写入增量更新；
+查询时 IDF² 加权查询向量，一次 gather + reduceat 算出对所有文档的相似度，再与分数距离按权重混合。
+
+每次写库后 add() 追加一条；meta.json 最后原子写入，加载时按其中的计数读取，写到一半的尾部在下次追加前截断。
+多个进程（如同机的多个副本）可以共用一个索引目录：追加和写 meta 持目录下 lock 文件的排他锁（fcntl.flock），
+持锁后先重读 meta，其他进程追加过就重新加载；查询前同样检查 meta。没有 fcntl 的平台（Windows）上
+每个索引目录只能有一个写入进程。
+补建/重建（--rebuild 先删除旧索引，重新评分后分数有变化时使用；重建期间应停止应用）：
+    python -m mindfocus.similar [--user 用户名] [--rebuild]
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from mindfocus.config import get_setting
+from mindfocus.records import typed_columns
+from mindfocus.result_cache import normalize_text
+
+DIM = 1 << 18
+NGRAMS = (1, 2)
+TEXT_WEIGHT = 0.7          # 混合得分中文本相似度的权重，其余为分数接近程度
+MAX_SCORE_DISTANCE = math.sqrt(3 * 10 ** 2)
+_FILES = {"indptr": np.int64, "indices": np.int32, "data": np.float32, "ids": np.int64, "scores": np.int8}
+
+
+def vectorize(text):
+    """(哈希桶, 权重) 两个数组，权重 L2 归一化；空文本返回空数组"""
+    text = normalize_text(text).lower()
+    grams = Counter(text[i:i + n] for n in NGRAMS for i in range(len(text) - n + 1))
+    buckets = Counter()
+    for gram, tf in grams.items():
+        buckets[zlib.crc32(gram.encode("utf-8")) & (DIM - 1)] += tf
+    if not buckets:
+        return np.empty(0, np.int32), np.empty(0, np.float32)
+    indices = np.fromiter(buckets.keys(), np.int32, len(buckets))
+    weights = 1 + np.log(np.fromiter(buckets.values(), np.float32, len(buckets)))
+    return indices, (weights / np.linalg.norm(weights)).astype(np.float32)
+
+
+def score_vector(ai_result):
+    columns = typed_columns(ai_result)
+    return np.array([columns["peace"], columns["awareness"], columns["energy"]], np.int8)
+
+
+class _Buffer:
+    """容量倍增的一维数组，append 摊还 O(1)"""
+
+    def __init__(self, values, dtype):
+        self.size = len(values)
+        self.array = np.empty(max(16, self.size * 2), dtype)
+        self.array[:self.size] = values
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.array):
+            grown = np.empty(max(end, len(self.array) * 2), self.array.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = values
+        self.size = end
+
+    def view(self):
+        return self.array[:self.size]
+
+
+class SimilarIndex:
+    """单个用户的索引，线程安全；path 为该用户的索引目录"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        with self._file_lock(exclusive=True):
+            if not os.path.exists(self._file("indptr")):
+                np.zeros(1, np.int64).tofile(self._file("indptr"))
+            self._load(self._read_meta())
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """跨进程的目录锁：追加 + 写 meta 持排他锁，读取持共享锁"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, "lock"), "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _counts(self, meta):
+        n, nnz = meta["n"], meta["nnz"]
+        return {"indptr": n + 1, "indices": nnz, "data": nnz, "ids": n, "scores": n * 3}
+
+    def _load(self, meta):
+        """按 meta 中的计数读入各数组（meta 之后未完成的追加不读）；调用方持有文件锁"""
+        arrays = {}
+        for name, count in self._counts(meta).items():
+            file = self._file(name)
+            dtype = _FILES[name]
+            values = np.fromfile(file, dtype, count) if os.path.exists(file) else np.empty(0, dtype)
+            if len(values) < count:
+                raise ValueError(f"索引文件 {file} 不完整，请重建")
+            arrays[name] = _Buffer(values, dtype)
+        indptr = arrays["indptr"].view()
+        if indptr[0] != 0 or indptr[-1] != meta["nnz"] or np.any(indptr[1:] < indptr[:-1]):
+            raise ValueError(f"索引 {self.path} 的 indptr 不单调或与 meta 不符，请重建")
+        self._arrays = arrays
+        self._meta = meta
+        self._id_set = set(arrays["ids"].view().tolist())
+        self._df = np.bincount(arrays["indices"].view(), minlength=DIM).astype(np.int32)
+
+    def _refresh(self):
+        """其他进程追加过（meta 有变化）时重新加载；调用方持有文件锁"""
+        meta = self._read_meta()
+        if meta != self._meta:
+            self._load(meta)
+
+    def _truncate_tails(self):
+        """丢弃 meta 之后未完成的追加，新数据才能接在正确的偏移上；调用方持有排他锁"""
+        for name, count in self._counts(self._meta).items():
+            file = self._file(name)
+            size = count * np.dtype(_FILES[name]).itemsize
+            if os.path.exists(file) and os.path.getsize(file) != size:
+                with open(file, "r+b") as f:
+                    f.truncate(size)
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"n": 0, "nnz": 0}
+
+    def _write_meta(self):
+        meta = {"n": len(self), "nnz": self._arrays["indptr"].view()[-1].item()}
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._meta = meta
+
+    def __len__(self):
+        return self._arrays["ids"].size
+
+    def add_many(self, rows):
+        """追加若干 emotion_logs 行（需含 id / user_input / ai_result），已收录的 id 跳过，返回新增条数"""
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            fresh = []
+            for row in rows:
+                if row.get("id") is None or int(row["id"]) in self._id_set:
+                    continue
+                try:
+                    scores = score_vector(row["ai_result"])
+                except (TypeError, ValueError):
+                    continue
+                indices, data = vectorize(row.get("user_input"))
+                fresh.append((int(row["id"]), indices, data, scores))
+                self._id_set.add(int(row["id"]))
+            if not fresh:
+                return 0
+            self._truncate_tails()
+            start = self._arrays["indptr"].view()[-1]
+            indptr = start + np.cumsum([len(f[1]) for f in fresh], dtype=np.int64)
+            batch = {
+                "indptr": indptr,
+                "indices": np.concatenate([f[1] for f in fresh]),
+                "data": np.concatenate([f[2] for f in fresh]),
+                "ids": np.array([f[0] for f in fresh], np.int64),
+                "scores": np.concatenate([f[3] for f in fresh]),
+            }
+            for name, values in batch.items():
+                with open(self._file(name), "ab") as f:
+                    f.write(np.ascontiguousarray(values, _FILES[name]).tobytes())
+                self._arrays[name].extend(values)
+            np.add.at(self._df, batch["indices"], 1)
+            self._write_meta()
+            return len(fresh)
+
+    def add(self, row):
+        return self.add_many([row])
+
+    def search(self, text, scores=None, k=3, exclude=()):
+        """与 text（及三项分数）最相近的 k 条，返回 [(log id, 相似度)]，相似度越大越近"""
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._refresh()
+            n = len(self)
+            if n == 0:
+                return []
+            indptr = self._arrays["indptr"].view()
+            indices = self._arrays["indices"].view()
+            data = self._arrays["data"].view()
+            ids = self._arrays["ids"].view()
+            q_indices, q_data = vectorize(text)
+            idf = np.log((1 + n) / (1 + self._df[q_indices].astype(np.float32))) + 1
+            query = np.zeros(DIM, np.float32)
+            query[q_indices] = q_data * idf * idf
+            norm = np.linalg.norm(q_data * idf)
+            contrib = query[indices] * data
+            # reduceat 对空段返回该位置的元素本身，空文档单独置零
+            text_sim = np.zeros(n, np.float32)
+            nonempty = indptr[1:] > indptr[:-1]
+            if contrib.size:
+                sums = np.add.reduceat(contrib, indptr[:-1][nonempty])
+                text_sim[nonempty] = sums / max(norm, 1e-9)
+            if scores is not None:
+                distance = np.linalg.norm(
+                    self._arrays["scores"].view().reshape(n, 3).astype(np.float32) - np.asarray(scores, np.float32),
+                    axis=1)
+                similarity = TEXT_WEIGHT * text_sim + (1 - TEXT_WEIGHT) * (1 - distance / MAX_SCORE_DISTANCE)
+            else:
+                similarity = text_sim
+            if exclude:
+                similarity[np.isin(ids, list(exclude))] = -np.inf
+            k = min(k, n)
+            top = np.argpartition(-similarity, k - 1)[:k]
+            top = top[np.argsort(-similarity[top])]
+            return [(ids[i].item(), float(similarity[i])) for i in top if np.isfinite(similarity[i])]
+
+
+def user_dir(root, user_id):
+    """用户名哈希作目录名，避免特殊字符"""
+    return os.path.join(root, hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()[:16])
+
+
+class SimilarIndexes:
+    """进程级的各用户索引，按需加载、LRU 保留 max_users 个"""
+
+    def __init__(self, root, max_users=64):
+        self.root = root
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = self._indexes[user_id] = SimilarIndex(user_dir(self.root, user_id))
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(user_id)
+            return index
+
+
+def backfill(index, storage, user_id, page_size=1000):
+    """从 emotion_logs 补全单个用户的索引（已收录的跳过），返回新增条数"""
+    cursor = None
+    added = 0
+    while True:
+        rows = storage.logs_page(cursor, page_size, user_id)
+        if not rows:
+            return added
+        added += index.add_many(rows)
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+class Backfiller:
+    """在一个后台线程中从历史补建索引，不占用写库路径；同一用户同时只排一个补建任务"""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similar-backfill")
+
+    def submit(self, storage, user_id):
+        """排队补建 user_id 的索引，已在排队的跳过；返回是否新排了任务"""
+        with self._lock:
+            if user_id in self._pending:
+                return False
+            self._pending.add(user_id)
+        self._executor.submit(self._run, storage, user_id)
+        return True
+
+    def _run(self, storage, user_id):
+        try:
+            backfill(self.indexes.get(user_id), storage, user_id)
+        except Exception:
+            pass  # 索引只是辅助功能，失败时下次写库再排
+        finally:
+            with self._lock:
+                self._pending.discard(user_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def build_index(storage, root, user=None, page_size=1000, log=print):
+    """按 keyset 扫描 emotion_logs 追加进各用户索引（已收录的跳过），返回新增条数"""
+    indexes = SimilarIndexes(root, max_users=1 << 30)
+    cursor = None
+    added = scanned = 0
+    while True:
+        rows = storage.logs_page(cursor, page_size, user)
+        if not rows:
+            break
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row["user_id"], []).append(row)
+        for user_id, user_rows in by_user.items():
+            added += indexes.get(user_id).add_many(user_rows)
+        scanned += len(rows)
+        cursor = (rows[-1]["created_at"], rows[-1]["id"])
+        log(f"[进度] 已扫描 {scanned} 行, 新增 {added} 条")
+    log(f"[完成] 扫描 {scanned} 行, 新增 {added} 条")
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 emotion_logs 构建/补全相似时刻索引")
+    parser.add_argument("--user", help="只处理该用户")
+    parser.add_argument("--dir", default=get_setting("SIMILAR_INDEX_DIR", "similar_index"), help="索引目录")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--rebuild", action="store_true", help="先删除已有索引再全量构建")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        shutil.rmtree(user_dir(args.dir, args.user) if args.user else args.dir, ignore_errors=True)
+    from mindfocus.storage import open_storage
+    build_index(open_storage(get_setting), args.dir, user=args.user, page_size=args.page_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
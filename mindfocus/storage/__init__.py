@@ -0,0 +1,27 @@
+"""存储后端：页面和离线工具都只通过 Storage 接口读写，不直接拼 Supabase 查询。"""
+from mindfocus.storage.base import LIST_COLUMNS, LOG_COLUMNS, POINT_COLUMNS, USAGE_KEEP_DAYS, Storage
+from mindfocus.storage.sqlite_backend import DEFAULT_SQLITE_PATH, SqliteStorage
+from mindfocus.storage.supabase_backend import SupabaseStorage
+
+__all__ = [
+    "DEFAULT_SQLITE_PATH",
+    "LIST_COLUMNS",
+    "LOG_COLUMNS",
+    "POINT_COLUMNS",
+    "USAGE_KEEP_DAYS",
+    "SqliteStorage",
+    "Storage",
+    "SupabaseStorage",
+    "open_storage",
+]
+
+
+def open_storage(get):
+    """按配置创建存储后端；get(name, default) 为配置读取函数（st.secrets 或环境变量）"""
+    backend = get("STORAGE_BACKEND", "supabase")
+    if backend == "sqlite":
+        return SqliteStorage(get("SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    if backend == "supabase":
+        from supabase import create_client
+        return SupabaseStorage(create_client(get("SUPABASE_URL"), get("SUPABASE_KEY")))
+    raise ValueError(f"未知的存储后端: {backend}")
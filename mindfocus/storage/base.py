@@ -0,0 +1,70 @@
+"""存储接口定义。出错时直接抛异常，由调用方决定降级方式。"""
+
+USAGE_KEEP_DAYS = 30  # daily_usage 只保留最近 N 天
+LOG_COLUMNS = "id, user_id, user_input, created_at, ai_result"
+POINT_COLUMNS = "created_at, peace, time_orientation, focus_target"  # 当日图表只需要这几列
+# 历史列表只显示时间、原文和规范化分类，ai_result 展开某条时再取
+LIST_COLUMNS = "id, created_at, user_input, peace, awareness, energy, time_orientation, focus_target"
+
+
+class Storage:
+    """emotion_logs / test_accounts 的读写接口"""
+
+    def find_account(self, username, password):
+        """用户名密码匹配的账号行，不存在返回 None"""
+        raise NotImplementedError
+
+    def get_user_settings(self, username):
+        """{"custom_prompt", "temperature", "settings_version"}，账号不存在返回 None。
+        settings_version 在 custom_prompt / temperature 变化时递增，find_account 返回的行中也有"""
+        raise NotImplementedError
+
+    def get_daily_usage(self, username, day):
+        """day（ISO 日期字符串）当天已用次数"""
+        raise NotImplementedError
+
+    def log_analysis(self, entry):
+        """原子地插入一条日志并按 entry["count_usage"] 计配额，返回插入的行。
+
+        entry 含 client_id / user_id / user_input / ai_result(dict) / day / count_usage，
+        相同 client_id 重复调用时返回已有记录且不重复计数。同时写入 records.typed_columns 各列和
+        北京日期 local_day，并在同一事务内把该条记录累加进 emotion_daily 当天的汇总行。
+        """
+        raise NotImplementedError
+
+    def recent_logs(self, user_id, limit, newer_than=None):
+        """按 created_at 倒序取最近的日志；newer_than 给定时只取更新的行"""
+        raise NotImplementedError
+
+    def logs_page(self, after=None, limit=200, user_id=None, log_ids=None):
+        """按 (created_at, id) 升序取 after 游标之后的一页，列为 LOG_COLUMNS；给定 log_ids 时只取这些 id"""
+        raise NotImplementedError
+
+    def history_page(self, user_id, before=None, limit=20):
+        """按 (created_at, id) 倒序取 before 游标之前的一页，列为 LIST_COLUMNS"""
+        raise NotImplementedError
+
+    def get_log(self, user_id, log_id):
+        """该用户的一条日志（LOG_COLUMNS），不存在返回 None"""
+        raise NotImplementedError
+
+    def logs_by_ids(self, user_id, log_ids):
+        """该用户 id 在 log_ids 中的日志，列为 LIST_COLUMNS，顺序不定"""
+        raise NotImplementedError
+
+    def update_results(self, rows):
+        """批量改写 ai_result 及由其派生的规范化列，rows 为含 id 及 LOG_COLUMNS 各列的 dict"""
+        raise NotImplementedError
+
+    def day_points(self, user_id, start_day, end_day):
+        """local_day 在 [start_day, end_day] 内的日志，只取 POINT_COLUMNS，按 created_at 升序"""
+        raise NotImplementedError
+
+    def daily_rollups(self, user_id, start_day, end_day):
+        """emotion_daily 中 [start_day, end_day]（ISO 日期）的汇总行，按 day 升序，列为 rollup.ROLLUP_COLUMNS"""
+        raise NotImplementedError
+
+    def replace_rollups(self, rows, user_id=None):
+        """重建汇总用：先删除该用户（user_id 为 None 时为全部用户）已有的 emotion_daily 行，再写入 rows。
+        日志已全部删除的日子因此不会留下旧汇总"""
+        raise NotImplementedError
@@ -0,0 +1,287 @@
+"""嵌入式 SQLite 后端：单机部署可直接使用，也是测试和基准测试中 Supabase 的本地替身。"""
+import datetime
+import json
+import sqlite3
+import threading
+
+from mindfocus.records import typed_columns
+from mindfocus.rollup import ROLLUP_COLUMNS, SCORES, beijing_day, delta_row, result_delta
+from mindfocus.storage.base import LIST_COLUMNS, LOG_COLUMNS, POINT_COLUMNS, USAGE_KEEP_DAYS, Storage
+
+DEFAULT_SQLITE_PATH = "mindfocus.db"
+
+SCHEMA = """
+create table if not exists test_accounts (
+    username text primary key,
+    password text not null,
+    daily_limit integer not null default 20,
+    expires_at text not null,
+    is_active integer not null default 1,
+    custom_prompt text,
+    temperature real,
+    total_usage integer not null default 0,
+    settings_version integer not null default 0
+);
+create table if not exists daily_usage (
+    username text not null,
+    day text not null,
+    count integer not null default 0,
+    primary key (username, day)
+);
+create table if not exists emotion_logs (
+    id integer primary key autoincrement,
+    client_id text unique,
+    user_id text not null,
+    user_input text not null,
+    ai_result text not null,
+    created_at text not null,
+    peace integer,
+    awareness integer,
+    energy integer,
+    time_orientation text,
+    focus_target text,
+    local_day text
+);
+create index if not exists emotion_logs_user_created on emotion_logs (user_id, created_at, id);
+create index if not exists emotion_logs_created on emotion_logs (created_at, id);
+create table if not exists emotion_daily (
+    user_id text not null,
+    day text not null,
+    count integer not null default 0,
+    peace_sum integer not null default 0, peace_min integer, peace_max integer,
+    awareness_sum integer not null default 0, awareness_min integer, awareness_max integer,
+    energy_sum integer not null default 0, energy_min integer, energy_max integer,
+    past integer not null default 0, present integer not null default 0, future integer not null default 0,
+    internal integer not null default 0, external integer not null default 0,
+    primary key (user_id, day)
+);
+"""
+
+# 从 ai_result 冗余出来的规范化列（旧库打开时自动补列，用 mindfocus.backfill 回填）
+TYPED_LOG_COLUMNS = {
+    "peace": "integer",
+    "awareness": "integer",
+    "energy": "integer",
+    "time_orientation": "text",
+    "focus_target": "text",
+    "local_day": "text",
+}
+
+_ROLLUP_INSERT = (f"insert into emotion_daily ({', '.join(ROLLUP_COLUMNS)}) "
+                  f"values ({', '.join('?' * len(ROLLUP_COLUMNS))}) on conflict (user_id, day) do update set ")
+# 累加一条记录；replace 时整行覆盖
+ROLLUP_ADD = _ROLLUP_INSERT + ", ".join(
+    [f"{c} = {c} + excluded.{c}" for c in ROLLUP_COLUMNS[2:] if not c.endswith(("_min", "_max"))]
+    + [f"{s}_min = min({s}_min, excluded.{s}_min)" for s in SCORES]
+    + [f"{s}_max = max({s}_max, excluded.{s}_max)" for s in SCORES]
+)
+ROLLUP_REPLACE = _ROLLUP_INSERT + ", ".join(f"{c} = excluded.{c}" for c in ROLLUP_COLUMNS[2:])
+
+
+_TYPED = ", ".join(TYPED_LOG_COLUMNS)
+_TYPED_PARAMS = ", ".join("?" * len(TYPED_LOG_COLUMNS))
+
+
+def _typed_values(ai_result, created_at):
+    """按 TYPED_LOG_COLUMNS 顺序的列值"""
+    columns = typed_columns(ai_result)
+    return (columns["peace"], columns["awareness"], columns["energy"], columns["time_orientation"],
+            columns["focus_target"], beijing_day(created_at))
+
+
+def utc_now():
+    """与 Postgres timestamptz 返回值一致的 ISO 格式，定长，可直接按字符串比较"""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='microseconds')
+
+
+class SqliteStorage(Storage):
+    """单连接 + 锁串行访问；WAL 模式下读写互不阻塞其他进程"""
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=normal")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        existing = {r["name"] for r in self._all("pragma table_info(emotion_logs)")}
+        for name, sql_type in TYPED_LOG_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"alter table emotion_logs add column {name} {sql_type}")
+        self._conn.execute("create index if not exists emotion_logs_user_day on emotion_logs (user_id, local_day, created_at)")
+        if "settings_version" not in {r["name"] for r in self._all("pragma table_info(test_accounts)")}:
+            self._conn.execute("alter table test_accounts add column settings_version integer not null default 0")
+        # 定制 prompt / temperature 变化时版本号 +1，登录 token 里的旧版本随之失效
+        self._conn.execute(
+            "create trigger if not exists test_accounts_settings_version after update of custom_prompt, temperature "
+            "on test_accounts when old.custom_prompt is not new.custom_prompt or old.temperature is not new.temperature "
+            "begin update test_accounts set settings_version = settings_version + 1 where username = new.username; end")
+
+    def _all(self, sql, params=()):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def _one(self, sql, params=()):
+        rows = self._all(sql, params)
+        return rows[0] if rows else None
+
+    # ---------- 账号 ----------
+    def add_account(self, username, password, daily_limit=20, expires_at="2099-12-31", is_active=True,
+                    custom_prompt=None, temperature=None):
+        """创建或覆盖账号（初始化单机部署、测试和基准测试用）；覆盖时保留用量和设置版本"""
+        with self._lock:
+            self._conn.execute(
+                "insert into test_accounts (username, password, daily_limit, expires_at, is_active, custom_prompt, temperature) "
+                "values (?, ?, ?, ?, ?, ?, ?) on conflict (username) do update set password = excluded.password, "
+                "daily_limit = excluded.daily_limit, expires_at = excluded.expires_at, is_active = excluded.is_active, "
+                "custom_prompt = excluded.custom_prompt, temperature = excluded.temperature",
+                (username, password, daily_limit, expires_at, int(is_active), custom_prompt, temperature),
+            )
+
+    def find_account(self, username, password):
+        row = self._one("select * from test_accounts where username = ? and password = ?", (username, password))
+        if row is not None:
+            row["is_active"] = bool(row["is_active"])
+        return row
+
+    def get_user_settings(self, username):
+        return self._one("select custom_prompt, temperature, settings_version from test_accounts where username = ?", (username,))
+
+    def get_daily_usage(self, username, day):
+        row = self._one("select count from daily_usage where username = ? and day = ?", (username, day))
+        return row["count"] if row else 0
+
+    # ---------- 日志 ----------
+    def log_analysis(self, entry):
+        ai_result = entry["ai_result"]
+        if not isinstance(ai_result, str):
+            ai_result = json.dumps(ai_result, ensure_ascii=False)
+        with self._lock:
+            existing = self._one(f"select {LOG_COLUMNS}, client_id from emotion_logs where client_id = ?", (entry["client_id"],))
+            if existing is not None:
+                return existing
+            created_at = utc_now()
+            self._conn.execute("begin immediate")
+            try:
+                cur = self._conn.execute(
+                    f"insert into emotion_logs (client_id, user_id, user_input, ai_result, created_at, {_TYPED}) "
+                    f"values (?, ?, ?, ?, ?, {_TYPED_PARAMS})",
+                    (entry["client_id"], entry["user_id"], entry["user_input"], ai_result, created_at,
+                     *_typed_values(entry["ai_result"], created_at)),
+                )
+                row_id = cur.lastrowid
+                self._add_rollup(entry["user_id"], created_at, entry["ai_result"])
+                if entry.get("count_usage", True):
+                    self._increment_usage(entry["user_id"], entry["day"])
+                self._conn.execute("commit")
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+            return self._one(f"select {LOG_COLUMNS}, client_id from emotion_logs where id = ?", (row_id,))
+
+    def _increment_usage(self, username, day):
+        self._conn.execute(
+            "insert into daily_usage (username, day, count) values (?, ?, 1) "
+            "on conflict (username, day) do update set count = count + 1",
+            (username, day),
+        )
+        self._conn.execute("update test_accounts set total_usage = total_usage + 1 where username = ?", (username,))
+        oldest = (datetime.date.fromisoformat(day) - datetime.timedelta(days=USAGE_KEEP_DAYS - 1)).isoformat()
+        self._conn.execute("delete from daily_usage where username = ? and day < ?", (username, oldest))
+
+    def _add_rollup(self, user_id, created_at, ai_result):
+        row = delta_row(user_id, beijing_day(created_at), result_delta(ai_result))
+        self._conn.execute(ROLLUP_ADD, [row[c] for c in ROLLUP_COLUMNS])
+
+    def insert_logs(self, rows):
+        """批量导入已有日志（迁移数据、生成合成历史用），rows 需带 created_at；汇总表同步累加"""
+        with self._lock:
+            self._conn.execute("begin")
+            self._conn.executemany(
+                f"insert into emotion_logs (user_id, user_input, ai_result, created_at, {_TYPED}) values (?, ?, ?, ?, {_TYPED_PARAMS})",
+                [(r["user_id"], r["user_input"],
+                  r["ai_result"] if isinstance(r["ai_result"], str) else json.dumps(r["ai_result"], ensure_ascii=False),
+                  r["created_at"], *_typed_values(r["ai_result"], r["created_at"])) for r in rows],
+            )
+            for r in rows:
+                self._add_rollup(r["user_id"], r["created_at"], r["ai_result"])
+            self._conn.execute("commit")
+
+    def recent_logs(self, user_id, limit, newer_than=None):
+        if newer_than:
+            return self._all(
+                f"select {LOG_COLUMNS}, client_id from emotion_logs where user_id = ? and created_at > ? "
+                "order by created_at desc, id desc limit ?", (user_id, newer_than, limit))
+        return self._all(
+            f"select {LOG_COLUMNS}, client_id from emotion_logs where user_id = ? "
+            "order by created_at desc, id desc limit ?", (user_id, limit))
+
+    def logs_page(self, after=None, limit=200, user_id=None, log_ids=None):
+        where, params = [], []
+        if user_id:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if log_ids is not None:
+            where.append(f"id in ({', '.join('?' * len(log_ids))})")
+            params.extend(log_ids)
+        if after:
+            where.append("(created_at, id) > (?, ?)")
+            params.extend(after)
+        clause = f"where {' and '.join(where)} " if where else ""
+        return self._all(f"select {LOG_COLUMNS} from emotion_logs {clause}order by created_at, id limit ?",
+                         (*params, limit))
+
+    def history_page(self, user_id, before=None, limit=20):
+        if before:
+            return self._all(
+                f"select {LIST_COLUMNS} from emotion_logs where user_id = ? and (created_at, id) < (?, ?) "
+                "order by created_at desc, id desc limit ?", (user_id, *before, limit))
+        return self._all(
+            f"select {LIST_COLUMNS} from emotion_logs where user_id = ? order by created_at desc, id desc limit ?",
+            (user_id, limit))
+
+    def get_log(self, user_id, log_id):
+        return self._one(f"select {LOG_COLUMNS} from emotion_logs where user_id = ? and id = ?", (user_id, log_id))
+
+    def logs_by_ids(self, user_id, log_ids):
+        if not log_ids:
+            return []
+        return self._all(
+            f"select {LIST_COLUMNS} from emotion_logs where user_id = ? and id in ({', '.join('?' * len(log_ids))})",
+            (user_id, *log_ids))
+
+    def update_results(self, rows):
+        with self._lock:
+            self._conn.execute("begin")
+            self._conn.executemany(
+                f"update emotion_logs set ai_result = ?, {', '.join(f'{c} = ?' for c in TYPED_LOG_COLUMNS)} where id = ?",
+                [(r["ai_result"], *_typed_values(r["ai_result"], r["created_at"]), r["id"]) for r in rows])
+            self._conn.execute("commit")
+
+    def day_points(self, user_id, start_day, end_day):
+        return self._all(
+            f"select {POINT_COLUMNS} from emotion_logs where user_id = ? and local_day between ? and ? order by created_at",
+            (user_id, start_day, end_day))
+
+    def daily_rollups(self, user_id, start_day, end_day):
+        return self._all(
+            f"select {', '.join(ROLLUP_COLUMNS)} from emotion_daily where user_id = ? and day between ? and ? order by day",
+            (user_id, start_day, end_day))
+
+    def replace_rollups(self, rows, user_id=None):
+        with self._lock:
+            self._conn.execute("begin")
+            if user_id is None:
+                self._conn.execute("delete from emotion_daily")
+            else:
+                self._conn.execute("delete from emotion_daily where user_id = ?", (user_id,))
+            self._conn.executemany(ROLLUP_REPLACE, [[r[c] for c in ROLLUP_COLUMNS] for r in rows])
+            self._conn.execute("commit")
+
+    def close(self):
+        self._conn.close()
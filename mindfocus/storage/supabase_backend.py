@@ -0,0 +1,98 @@
+"""Supabase（PostgREST）后端。"""
+from mindfocus.records import typed_columns
+from mindfocus.rollup import ROLLUP_COLUMNS, beijing_day, result_delta
+from mindfocus.storage.base import LIST_COLUMNS, LOG_COLUMNS, POINT_COLUMNS, USAGE_KEEP_DAYS, Storage
+
+
+def keyset_filter(after, desc=False):
+    """(created_at, id) 游标之后/之前的 PostgREST or 条件"""
+    created_at, row_id = after
+    op = "lt" if desc else "gt"
+    return f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})'
+
+
+class SupabaseStorage(Storage):
+    def __init__(self, client):
+        self.client = client
+
+    def find_account(self, username, password):
+        res = self.client.table("test_accounts").select("*").eq("username", username).eq("password", password).execute()
+        return res.data[0] if res.data else None
+
+    def logs_by_ids(self, user_id, log_ids):
+        if not log_ids:
+            return []
+        return (self.client.table("emotion_logs").select(LIST_COLUMNS).eq("user_id", user_id)
+                .in_("id", list(log_ids)).execute().data or [])
+
+    def get_user_settings(self, username):
+        res = self.client.table("test_accounts").select("custom_prompt, temperature, settings_version").eq("username", username).execute()
+        return res.data[0] if res.data else None
+
+    def get_daily_usage(self, username, day):
+        res = self.client.table("test_accounts").select("daily_usage").eq("username", username).execute()
+        if res.data and res.data[0].get('daily_usage'):
+            return res.data[0]['daily_usage'].get(day, 0)
+        return 0
+
+    def log_analysis(self, entry):
+        # 插入日志 + 计配额 + 累加日汇总在同一个 Postgres 函数里完成（见 supabase/migrations）
+        res = self.client.rpc("log_analysis", {
+            "p_client_id": entry["client_id"],
+            "p_user_id": entry["user_id"],
+            "p_user_input": entry["user_input"],
+            "p_ai_result": entry["ai_result"],
+            "p_day": entry["day"],
+            "p_count_usage": entry["count_usage"],
+            "p_keep_days": USAGE_KEEP_DAYS,
+            "p_rollup": result_delta(entry["ai_result"])
+        }).execute()
+        return res.data.get("row") if isinstance(res.data, dict) else None
+
+    def recent_logs(self, user_id, limit, newer_than=None):
+        query = self.client.table("emotion_logs").select(f"{LOG_COLUMNS}, client_id").eq("user_id", user_id)
+        if newer_than:
+            query = query.gt("created_at", newer_than)
+        return query.order("created_at", desc=True).limit(limit).execute().data or []
+
+    def logs_page(self, after=None, limit=200, user_id=None, log_ids=None):
+        query = self.client.table("emotion_logs").select(LOG_COLUMNS)
+        if user_id:
+            query = query.eq("user_id", user_id)
+        if log_ids is not None:
+            query = query.in_("id", list(log_ids))
+        if after:
+            query = query.or_(keyset_filter(after))
+        return query.order("created_at").order("id").limit(limit).execute().data or []
+
+    def history_page(self, user_id, before=None, limit=20):
+        query = self.client.table("emotion_logs").select(LIST_COLUMNS).eq("user_id", user_id)
+        if before:
+            query = query.or_(keyset_filter(before, desc=True))
+        return query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute().data or []
+
+    def get_log(self, user_id, log_id):
+        res = self.client.table("emotion_logs").select(LOG_COLUMNS).eq("user_id", user_id).eq("id", log_id).execute()
+        return res.data[0] if res.data else None
+
+    def update_results(self, rows):
+        # upsert 的插入分支要求非空列齐全，所以整行带上；规范化列随 ai_result 一起改写
+        if rows:
+            rows = [{**r, **typed_columns(r["ai_result"]), "local_day": beijing_day(r["created_at"])} for r in rows]
+            self.client.table("emotion_logs").upsert(rows, on_conflict="id").execute()
+
+    def day_points(self, user_id, start_day, end_day):
+        return (self.client.table("emotion_logs").select(POINT_COLUMNS).eq("user_id", user_id)
+                .gte("local_day", start_day).lte("local_day", end_day).order("created_at").execute().data or [])
+
+    def daily_rollups(self, user_id, start_day, end_day):
+        return (self.client.table("emotion_daily").select(", ".join(ROLLUP_COLUMNS)).eq("user_id", user_id)
+                .gte("day", start_day).lte("day", end_day).order("day").execute().data or [])
+
+    def replace_rollups(self, rows, user_id=None):
+        # PostgREST 不允许无条件删除，全部用户时用恒真条件；删除与写入不在同一事务，重建期间趋势图可能暂时为空
+        query = self.client.table("emotion_daily").delete()
+        query = query.eq("user_id", user_id) if user_id is not None else query.not_.is_("user_id", "null")
+        query.execute()
+        for i in range(0, len(rows), 500):
+            self.client.table("emotion_daily").upsert(rows[i:i + 500], on_conflict="user_id,day").execute()
@@ -0,0 +1,119 @@
+"""流式输出的增量 JSON 解析：边接收 token 边得到“到目前为止已完整”的字段。"""
+import json
+
+_CLOSERS = {'{': '}', '[': ']'}
+_DELIMITERS = ',:}] \t\r\n'
+
+
+class PartialJSON:
+    """逐块喂入模型输出，value 始终是已完整字段组成的 dict。
+
+    只在值完整结束处（字符串闭合、容器闭合、标量后遇到分隔符）截断，
+    补齐尚未闭合的括号后解析，因此不会出现半截字符串或半截数字。
+    与 clean_json_string 一致，会去掉代码块前缀、数字前的 "+" 和多余的逗号。
+    """
+
+    def __init__(self):
+        self.value = None
+        self._out = []          # 已清洗的文本
+        self._stack = []        # [开括号, 对象中是否在等待 key]
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._in_scalar = False
+        self._string_start = 0
+        self._key = None        # 顶层对象当前的 key
+        self.completed = set()  # 值已完整结束的顶层 key
+        self._cut = None        # (文本长度, 补齐用的闭合括号)
+        self._parsed_cut = None
+        self.done = False
+
+    def _mark_cut(self):
+        closers = ''.join(_CLOSERS[frame[0]] for frame in reversed(self._stack))
+        self._cut = (len(self._out), closers)
+
+    def _value_done(self):
+        if len(self._stack) == 1 and self._key is not None:
+            self.completed.add(self._key)
+        self._mark_cut()
+
+    def feed(self, chunk):
+        """喂入一段文本；若已完整部分有变化则返回新的 dict，否则返回 None"""
+        for ch in chunk or '':
+            if self.done:
+                break
+            if self._in_string:
+                self._out.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._value_done()
+                    elif len(self._stack) == 1:
+                        self._key = json.loads(''.join(self._out[self._string_start:]))
+                continue
+            if self._in_scalar and ch in _DELIMITERS:
+                self._in_scalar = False
+                self._value_done()
+            if ch == '"' and self._stack:
+                frame = self._stack[-1]
+                self._string_is_key = frame[0] == '{' and frame[1]
+                self._in_string = True
+                self._string_start = len(self._out)
+                self._out.append(ch)
+            elif ch in '{[':
+                if not self._stack and ch != '{':
+                    continue
+                if self._stack and self._stack[-1][0] == '{':
+                    self._stack[-1][1] = False
+                self._out.append(ch)
+                self._stack.append([ch, ch == '{'])
+                self._mark_cut()
+            elif ch in '}]' and self._stack:
+                while self._out and self._out[-1] in ', \t\r\n':
+                    self._out.pop()
+                self._out.append(ch)
+                self._stack.pop()
+                if self._stack:
+                    self._value_done()
+                else:
+                    self._cut = (len(self._out), '')
+                    self.done = True
+            elif not self._stack:
+                continue  # 跳过 ```json 之类的前缀
+            elif ch == ',':
+                self._out.append(ch)
+                if self._stack[-1][0] == '{':
+                    self._stack[-1][1] = True
+            elif ch == ':':
+                self._out.append(ch)
+                self._stack[-1][1] = False
+            elif ch in ' \t\r\n':
+                self._out.append(ch)
+            else:
+                if not self._in_scalar:
+                    self._in_scalar = True
+                    if ch == '+':
+                        continue
+                self._out.append(ch)
+        return self._refresh()
+
+    def _refresh(self):
+        if self._cut is None or self._cut == self._parsed_cut:
+            return None
+        self._parsed_cut = self._cut
+        length, closers = self._cut
+        text = ''.join(self._out[:length]).rstrip()
+        if text.endswith(','):
+            text = text[:-1]
+        try:
+            value = json.loads(text + closers)
+        except ValueError:
+            return None
+        if not isinstance(value, dict) or value == self.value:
+            return None
+        self.value = value
+        return value
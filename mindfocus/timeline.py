@@ -0,0 +1,57 @@
+"""趋势图和注意力地图共用的时间轴计算：整列转换时区，一次生成当日掩码。"""
+import numpy as np
+import pandas as pd
+
+BEIJING_TZ = 'Asia/Shanghai'
+Y_MAP = {"Past": 1, "Present": 2, "Future": 3}
+EXTERNAL_COLOR = "#f97316"
+INTERNAL_COLOR = "#8b5cf6"
+DAY_COLUMNS = ["Time", "Score", "Y", "Color"]
+
+
+def beijing_now():
+    return pd.Timestamp.now(tz=BEIJING_TZ).tz_localize(None)
+
+
+def day_window(now=None):
+    """返回北京时间当天的 [00:00:00, 23:59:59]"""
+    start = (now if now is not None else beijing_now()).normalize()
+    return start, start + pd.Timedelta(hours=23, minutes=59, seconds=59)
+
+
+def to_beijing(created_at):
+    """整列把 created_at 转成不带时区的北京时间；无时区的值按 UTC 处理，无法解析的为 NaT"""
+    ts = pd.to_datetime(pd.Series(created_at, dtype=object), utc=True, errors='coerce', format='ISO8601')
+    return ts.dt.tz_convert(BEIJING_TZ).dt.tz_localize(None)
+
+
+def _chart_frame(created_at, scores, orientations, targets, start, end):
+    frame = pd.DataFrame({
+        "Time": to_beijing(created_at),
+        "Score": scores,
+        "Orientation": orientations,
+        "Target": targets,
+    })
+    frame = frame.loc[(frame["Time"] >= start) & (frame["Time"] <= end)]
+    external = frame["Target"].astype(str).str.lower().str.contains("external", regex=False)
+    frame = frame.assign(
+        Y=frame["Orientation"].map(Y_MAP).fillna(2).astype(int),
+        Color=np.where(external, EXTERNAL_COLOR, INTERNAL_COLOR),
+    )
+    return frame[DAY_COLUMNS].reset_index(drop=True)
+
+
+def day_frame(records, start, end):
+    """把记录一次性转成 [start, end] 窗口内的图表数据（Time/Score/Y/Color）"""
+    if not records:
+        return pd.DataFrame(columns=DAY_COLUMNS)
+    return _chart_frame([r.created_at for r in records], [r.peace for r in records],
+                        [r.time_orientation for r in records], [r.focus_target for r in records], start, end)
+
+
+def points_frame(rows, start, end):
+    """同 day_frame，输入为 Storage.day_points 返回的窄列行（分数已是整数，无需解析 ai_result）"""
+    if not rows:
+        return pd.DataFrame(columns=DAY_COLUMNS)
+    return _chart_frame([r["created_at"] for r in rows], [r["peace"] for r in rows],
+                        [r["time_orientation"] for r in rows], [r["focus_target"] for r in rows], start, end)
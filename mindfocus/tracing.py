@@ -0,0 +1,276 @@
+"""轻量追踪：数据库/LLM/渲染调用的 span，按 rerun（或后台任务）汇总成一行结构化日志，
+同时累计为 Prometheus 文本格式的指标。关闭时 span() 返回共享的空对象，几乎没有开销。"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+LOGGER = logging.getLogger("mindfocus.trace")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNTED_ATTRS = ("rows", "prompt_tokens", "completion_tokens", "retries", "repairs", "hedged")  # 累计为 *_total 的数值属性
+
+_current = contextvars.ContextVar("mindfocus_trace", default=None)
+
+
+def _is_control_flow(exc_type):
+    """st.rerun()/st.stop() 通过异常结束脚本，不算出错"""
+    return exc_type.__name__.endswith(("RerunException", "StopException"))
+
+
+def count_rows(result):
+    """存储调用返回值的行数：list 为长度，单行 dict 为 1，None 为 0，其他（如计数值）不计"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    if result is None:
+        return 0
+    return None
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = {}
+        self.seconds = 0.0
+        self._started = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        if exc_type is not None and not _is_control_flow(exc_type):
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish_span(self)
+        return False
+
+
+class Trace:
+    """一次 rerun 或一个后台任务内的所有 span"""
+
+    def __init__(self, tracer, kind):
+        self.tracer = tracer
+        self.kind = kind
+        self.attrs = {}
+        self.spans = []
+        self._started = 0.0
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is not None and not _is_control_flow(exc_type):
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish_trace(self, time.perf_counter() - self._started)
+        return False
+
+    def summary(self, seconds):
+        by_name = defaultdict(lambda: {"count": 0, "ms": 0.0})
+        for span in self.spans:
+            item = by_name[span.name]
+            item["count"] += 1
+            item["ms"] += span.seconds * 1000
+            for key in COUNTED_ATTRS:
+                if span.attrs.get(key) is not None:
+                    item[key] = item.get(key, 0) + span.attrs[key]
+        for item in by_name.values():
+            item["ms"] = round(item["ms"], 2)
+        return {
+            "event": self.kind,
+            "ms": round(seconds * 1000, 2),
+            **self.attrs,
+            "spans": dict(by_name),
+            "errors": [{"span": s.name, "error": s.attrs["error"]} for s in self.spans if "error" in s.attrs],
+        }
+
+
+class Tracer:
+    """进程级单例；enabled 为 False 时所有入口直接返回空对象"""
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics_path = None
+        self.metrics_interval = 5.0
+        self._lock = threading.Lock()
+        self._histograms = {}           # (metric, labels) -> [各桶计数, sum, count]
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._last_dump = 0.0
+
+    def configure(self, enabled, log_path=None, metrics_path=None, metrics_interval=5.0):
+        """开启后把汇总日志写到 log_path（默认 stderr），指标按间隔写入 metrics_path"""
+        self.enabled = enabled
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        if enabled and not LOGGER.handlers:
+            handler = logging.FileHandler(log_path, encoding="utf-8") if log_path else logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            LOGGER.addHandler(handler)
+            LOGGER.setLevel(logging.INFO)
+            LOGGER.propagate = False
+
+    def span(self, name):
+        return Span(self, name) if self.enabled else _NOOP
+
+    def trace(self, kind):
+        return Trace(self, kind) if self.enabled else _NOOP
+
+    def wrap(self, name):
+        """装饰器：每次调用记一个 span"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, metric, value, **labels):
+        """直接记录一个直方图样本（如排队等待时间）"""
+        if self.enabled:
+            with self._lock:
+                self._observe(metric, tuple(sorted(labels.items())), value)
+
+    def inc(self, metric, value=1, **labels):
+        if self.enabled:
+            with self._lock:
+                self._counters[(metric, tuple(sorted(labels.items())))] += value
+
+    def gauge(self, metric, value, **labels):
+        """设置瞬时值（如队列长度）"""
+        if self.enabled:
+            with self._lock:
+                self._gauges[(metric, tuple(sorted(labels.items())))] = value
+
+    def _finish_span(self, span):
+        trace = _current.get()
+        if trace is not None:
+            trace.spans.append(span)
+        labels = (("span", span.name),)
+        with self._lock:
+            self._observe("mindfocus_span_seconds", labels, span.seconds)
+            for key in COUNTED_ATTRS:
+                if span.attrs.get(key):
+                    self._counters[(f"mindfocus_span_{key}_total", labels)] += span.attrs[key]
+            if "error" in span.attrs:
+                self._counters[("mindfocus_span_errors_total", labels)] += 1
+
+    def _finish_trace(self, trace, seconds):
+        with self._lock:
+            self._observe("mindfocus_trace_seconds", (("kind", trace.kind),), seconds)
+        LOGGER.info(json.dumps(trace.summary(seconds), ensure_ascii=False, default=str))
+        self._maybe_dump()
+
+    def _observe(self, metric, labels, value):
+        hist = self._histograms.get((metric, labels))
+        if hist is None:
+            hist = self._histograms[(metric, labels)] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                hist[0][i] += 1
+        hist[1] += value
+        hist[2] += 1
+
+    def prometheus_text(self):
+        """Prometheus text exposition 格式的全部指标"""
+        def fmt(labels, extra=()):
+            pairs = [*labels, *extra]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            histograms = sorted((key, (list(b), total, count)) for key, (b, total, count) in self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        seen = set()
+        for (metric, labels), (buckets, total, count) in histograms:
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f"{metric}_bucket{fmt(labels, (('le', bound),))} {n}")
+            lines.append(f"{metric}_bucket{fmt(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{fmt(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{fmt(labels)} {count}")
+        for (metric, labels), value in counters:
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{fmt(labels)} {value:g}")
+        for (metric, labels), value in gauges:
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{fmt(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def _maybe_dump(self):
+        if not self.metrics_path:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_dump < self.metrics_interval:
+                return
+            self._last_dump = now
+        tmp = f"{self.metrics_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, self.metrics_path)
+
+
+class TracedProxy:
+    """把目标对象公开方法的每次调用记为 "<prefix>.<方法名>" span，并记录返回行数"""
+
+    def __init__(self, target, prefix, tracer):
+        self._target = target
+        self._prefix = prefix
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        span_name = f"{self._prefix}.{name}"
+
+        def call(*args, **kwargs):
+            with self._tracer.span(span_name) as span:
+                result = attr(*args, **kwargs)
+                span.set(rows=count_rows(result))
+                return result
+        return call
+
+
+tracer = Tracer()
@@ -0,0 +1,128 @@
+"""写后队列：先同步尝试一次写库，失败的条目落到本地 SQLite 暂存，由后台线程带退避重试。"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+create table if not exists pending_writes (
+    client_id text primary key,
+    payload text not null,
+    attempts integer not null default 0,
+    next_at real not null,
+    last_error text,
+    dead integer not null default 0
+)
+"""
+
+
+def spooled_count(spool_path):
+    """暂存文件中等待重试的条目数；文件或表不存在时为 0。只读打开，不启动后台线程"""
+    if not os.path.exists(spool_path):
+        return 0
+    try:
+        conn = sqlite3.connect(f"file:{spool_path}?mode=ro", uri=True)
+        try:
+            return conn.execute("select count(*) from pending_writes where dead = 0").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+
+class WriteBehindQueue:
+    """send(entry) 负责真正写库并返回结果，失败时抛异常；条目需带唯一的 client_id 以便幂等重试"""
+
+    def __init__(self, send, spool_path, retry_base=1.0, retry_max=60.0, max_attempts=20):
+        self.send = send
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self._conn = sqlite3.connect(spool_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(SCHEMA)
+        # 上次进程留下的条目不再等它记下的退避时间，启动后立即重试一次
+        self._conn.execute("update pending_writes set next_at = ? where dead = 0 and next_at > ?", (time.time(),) * 2)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._drain_loop, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, entry):
+        """同步尝试写一次，成功返回 send 的结果；失败则暂存等待重试并返回 None"""
+        try:
+            return self.send(entry)
+        except Exception as e:
+            self._spool(entry, e)
+            return None
+
+    def _spool(self, entry, error):
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into pending_writes (client_id, payload, attempts, next_at, last_error) values (?, ?, 1, ?, ?)",
+                (entry["client_id"], json.dumps(entry, ensure_ascii=False), time.time() + self._delay(1), str(error)),
+            )
+        self._wake.set()
+
+    def _delay(self, attempts):
+        return random.uniform(0.5, 1.0) * min(self.retry_max, self.retry_base * (2 ** (attempts - 1)))
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute("select count(*) from pending_writes where dead = 0").fetchone()[0]
+
+    def dead(self):
+        """超过最大重试次数仍失败的条目，需要人工处理"""
+        with self._lock:
+            rows = self._conn.execute("select payload, last_error from pending_writes where dead = 1").fetchall()
+        return [(json.loads(p), err) for p, err in rows]
+
+    def _next_due(self):
+        with self._lock:
+            return self._conn.execute(
+                "select client_id, payload, attempts, next_at from pending_writes where dead = 0 order by next_at limit 1"
+            ).fetchone()
+
+    def _drain_loop(self):
+        while not self._stopped:
+            item = self._next_due()
+            if item is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            client_id, payload, attempts, next_at = item
+            wait = next_at - time.time()
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            try:
+                self.send(json.loads(payload))
+            except Exception as e:
+                attempts += 1
+                with self._lock:
+                    self._conn.execute(
+                        "update pending_writes set attempts = ?, next_at = ?, last_error = ?, dead = ? where client_id = ?",
+                        (attempts, time.time() + self._delay(attempts), str(e), int(attempts >= self.max_attempts), client_id),
+                    )
+                continue
+            with self._lock:
+                self._conn.execute("delete from pending_writes where client_id = ?", (client_id,))
+
+    def flush(self, timeout=None):
+        """等待暂存条目全部写出（测试和关闭时用），返回是否已清空"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.pending():
+            if deadline is not None and time.time() > deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.05)
+        return True
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=1)
+        self._conn.close()
@@ -0,0 +1,24 @@
+-- 原子配额计数：一次 UPDATE 完成 +1、total_usage +1 和历史裁剪，返回当日最新用量。
+-- 并发调用在行锁上串行化，UPDATE 会基于最新行版本重新计算，不会丢失计数。
+create or replace function public.increment_daily_usage(
+    p_username text,
+    p_day date,
+    p_keep_days integer default 30
+)
+returns integer
+language sql
+as $$
+    update public.test_accounts
+       set daily_usage = (
+               select coalesce(jsonb_object_agg(key, value), '{}'::jsonb)
+                 from jsonb_each(coalesce(daily_usage, '{}'::jsonb))
+                where key <> p_day::text
+                  and key::date > p_day - p_keep_days
+           ) || jsonb_build_object(
+               p_day::text,
+               coalesce((daily_usage ->> p_day::text)::integer, 0) + 1
+           ),
+           total_usage = coalesce(total_usage, 0) + 1
+     where username = p_username
+    returning (daily_usage ->> p_day::text)::integer;
+$$;
@@ -0,0 +1,38 @@
+-- 分析完成后的合并写入：同一事务内插入 emotion_logs 并原子 +1 配额。
+-- client_id 由客户端生成，重试时命中唯一约束直接返回已有记录，不会重复插入或重复计数。
+alter table public.emotion_logs add column if not exists client_id uuid;
+create unique index if not exists emotion_logs_client_id_key on public.emotion_logs (client_id);
+
+create or replace function public.log_analysis(
+    p_client_id uuid,
+    p_user_id text,
+    p_user_input text,
+    p_ai_result jsonb,
+    p_day date,
+    p_count_usage boolean default true,
+    p_keep_days integer default 30
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_row public.emotion_logs;
+    v_used integer;
+begin
+    insert into public.emotion_logs (client_id, user_id, user_input, ai_result)
+    values (p_client_id, p_user_id, p_user_input, p_ai_result)
+    on conflict (client_id) do nothing
+    returning * into v_row;
+
+    if not found then
+        select * into v_row from public.emotion_logs where client_id = p_client_id;
+        return jsonb_build_object('row', to_jsonb(v_row), 'used', null, 'duplicate', true);
+    end if;
+
+    if p_count_usage then
+        v_used := public.increment_daily_usage(p_user_id, p_day, p_keep_days);
+    end if;
+
+    return jsonb_build_object('row', to_jsonb(v_row), 'used', v_used, 'duplicate', false);
+end;
+$$;
@@ -0,0 +1,111 @@
+-- 按用户、按北京时间自然日预聚合的情绪分数，周/月/年趋势图只读这张表。
+-- log_analysis 在插入日志的同一事务内累加当天一行；分数和方向分类由客户端按页面的解码规则算好后传入 p_rollup。
+-- 执行后运行 `python -m mindfocus.rollup` 回填已有日志。
+create table if not exists public.emotion_daily (
+    user_id text not null,
+    day date not null,
+    count integer not null default 0,
+    peace_sum integer not null default 0,
+    peace_min smallint,
+    peace_max smallint,
+    awareness_sum integer not null default 0,
+    awareness_min smallint,
+    awareness_max smallint,
+    energy_sum integer not null default 0,
+    energy_min smallint,
+    energy_max smallint,
+    past integer not null default 0,
+    present integer not null default 0,
+    future integer not null default 0,
+    internal integer not null default 0,
+    external integer not null default 0,
+    primary key (user_id, day)
+);
+
+-- p_rollup: {"peace", "awareness", "energy", "orientation": past|present|future, "target": internal|external}
+create or replace function public.add_emotion_daily(p_user_id text, p_day date, p_rollup jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    v_peace integer := (p_rollup->>'peace')::integer;
+    v_awareness integer := (p_rollup->>'awareness')::integer;
+    v_energy integer := (p_rollup->>'energy')::integer;
+    v_orientation text := p_rollup->>'orientation';
+    v_target text := p_rollup->>'target';
+begin
+    insert into public.emotion_daily as d (
+        user_id, day, count,
+        peace_sum, peace_min, peace_max,
+        awareness_sum, awareness_min, awareness_max,
+        energy_sum, energy_min, energy_max,
+        past, present, future, internal, external
+    )
+    values (
+        p_user_id, p_day, 1,
+        v_peace, v_peace, v_peace,
+        v_awareness, v_awareness, v_awareness,
+        v_energy, v_energy, v_energy,
+        (v_orientation = 'past')::integer, (v_orientation = 'present')::integer, (v_orientation = 'future')::integer,
+        (v_target = 'internal')::integer, (v_target = 'external')::integer
+    )
+    on conflict (user_id, day) do update set
+        count = d.count + 1,
+        peace_sum = d.peace_sum + excluded.peace_sum,
+        peace_min = least(d.peace_min, excluded.peace_min),
+        peace_max = greatest(d.peace_max, excluded.peace_max),
+        awareness_sum = d.awareness_sum + excluded.awareness_sum,
+        awareness_min = least(d.awareness_min, excluded.awareness_min),
+        awareness_max = greatest(d.awareness_max, excluded.awareness_max),
+        energy_sum = d.energy_sum + excluded.energy_sum,
+        energy_min = least(d.energy_min, excluded.energy_min),
+        energy_max = greatest(d.energy_max, excluded.energy_max),
+        past = d.past + excluded.past,
+        present = d.present + excluded.present,
+        future = d.future + excluded.future,
+        internal = d.internal + excluded.internal,
+        external = d.external + excluded.external;
+end;
+$$;
+
+-- 参数列表变了，先删掉旧签名，避免留下重载
+drop function if exists public.log_analysis(uuid, text, text, jsonb, date, boolean, integer);
+
+create or replace function public.log_analysis(
+    p_client_id uuid,
+    p_user_id text,
+    p_user_input text,
+    p_ai_result jsonb,
+    p_day date,
+    p_count_usage boolean default true,
+    p_keep_days integer default 30,
+    p_rollup jsonb default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_row public.emotion_logs;
+    v_used integer;
+begin
+    insert into public.emotion_logs (client_id, user_id, user_input, ai_result)
+    values (p_client_id, p_user_id, p_user_input, p_ai_result)
+    on conflict (client_id) do nothing
+    returning * into v_row;
+
+    if not found then
+        select * into v_row from public.emotion_logs where client_id = p_client_id;
+        return jsonb_build_object('row', to_jsonb(v_row), 'used', null, 'duplicate', true);
+    end if;
+
+    if p_rollup is not null then
+        perform public.add_emotion_daily(p_user_id, (v_row.created_at at time zone 'Asia/Shanghai')::date, p_rollup);
+    end if;
+
+    if p_count_usage then
+        v_used := public.increment_daily_usage(p_user_id, p_day, p_keep_days);
+    end if;
+
+    return jsonb_build_object('row', to_jsonb(v_row), 'used', v_used, 'duplicate', false);
+end;
+$$;
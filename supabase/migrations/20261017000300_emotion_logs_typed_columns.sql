@@ -0,0 +1,63 @@
+-- 把图表用到的分数和注意力标签从 ai_result 冗余成规范化列，当日图表按 local_day 查询窄列，
+-- 不再下载整段 user_input / ai_result。
+-- 执行后运行 `python -m mindfocus.backfill` 回填已有行（解析规则与页面一致，见 records.typed_columns）。
+alter table public.emotion_logs
+    add column if not exists peace smallint,
+    add column if not exists awareness smallint,
+    add column if not exists energy smallint,
+    add column if not exists time_orientation text,
+    add column if not exists focus_target text,
+    add column if not exists local_day date;
+
+create index if not exists emotion_logs_user_local_day on public.emotion_logs (user_id, local_day, created_at);
+
+-- 签名不变，p_rollup 中已带规范化的分数和分类，顺带写入新列
+create or replace function public.log_analysis(
+    p_client_id uuid,
+    p_user_id text,
+    p_user_input text,
+    p_ai_result jsonb,
+    p_day date,
+    p_count_usage boolean default true,
+    p_keep_days integer default 30,
+    p_rollup jsonb default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_row public.emotion_logs;
+    v_used integer;
+begin
+    insert into public.emotion_logs (
+        client_id, user_id, user_input, ai_result,
+        peace, awareness, energy, time_orientation, focus_target, local_day
+    )
+    values (
+        p_client_id, p_user_id, p_user_input, p_ai_result,
+        (p_rollup->>'peace')::smallint,
+        (p_rollup->>'awareness')::smallint,
+        (p_rollup->>'energy')::smallint,
+        initcap(p_rollup->>'orientation'),
+        initcap(p_rollup->>'target'),
+        (now() at time zone 'Asia/Shanghai')::date  -- created_at 默认值同为 now()
+    )
+    on conflict (client_id) do nothing
+    returning * into v_row;
+
+    if not found then
+        select * into v_row from public.emotion_logs where client_id = p_client_id;
+        return jsonb_build_object('row', to_jsonb(v_row), 'used', null, 'duplicate', true);
+    end if;
+
+    if p_rollup is not null then
+        perform public.add_emotion_daily(p_user_id, v_row.local_day, p_rollup);
+    end if;
+
+    if p_count_usage then
+        v_used := public.increment_daily_usage(p_user_id, p_day, p_keep_days);
+    end if;
+
+    return jsonb_build_object('row', to_jsonb(v_row), 'used', v_used, 'duplicate', false);
+end;
+$$;
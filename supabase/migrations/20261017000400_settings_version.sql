@@ -0,0 +1,20 @@
+-- 用户设置版本号：custom_prompt / temperature 变化时 +1。
+-- 登录 token 中带有签发时的版本，应用按 (用户名, 版本) 缓存设置，设置未变时新会话不必查库。
+alter table public.test_accounts add column if not exists settings_version integer not null default 0;
+
+create or replace function public.bump_settings_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.custom_prompt is distinct from old.custom_prompt or new.temperature is distinct from old.temperature then
+        new.settings_version := old.settings_version + 1;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists test_accounts_settings_version on public.test_accounts;
+create trigger test_accounts_settings_version
+    before update on public.test_accounts
+    for each row execute function public.bump_settings_version();
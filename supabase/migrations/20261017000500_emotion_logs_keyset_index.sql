@@ -0,0 +1,3 @@
+-- 导出和离线工具按 (created_at, id) keyset 分页扫描某个用户的全部日志，
+-- 这个索引让每一页都是一次索引范围扫描，不随翻页深度变慢。
+create index if not exists emotion_logs_user_created_id on public.emotion_logs (user_id, created_at, id);
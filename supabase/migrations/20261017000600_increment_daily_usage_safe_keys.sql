@@ -0,0 +1,28 @@
+-- increment_daily_usage 裁剪历史时原先直接 key::date，daily_usage 里只要有一个不是日期的键（手工改过的数据）
+-- 该用户的每次提交都会报错。改为只裁剪形如 YYYY-MM-DD 的键，按字符串比较（ISO 日期的字典序即时间顺序），不做类型转换；
+-- 其他键原样保留。签名和返回值不变。
+create or replace function public.increment_daily_usage(
+    p_username text,
+    p_day date,
+    p_keep_days integer default 30
+)
+returns integer
+language sql
+as $$
+    update public.test_accounts
+       set daily_usage = (
+               select coalesce(jsonb_object_agg(key, value), '{}'::jsonb)
+                 from jsonb_each(coalesce(daily_usage, '{}'::jsonb))
+                where key <> p_day::text
+                  and case when key ~ '^\d{4}-\d{2}-\d{2}$'
+                           then key > (p_day - p_keep_days)::text
+                           else true
+                      end
+           ) || jsonb_build_object(
+               p_day::text,
+               coalesce((daily_usage ->> p_day::text)::integer, 0) + 1
+           ),
+           total_usage = coalesce(total_usage, 0) + 1
+     where username = p_username
+    returning (daily_usage ->> p_day::text)::integer;
+$$;
@@ -0,0 +1,19 @@
+"""`slow` 标记的测试（如 10 万行的导出）默认跳过，加 --runslow 运行。"""
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action="store_true", help="也运行标记为 slow 的测试")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: 耗时较长，默认跳过，加 --runslow 运行")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip = pytest.mark.skip(reason="加 --runslow 运行")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
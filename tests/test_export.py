@@ -0,0 +1,52 @@
+"""流式导出：内存峰值只随页大小变化，不随历史行数增长。"""
+import os
+import tracemalloc
+
+import pytest
+
+from benchmarks.bench_rerun import USER, seed_storage
+from mindfocus.export import export_history
+from mindfocus.storage import SqliteStorage
+
+BASELINE = 1000
+PAGE_SIZE = 200
+MAX_PEAK_RATIO = 2.0
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    """按行数生成的历史库，同一模块内复用"""
+    root = tmp_path_factory.mktemp("export")
+    paths = {}
+
+    def get(rows):
+        if rows not in paths:
+            paths[rows] = str(root / f"history-{rows}.db")
+            seed_storage(paths[rows], rows, days=365)
+        return paths[rows]
+    return get
+
+
+def export_peak(db, path, fmt):
+    """导出一次，返回 (行数, tracemalloc 峰值字节数)"""
+    storage = SqliteStorage(db)
+    try:
+        tracemalloc.start()
+        count = export_history(storage, path, fmt, user=USER, page_size=PAGE_SIZE)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        storage.close()
+    assert os.path.exists(path) and not os.path.exists(path + ".tmp")
+    return count, peak
+
+
+@pytest.mark.parametrize("rows", [10000, pytest.param(100000, marks=pytest.mark.slow)])
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_peak_does_not_grow_with_history(database, tmp_path, fmt, rows):
+    peaks = {}
+    for size in (BASELINE, rows):
+        count, peaks[size] = export_peak(database(size), str(tmp_path / f"export-{size}.{fmt}"), fmt)
+        assert count == size
+    small, large = peaks[BASELINE], peaks[rows]
+    assert large <= small * MAX_PEAK_RATIO, f"{fmt}: {BASELINE} 行峰值 {small} B，{rows} 行 {large} B"
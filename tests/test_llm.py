@@ -0,0 +1,35 @@
+"""LLM 客户端：重试与尝试次数指标。"""
+import openai
+import pytest
+
+from benchmarks.stub_llm import StubLLMServer
+from mindfocus import llm as llm_module
+from mindfocus.llm import LLMClient
+from mindfocus.tracing import Tracer
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = Tracer()
+    tracer.enabled = True
+    monkeypatch.setattr(llm_module, "tracer", tracer)
+    return tracer
+
+
+def chat(client):
+    return client.chat(model="deepseek-chat", messages=[{"role": "user", "content": "你好"}])
+
+
+def test_attempts_are_exported(tracer):
+    with StubLLMServer(statuses=[503, 200, 400]) as stub:
+        client = LLMClient("test", base_url=stub.base_url, max_retries=2, backoff_base=0)
+        try:
+            assert chat(client)[1] == 2
+            with pytest.raises(openai.BadRequestError) as error:
+                chat(client)  # 4xx 不重试
+            assert error.value.attempts == 1
+        finally:
+            client.close()
+    text = tracer.prometheus_text()
+    assert 'mindfocus_llm_calls_total{attempts="2",outcome="ok"} 1' in text
+    assert 'mindfocus_llm_calls_total{attempts="1",outcome="error"} 1' in text
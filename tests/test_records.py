@@ -0,0 +1,33 @@
+"""ai_result 解码对模型输出中形状不对的字段的容错。"""
+from mindfocus.records import decode_history, decode_record, get_recommendation, record_from_result, typed_columns
+
+
+def test_non_dict_nested_fields_fall_back_to_defaults():
+    record = record_from_result({"scores": [1, 2, 3], "focus_analysis": "Past", "recommendations": None})
+    assert (record.peace, record.awareness, record.energy) == (0, 0, 0)
+    assert record.time_orientation == "Present"
+    assert record.recommendation == ""
+
+
+def test_recommendation_string_is_not_searched_as_dict():
+    assert get_recommendation({"recommendations": "action_guide"}) == ""
+    assert get_recommendation({"recommendations": {"action_guide": "散步"}}) == "散步"
+
+
+def test_one_malformed_row_does_not_break_history():
+    rows = [
+        {"id": 101, "ai_result": {"recommendations": None}},
+        {"id": 102, "ai_result": {"scores": [1, 2, 3]}},
+        {"id": 103, "ai_result": '{"scores": {"平静度": 3}}'},
+        {"id": 104, "ai_result": "不是 JSON"},
+    ]
+    records = decode_history(rows)
+    assert [r.id for r in records] == [101, 102, 103]
+    assert records[2].peace == 3
+    assert decode_record(rows[3]) is None
+
+
+def test_typed_columns_of_malformed_result():
+    assert typed_columns({"scores": None, "focus_analysis": [], "recommendations": None}) == {
+        "peace": 0, "awareness": 0, "energy": 0, "time_orientation": "Present", "focus_target": "Internal",
+    }
@@ -0,0 +1,95 @@
+"""批量重新评分：失败行的重试和 --dry-run 的计数。"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from benchmarks.stub_llm import SAMPLE_RESULT, StubLLMServer
+from mindfocus.llm import LLMClient
+from mindfocus.prompt import COMPACT_SYSTEM_PROMPT, is_structured
+from mindfocus.rescore import Checkpoint, Rescorer
+from mindfocus.storage import SqliteStorage
+
+USER = "tester"
+ROWS = 6
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "rescore.db"))
+    storage.add_account(USER, "pw")
+    storage.insert_logs([{"user_id": USER, "user_input": f"记录 {i}", "ai_result": {"scores": {"平静度": 5}},
+                          "created_at": f"2026-01-01T00:00:{i:02d}+00:00"} for i in range(ROWS)])
+    yield storage
+    storage.close()
+
+
+def rescore(storage, stub, checkpoint, **kwargs):
+    llm = LLMClient("test", base_url=stub.base_url, max_retries=0)
+    # 并发 1：桩服务按请求顺序返回状态码，失败的行是确定的
+    rescorer = Rescorer(storage, llm, concurrency=1, rps=0, checkpoint=checkpoint, log=lambda message: None, **kwargs)
+    try:
+        return asyncio.run(rescorer.run())
+    finally:
+        rescorer.close()
+        llm.close()
+
+
+def peace_scores(storage):
+    return [json.loads(r["ai_result"])["scores"]["平静度"] for r in storage.logs_page(None, ROWS)]
+
+
+def test_failed_rows_are_recorded_and_retried(storage, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    with StubLLMServer(statuses=[500, 503]) as stub:
+        assert rescore(storage, stub, Checkpoint(path)) == (ROWS, 2)
+    checkpoint = Checkpoint(path)
+    assert (checkpoint.written, checkpoint.failed, len(checkpoint.failed_ids)) == (ROWS - 2, 2, 2)
+    assert peace_scores(storage).count(5) == 2
+
+    with StubLLMServer() as stub:
+        assert rescore(storage, stub, Checkpoint(path), retry_failed=True) == (2, 0)
+    checkpoint = Checkpoint(path)
+    assert (checkpoint.written, checkpoint.failed, checkpoint.failed_ids) == (ROWS, 0, [])
+    assert peace_scores(storage) == [SAMPLE_RESULT["scores"]["平静度"]] * ROWS
+
+
+def test_retry_keeps_rows_that_fail_again(storage, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    with StubLLMServer(statuses=[500, 500]) as stub:
+        rescore(storage, stub, Checkpoint(path))
+    failed_ids = Checkpoint(path).failed_ids
+    with StubLLMServer(statuses=[500]) as stub:
+        assert rescore(storage, stub, Checkpoint(path), retry_failed=True) == (2, 1)
+    assert Checkpoint(path).failed_ids == failed_ids[:1]
+
+
+def test_dry_run_leaves_rows_and_checkpoint_untouched(storage, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    with StubLLMServer(statuses=[500]) as stub:
+        assert rescore(storage, stub, checkpoint, dry_run=True) == (ROWS, 1)
+    assert (checkpoint.cursor, checkpoint.processed, checkpoint.written, checkpoint.failed_ids) == (None, 0, 0, [])
+    assert not os.path.exists(path)
+    assert peace_scores(storage) == [5] * ROWS
+
+
+def test_real_run_after_dry_run_rescores_every_row(storage, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    with StubLLMServer() as stub:
+        assert rescore(storage, stub, Checkpoint(path), dry_run=True) == (ROWS, 0)
+        assert rescore(storage, stub, Checkpoint(path)) == (ROWS, 0)
+    assert Checkpoint(path).written == ROWS
+    assert peace_scores(storage) == [SAMPLE_RESULT["scores"]["平静度"]] * ROWS
+
+
+def test_custom_prompt_is_not_structured_in_compact_mode(storage, tmp_path):
+    assert is_structured(COMPACT_SYSTEM_PROMPT) and not is_structured("用三句话分析我的情绪")
+    storage.add_account(USER, "pw", custom_prompt="用三句话分析我的情绪")
+    # 定制 prompt 的回复按 legacy 方式清理，不会因为不是纯 JSON 而触发修复重试
+    fenced = "```json\n" + json.dumps(SAMPLE_RESULT, ensure_ascii=False) + "\n```"
+    with StubLLMServer(content=fenced) as stub:
+        assert rescore(storage, stub, Checkpoint(str(tmp_path / "checkpoint.json")), prompt_mode="compact") == (ROWS, 0)
+        assert stub.requests == ROWS
+    assert peace_scores(storage) == [SAMPLE_RESULT["scores"]["平静度"]] * ROWS
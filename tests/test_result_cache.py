@@ -0,0 +1,30 @@
+"""分析结果缓存：命中/未命中次数记入指标。"""
+from mindfocus import result_cache
+from mindfocus.result_cache import ResultCache, cache_key
+from mindfocus.tracing import Tracer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_and_misses_are_exported(monkeypatch):
+    tracer = Tracer()
+    tracer.enabled = True
+    monkeypatch.setattr(result_cache, "tracer", tracer)
+    clock = FakeClock()
+    cache = ResultCache(ttl_seconds=10, clock=clock, name="analysis")
+    key = cache_key("prompt", 0.4, "今天有点累")
+    assert cache.get(key) is None
+    cache.put(key, {"scores": {"平静度": 1}})
+    assert cache.get(cache_key("prompt", 0.4, " 今天有点累 ")) == {"scores": {"平静度": 1}}
+    clock.now = 11  # 过期按未命中计
+    assert cache.get(key) is None
+    text = tracer.prometheus_text()
+    assert 'mindfocus_result_cache_hits_total{cache="analysis"} 1' in text
+    assert 'mindfocus_result_cache_misses_total{cache="analysis"} 2' in text
+    assert 'mindfocus_result_cache_entries{cache="analysis"} 0' in text
@@ -0,0 +1,148 @@
+"""LLM 路由：本地桩服务注入延迟和 5xx，检查对冲、失败回退、熔断和被中止请求的统计。"""
+import time
+
+import pytest
+
+from benchmarks.stub_llm import SAMPLE_RESULT, StubLLMServer
+from mindfocus.llm import LLMClient
+from mindfocus.prompt import COMPACT_SYSTEM_PROMPT, DEFAULT_TEMPERATURE
+from mindfocus.router import CLOSED, HALF_OPEN, OPEN, Backend, CircuitBreaker, LLMRouter
+
+TEXT = "明天就要答辩了，PPT 还没改完，手心一直出汗。"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stubs():
+    primary, secondary = StubLLMServer().start(), StubLLMServer().start()
+    yield primary, secondary
+    primary.stop()
+    secondary.stop()
+
+
+def make_router(stubs, failures=3, cooldown=30.0, clock=time.monotonic, hedge_delay=5.0):
+    backends = [Backend(name, LLMClient("test", base_url=stub.base_url, max_retries=0),
+                        breaker=CircuitBreaker(failures, cooldown, clock))
+                for name, stub in zip(("primary", "secondary"), stubs)]
+    return LLMRouter(backends, hedge_delay=hedge_delay, min_hedge_delay=0.05)
+
+
+def analyze(router, on_partial=None):
+    meta = {}
+    result = router.analyze(TEXT, COMPACT_SYSTEM_PROMPT, DEFAULT_TEMPERATURE, on_partial=on_partial, meta=meta,
+                            structured=True)
+    return result, meta
+
+
+def finish(router):
+    """等所有路请求（包括落败的）结束再检查统计"""
+    router._executor.shutdown(wait=True)
+    router.close()
+
+
+def test_hedge_wins_when_primary_is_slow(stubs):
+    primary, secondary = stubs
+    primary.delay = 1.0
+    router = make_router(stubs, hedge_delay=0.1)
+    started = time.monotonic()
+    result, meta = analyze(router)
+    assert time.monotonic() - started < primary.delay
+    assert result["scores"] == SAMPLE_RESULT["scores"]
+    assert (meta["backend"], meta["hedged"]) == ("secondary", True)
+    assert (primary.requests, secondary.requests) == (1, 1)
+    finish(router)
+
+
+def test_failover_on_5xx(stubs):
+    primary, secondary = stubs
+    primary.statuses = [500]
+    router = make_router(stubs)
+    result, meta = analyze(router)
+    assert "error" not in result
+    assert (meta["backend"], meta["hedged"]) == ("secondary", False)
+    assert (primary.requests, secondary.requests) == (1, 1)
+    assert router.backends[0].breaker.state == CLOSED  # 一次失败不到熔断阈值
+    finish(router)
+
+
+def test_all_backends_failing_returns_last_error(stubs):
+    for stub in stubs:
+        stub.statuses = [503]
+    router = make_router(stubs)
+    result, meta = analyze(router)
+    assert "error" in result and meta["backend"] is None
+    finish(router)
+
+
+def test_breaker_opens_probes_and_closes(stubs):
+    primary, secondary = stubs
+    primary.statuses = [500, 500, 500]
+    clock = FakeClock()
+    router = make_router(stubs, failures=2, cooldown=30.0, clock=clock)
+    breaker = router.backends[0].breaker
+    for _ in range(2):
+        assert analyze(router)[1]["backend"] == "secondary"
+    assert breaker.state == OPEN
+
+    # 冷却期内跳过主后端
+    assert analyze(router)[1]["backend"] == "secondary"
+    assert primary.requests == 2
+
+    # 冷却结束放行一次试探，试探失败立即重新熔断
+    clock.now += 30
+    assert analyze(router)[1]["backend"] == "secondary"
+    assert (primary.requests, breaker.state) == (3, OPEN)
+
+    clock.now += 30
+    assert analyze(router)[1]["backend"] == "primary"
+    assert (primary.requests, breaker.state) == (4, CLOSED)
+    finish(router)
+
+
+def test_half_open_allows_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failures=1, cooldown=10, clock=clock)
+    breaker.record(False)
+    assert breaker.state == OPEN and not breaker.allow()
+    clock.now += 10
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # 试探请求尚无结果时不再放行
+    clock.now += 10
+    assert breaker.allow()      # 试探请求迟迟没有结果，再过一个冷却期重新放行
+    breaker.record(True)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_all_backends_open_falls_back_to_first(stubs):
+    primary, secondary = stubs
+    router = make_router(stubs, failures=1, clock=FakeClock())
+    for backend in router.backends:
+        backend.breaker.record(False)
+    result, meta = analyze(router)
+    assert "error" not in result and meta["backend"] == "primary"
+    assert (primary.requests, secondary.requests) == (1, 0)
+    assert router.backends[0].breaker.state == CLOSED
+    finish(router)
+
+
+def test_aborted_loser_is_not_counted_as_failure(stubs):
+    primary, secondary = stubs
+    primary.delay = 0.5
+    # 熔断阈值 1：落败的主后端若被记一次失败就会熔断
+    router = make_router(stubs, failures=1, hedge_delay=0.1)
+    partials = []
+    result, meta = analyze(router, on_partial=lambda partial, completed: partials.append(partial))
+    assert "error" not in result and meta["backend"] == "secondary"
+    assert partials
+    finish(router)
+    assert primary.requests == 1
+    primary_backend = router.backends[0]
+    assert primary_backend.breaker.state == CLOSED and primary_backend.breaker._consecutive == 0
+    assert primary_backend.percentile(50, min_samples=1) is None
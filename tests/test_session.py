@@ -0,0 +1,26 @@
+"""登录校验：账号到期时间的解析。"""
+import datetime
+
+import pytest
+
+from mindfocus.app.session import parse_expires_at
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2026-12-31", datetime.datetime(2026, 12, 31)),
+    ("2026-12-31T23:59:59+08:00", datetime.datetime(2026, 12, 31, 23, 59, 59)),
+    ("2026-12-31 23:59:59.123456Z", datetime.datetime(2026, 12, 31, 23, 59, 59, 123456)),
+    ("2026/12/31", datetime.datetime(2026, 12, 31)),
+    ("2026/12/31 08:30:00", datetime.datetime(2026, 12, 31, 8, 30)),
+    ("2026.12.31", datetime.datetime(2026, 12, 31)),
+    ("20261231", datetime.datetime(2026, 12, 31)),
+    ("Dec 31, 2026", datetime.datetime(2026, 12, 31)),
+    (datetime.datetime(2026, 12, 31, tzinfo=datetime.timezone.utc), datetime.datetime(2026, 12, 31)),
+])
+def test_parse_expires_at(value, expected):
+    assert parse_expires_at(value) == expected
+
+
+def test_unknown_format_still_raises():
+    with pytest.raises(ValueError):
+        parse_expires_at("不是日期")
@@ -0,0 +1,65 @@
+"""相似时刻索引：多个实例共用目录时的追加、损坏检测和后台补建。"""
+import json
+
+import numpy as np
+import pytest
+
+from mindfocus.similar import Backfiller, SimilarIndex, SimilarIndexes
+from mindfocus.storage import SqliteStorage
+
+TEXTS = ["今天开会被批评，心里很委屈", "跑步之后整个人轻松多了", "担心明天的考试，睡不着", "和朋友吃饭聊得很开心"]
+
+
+def row(log_id, text=None):
+    return {"id": log_id, "user_input": text or TEXTS[log_id % len(TEXTS)],
+            "ai_result": {"scores": {"平静度": log_id % 5, "觉察度": 1, "能量水平": -1}}}
+
+
+def test_two_instances_share_a_directory(tmp_path):
+    # 同机两个副本各自持有一份内存中的索引
+    first, second = SimilarIndex(str(tmp_path)), SimilarIndex(str(tmp_path))
+    assert first.add(row(1)) == 1
+    assert second.add(row(2)) == 1
+    assert first.add(row(3)) == 1
+    assert second.add(row(1)) == 0  # 另一个实例已收录
+
+    reloaded = SimilarIndex(str(tmp_path))
+    assert len(reloaded) == 3
+    assert reloaded._arrays["ids"].view().tolist() == [1, 2, 3]
+    assert np.all(np.diff(reloaded._arrays["indptr"].view()) > 0)
+    hits = second.search(TEXTS[3])
+    assert hits[0][0] == 3 and len(hits) == 3
+
+
+def test_non_monotonic_indptr_is_rejected(tmp_path):
+    index = SimilarIndex(str(tmp_path))
+    index.add_many([row(1), row(2)])
+    indptr = np.fromfile(tmp_path / "indptr.bin", np.int64)
+    indptr[1], indptr[2] = indptr[2], indptr[1]
+    indptr.tofile(tmp_path / "indptr.bin")
+    with pytest.raises(ValueError):
+        SimilarIndex(str(tmp_path))
+
+
+def test_unfinished_tail_is_dropped_before_append(tmp_path):
+    index = SimilarIndex(str(tmp_path))
+    index.add(row(1))
+    # 模拟写到一半的追加：数据文件多出尾部，meta 未更新
+    with open(tmp_path / "indices.bin", "ab") as f:
+        f.write(b"\xff" * 12)
+    index.add(row(2))
+    meta = json.loads((tmp_path / "meta.json").read_text())
+    assert (tmp_path / "indices.bin").stat().st_size == meta["nnz"] * 4
+    assert len(SimilarIndex(str(tmp_path))) == 2
+
+
+def test_backfiller_builds_index_from_history(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "logs.db"))
+    storage.insert_logs([{"user_id": "tester", "user_input": text, "ai_result": {"scores": {"平静度": 1}},
+                          "created_at": f"2026-01-01T00:00:0{i}+00:00"} for i, text in enumerate(TEXTS)])
+    indexes = SimilarIndexes(str(tmp_path / "index"))
+    backfiller = Backfiller(indexes)
+    assert backfiller.submit(storage, "tester")
+    backfiller.shutdown(wait=True)
+    assert len(indexes.get("tester")) == len(TEXTS)
+    storage.close()
@@ -0,0 +1,118 @@
+"""SQLite 后端的写入路径：日志、配额和日汇总。"""
+import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mindfocus.backfill import backfill_typed_columns
+from mindfocus.rollup import rebuild_rollups, result_delta
+from mindfocus.storage import SqliteStorage
+from mindfocus.storage.sqlite_backend import TYPED_LOG_COLUMNS
+
+USER = "tester"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "test.db"))
+    storage.add_account(USER, "pw", daily_limit=1000)
+    yield storage
+    storage.close()
+
+
+def entry(ai_result, count_usage=True, user=USER):
+    return {
+        "client_id": str(uuid.uuid4()),
+        "user_id": user,
+        "user_input": "测试",
+        "ai_result": ai_result,
+        "day": datetime.date.today().isoformat(),
+        "count_usage": count_usage,
+    }
+
+
+@pytest.mark.parametrize("ai_result", [
+    {"scores": {"平静度": 2}, "recommendations": None},
+    {"scores": [1, 2, 3], "focus_analysis": "Past"},
+    "不是 JSON",
+    [1, 2, 3],
+])
+def test_malformed_ai_result_is_still_stored(storage, ai_result):
+    row = storage.log_analysis(entry(ai_result))
+    assert row is not None and row["id"] is not None
+    assert storage.get_log(USER, row["id"]) is not None
+    assert storage.get_daily_usage(USER, datetime.date.today().isoformat()) == 1
+    assert sum(r["count"] for r in storage.daily_rollups(USER, "2000-01-01", "2999-12-31")) == 1
+
+
+def test_result_delta_never_raises():
+    assert result_delta(None) == {"peace": 0, "awareness": 0, "energy": 0, "orientation": "present",
+                                  "target": "internal"}
+
+
+def usage(storage):
+    return (storage.get_daily_usage(USER, datetime.date.today().isoformat()),
+            storage.find_account(USER, "pw")["total_usage"])
+
+
+def submit_concurrently(storages, n):
+    """n 个线程同时调用 log_analysis，第 i 个线程用 storages[i % len(storages)]"""
+    barrier = threading.Barrier(n)
+
+    def submit(i):
+        barrier.wait()
+        return storages[i % len(storages)].log_analysis(entry({"scores": {"平静度": 1}}))
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        rows = list(pool.map(submit, range(n)))
+    assert all(row is not None for row in rows)
+
+
+def test_concurrent_submissions_do_not_lose_counts(storage):
+    submit_concurrently([storage], 32)
+    assert usage(storage) == (32, 32)
+
+
+def test_concurrent_submissions_from_separate_connections(storage):
+    # 每个连接相当于一个副本进程，计数靠 begin immediate 的写锁串行化
+    others = [SqliteStorage(storage.path) for _ in range(4)]
+    try:
+        submit_concurrently(others, 32)
+    finally:
+        for other in others:
+            other.close()
+    assert usage(storage) == (32, 32)
+
+
+def rollup_days(storage, user):
+    return {r["day"]: r["count"] for r in storage.daily_rollups(user, "2000-01-01", "2999-12-31")}
+
+
+@pytest.mark.parametrize("scope", [USER, None])
+def test_rebuild_drops_rollups_of_days_without_logs(storage, scope):
+    rows = [{"user_id": user, "user_input": "x", "ai_result": {"scores": {"平静度": 1}}, "created_at": created_at}
+            for user in (USER, "other") for created_at in ("2026-01-01T04:00:00+00:00", "2026-01-02T04:00:00+00:00")]
+    storage.insert_logs(rows)
+    with storage._lock:
+        storage._conn.execute("delete from emotion_logs where created_at like '2026-01-01%'")
+    rebuild_rollups(storage, user=scope, log=lambda message: None)
+    assert rollup_days(storage, USER) == {"2026-01-02": 1}
+    # 只重建一个用户时，其他用户的汇总保持原样
+    assert rollup_days(storage, "other") == ({"2026-01-02": 1} if scope is None else {"2026-01-01": 1, "2026-01-02": 1})
+
+
+def test_backfill_fills_defaults_for_malformed_rows(storage):
+    storage.insert_logs([
+        {"user_id": USER, "user_input": "x", "ai_result": {"scores": {"平静度": 3}, "focus_analysis": {
+            "time_orientation": "Past", "focus_target": "External"}}, "created_at": "2026-01-01T20:00:00+00:00"},
+        {"user_id": USER, "user_input": "y", "ai_result": "不是 JSON", "created_at": "2026-01-01T21:00:00+00:00"},
+    ])
+    # 迁移前的旧行：规范化列都是空的
+    with storage._lock:
+        storage._conn.execute(f"update emotion_logs set {', '.join(f'{c} = null' for c in TYPED_LOG_COLUMNS)}")
+    assert backfill_typed_columns(storage, log=lambda message: None) == (2, 1)
+    points = storage.day_points(USER, "2026-01-02", "2026-01-02")
+    assert [(p["peace"], p["time_orientation"], p["focus_target"]) for p in points] == [
+        (3, "Past", "External"), (0, "Present", "Internal")]
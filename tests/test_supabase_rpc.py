@@ -0,0 +1,158 @@
+"""Supabase 后端的写入 RPC：客户端发出的参数与 supabase/migrations 中最新的函数定义对得上。
+
+设置 MINDFOCUS_TEST_POSTGRES_DSN（指向可以随意清空的 Postgres 库）并安装 psycopg 时，
+另外在真实 Postgres 上执行全部迁移，并发调用 log_analysis 检查配额计数；否则跳过。
+"""
+import datetime
+import json
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from mindfocus.storage.base import USAGE_KEEP_DAYS
+from mindfocus.storage.supabase_backend import SupabaseStorage
+
+MIGRATIONS = sorted((Path(__file__).resolve().parent.parent / "supabase" / "migrations").glob("*.sql"))
+_FUNCTION = re.compile(r"create or replace function public\.(\w+)\((.*?)\)\s*returns.*?\$\$(.*?)\$\$;", re.S | re.I)
+ORIENTATIONS, TARGETS = {"past", "present", "future"}, {"internal", "external"}
+
+
+def latest_functions():
+    """{函数名: (参数名列表, 有缺省值的参数名集合, 函数体)}，后面的迁移覆盖前面的"""
+    functions = {}
+    for path in MIGRATIONS:
+        for name, params, body in _FUNCTION.findall(path.read_text(encoding="utf-8")):
+            parts = [p.split() for p in params.split(",") if p.strip()]
+            functions[name] = ([p[0] for p in parts], {p[0] for p in parts if "default" in p}, body)
+    return functions
+
+
+class FakeClient:
+    """记录 rpc 调用，返回与 log_analysis 相同形状的结果"""
+
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data={"row": {"id": 1}, "used": 1, "duplicate": False}))
+
+
+def entry(ai_result, user="tester"):
+    return {"client_id": str(uuid.uuid4()), "user_id": user, "user_input": "测试", "ai_result": ai_result,
+            "day": datetime.date.today().isoformat(), "count_usage": True}
+
+
+@pytest.mark.parametrize("ai_result", [
+    {"scores": {"平静度": 2, "觉察度": -1, "能量水平": 3},
+     "focus_analysis": {"time_orientation": "Future", "focus_target": "External"}},
+    "不是 JSON",
+])
+def test_log_analysis_rpc_matches_migration(ai_result):
+    client = FakeClient()
+    assert SupabaseStorage(client).log_analysis(entry(ai_result)) == {"id": 1}
+    [(name, params)] = client.calls
+    json.dumps(params)  # PostgREST 按 JSON 发送
+
+    functions = latest_functions()
+    declared, optional, body = functions[name]
+    assert set(params) <= set(declared), f"迁移中的 {name} 没有参数 {set(params) - set(declared)}"
+    assert set(declared) - optional <= set(params), f"缺少必填参数 {set(declared) - optional - set(params)}"
+    assert params["p_keep_days"] == USAGE_KEEP_DAYS
+
+    # 函数体里调用的其他函数参数个数与其最新定义一致
+    for callee, args in re.findall(r"public\.(\w+)\(([^()]*)\)", body):
+        if callee in functions:
+            callee_params, callee_optional, _ = functions[callee]
+            count = len([a for a in args.split(",") if a.strip()])
+            assert len(callee_params) - len(callee_optional) <= count <= len(callee_params), callee
+
+    # p_rollup 读取的键客户端都会给出，方向分类用小写（add_emotion_daily 按小写比较）
+    rollup = params["p_rollup"]
+    keys = {key for _, _, fn_body in functions.values() for key in re.findall(r"p_rollup\s*->>\s*'(\w+)'", fn_body)}
+    assert keys and keys <= set(rollup)
+    assert rollup["orientation"] in ORIENTATIONS and rollup["target"] in TARGETS
+
+
+BASE_SCHEMA = """
+drop table if exists public.emotion_daily, public.emotion_logs, public.test_accounts cascade;
+create table public.test_accounts (
+    username text primary key,
+    password text not null,
+    daily_limit integer not null default 20,
+    expires_at timestamptz,
+    is_active boolean not null default true,
+    custom_prompt text,
+    temperature real,
+    daily_usage jsonb,
+    total_usage integer not null default 0
+);
+create table public.emotion_logs (
+    id bigserial primary key,
+    user_id text not null,
+    user_input text not null,
+    ai_result jsonb not null,
+    created_at timestamptz not null default now()
+);
+"""
+
+
+@pytest.fixture
+def postgres():
+    dsn = os.environ.get("MINDFOCUS_TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("未设置 MINDFOCUS_TEST_POSTGRES_DSN")
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(BASE_SCHEMA)
+        for path in MIGRATIONS:
+            conn.execute(path.read_text(encoding="utf-8"))
+    return lambda: psycopg.connect(dsn, autocommit=True)
+
+
+def call_log_analysis(conn, item):
+    """按 SupabaseStorage 发出的参数调用 log_analysis（PostgREST 对 RPC 参数按名传递）"""
+    client = FakeClient()
+    SupabaseStorage(client).log_analysis(item)
+    [(name, params)] = client.calls
+    values = {k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for k, v in params.items()}
+    sql = f"select public.{name}({', '.join(f'{k} => %({k})s' for k in values)})"
+    return conn.execute(sql, values).fetchone()[0]
+
+
+def test_concurrent_log_analysis_on_postgres(postgres):
+    user, n = "tester", 16
+    today = datetime.date.today()
+    stale = (today - datetime.timedelta(days=USAGE_KEEP_DAYS + 1)).isoformat()
+    with postgres() as conn:
+        conn.execute("insert into public.test_accounts (username, password, daily_usage) values (%s, 'pw', %s)",
+                     (user, json.dumps({stale: 5, "note": 1})))
+
+    errors = []
+
+    def submit():
+        try:
+            with postgres() as conn:
+                call_log_analysis(conn, entry({"scores": {"平静度": 1}}, user=user))
+        except Exception as e:  # 线程里的失败带回主线程断言
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with postgres() as conn:
+        usage, total = conn.execute("select daily_usage, total_usage from public.test_accounts where username = %s",
+                                    (user,)).fetchone()
+        logs = conn.execute("select count(*) from public.emotion_logs where user_id = %s", (user,)).fetchone()[0]
+        rollup = conn.execute("select sum(count) from public.emotion_daily where user_id = %s", (user,)).fetchone()[0]
+    # 过期的日期键被裁掉，非日期键原样保留
+    assert usage == {today.isoformat(): n, "note": 1}
+    assert (total, logs, rollup) == (n, n, n)
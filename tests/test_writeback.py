@@ -0,0 +1,68 @@
+"""写后队列：上次进程留在暂存文件中的条目在重启后补写。"""
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_rerun import APP
+from mindfocus.storage import SqliteStorage
+from mindfocus.writeback import WriteBehindQueue, spooled_count
+from tests.test_storage import USER, entry
+
+
+def fail(entry):
+    raise ConnectionError("数据库不可用")
+
+
+def spool_one(path):
+    """模拟崩溃前的进程：写库失败，条目留在暂存文件里"""
+    queue = WriteBehindQueue(fail, path, retry_base=60)
+    item = entry({"scores": {"平静度": 2}})
+    assert queue.submit(item) is None
+    queue.close()
+    return item
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+
+def test_new_queue_drains_leftover_spool(tmp_path):
+    path = str(tmp_path / "spool.db")
+    assert spooled_count(path) == 0
+    item = spool_one(path)
+    assert spooled_count(path) == 1
+    sent = []
+    queue = WriteBehindQueue(sent.append, path, retry_base=0)
+    try:
+        # 没有新的 submit、原定的重试时间也未到，启动后就补写
+        wait_for(lambda: sent)
+    finally:
+        queue.close()
+    assert [e["client_id"] for e in sent] == [item["client_id"]]
+    assert spooled_count(path) == 0
+
+
+def test_app_start_drains_spool_without_a_save(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db, spool = str(tmp_path / "app.db"), str(tmp_path / "spool.db")
+    storage = SqliteStorage(db)
+    storage.add_account(USER, "pw")
+    item = spool_one(spool)
+    # 暂存条目的下次重试时间在一分钟后；新进程启动时应立即补写
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["STORAGE_BACKEND"] = "sqlite"
+    at.secrets["SQLITE_PATH"] = db
+    at.secrets["WRITE_SPOOL_PATH"] = spool
+    at.secrets["SIMILAR_TOP_K"] = 0
+    at.run()
+    assert not at.exception
+    wait_for(lambda: storage.recent_logs(USER, 10))
+    assert storage.recent_logs(USER, 10)[0]["client_id"] == item["client_id"]
+    wait_for(lambda: spooled_count(spool) == 0)
+    st.cache_resource.clear()
+    storage.close()